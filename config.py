@@ -2,6 +2,7 @@
 Configuration pour l'automatisation des fichiers Excel OneDrive.
 """
 import os
+import tempfile
 from pathlib import Path
 try:
     from dotenv import load_dotenv
@@ -12,9 +13,9 @@ except ImportError:
 # Répertoire racine du projet
 PROJECT_ROOT = Path(__file__).parent
 
-# Répertoires
-LOGS_DIR = PROJECT_ROOT / "logs"
-LOGS_DIR.mkdir(exist_ok=True)
+# Répertoires (journaux, historique, traces ; LOGS_DIR isole une exécution de mesure)
+LOGS_DIR = Path(os.getenv("LOGS_DIR") or PROJECT_ROOT / "logs")
+LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
 # Chemin racine OneDrive (dossier contenant les sous-dossiers de fichiers)
 def get_onedrive_path():
@@ -24,47 +25,139 @@ def get_onedrive_path():
 # Pour compatibilité avec le code existant
 ONEDRIVE_BASE_PATH = get_onedrive_path()
 
+# Édition des classeurs (date, requêtes, liaisons) directement dans le fichier
+# OOXML, sans Excel. Excel n'est alors utilisé que pour l'actualisation.
+HEADLESS_EDIT = os.getenv("HEADLESS_EDIT", "1") != "0"
+
+# Backend Excel : "com" (Excel réel via pywin32) ou "fake" (Excel simulé
+# en mémoire, pour exécuter/mesurer les scripts sans Excel)
+EXCEL_BACKEND = os.getenv("EXCEL_BACKEND", "com")
+# Latences du faux Excel : JSON en ligne ou chemin d'un fichier JSON
+# ex: {"calls": {"Open": 2.0, "Save": 1.0, "default": 0.001},
+#      "refresh": {"default": 3.0, "Requête - piano_all": 20.0},
+#      "failures": {"piano_all": 1}}   (premières actualisations en erreur)
+FAKE_EXCEL_LATENCIES = os.getenv("FAKE_EXCEL_LATENCIES", "")
+
+# Nombre de classeurs indépendants traités en parallèle (un processus et une
+# instance Excel dédiée par classeur). 1 = traitement séquentiel.
+PARALLEL_WORKERS = max(int(os.getenv("PARALLEL_WORKERS", "1") or 1), 1)
+
+# Traçage des appels COM par étape (rapport JSON + piles repliées dans LOGS_DIR)
+COM_TRACE = os.getenv("COM_TRACE", "0") != "0"
+
+# Production des classeurs dans un dossier local puis publication en une fois
+# dans le dossier OneDrive (un seul envoi par fichier, pas de verrou de
+# synchronisation pendant l'actualisation). Désactivable par classeur avec
+# la clé "staging" de la configuration.
+STAGING = os.getenv("STAGING", "1") != "0"
+STAGING_DIR = Path(os.getenv("STAGING_DIR") or Path(tempfile.gettempdir()) / "kiabi_staging")
+
+# Téléchargement en arrière-plan des fichiers OneDrive « en ligne uniquement »
+# pendant le démarrage d'Excel, et attente maximale (secondes) d'un fichier
+ONEDRIVE_PREFETCH = os.getenv("ONEDRIVE_PREFETCH", "1") != "0"
+HYDRATION_TIMEOUT = int(os.getenv("HYDRATION_TIMEOUT", "600") or 600)
+
+# Historique des exécutions (durées par étape et par connexion, dans
+# logs/run_history.sqlite3) et seuil de signalement des régressions :
+# durée supérieure à REGRESSION_THRESHOLD fois la médiane des exécutions précédentes
+RUN_HISTORY = os.getenv("RUN_HISTORY", "1") != "0"
+REGRESSION_THRESHOLD = float(os.getenv("REGRESSION_THRESHOLD", "1.5") or 1.5)
+
+# Comparaison de chaque classeur publié avec celui de la semaine précédente
+# (feuilles et tableaux de requêtes inchangés signalés, résultat dans logs/week_diff)
+WEEK_DIFF = os.getenv("WEEK_DIFF", "1") != "0"
+
+# Politique d'actualisation par défaut (clé "refresh_policy" des configurations,
+# voir RefreshPolicy dans src/excel_automation.py) :
+#   mode        : "double", "single", "verify" (deuxième passe seulement pour
+#                 les connexions non à jour) ou "model_only"
+#   model       : actualiser le modèle de données avant les connexions
+#   connections : connexions ou requêtes à actualiser (None = toutes) ; une
+#                 requête sans connexion entraîne une actualisation complète
+#   recalc      : "full" (CalculateFull), "normal" (Calculate) ou "none"
+#   incremental : n'actualiser que les requêtes modifiées par le script ou
+#                 lisant une source, et leurs dépendantes (voir src/query_graph.py)
+#   parallel    : nombre de connexions actualisées en même temps, en arrière-plan
+#                 et dans l'ordre des dépendances entre requêtes (1 = en série)
+#   conflicting : connexions ou requêtes à actualiser seules même avec parallel
+#                 (ex: ["piano_all", "piano_all_histo"] si la source limite les accès)
+#   retries     : nouvelles tentatives limitées aux connexions en échec (toujours
+#                 en cours au timeout, erreur, date inchangée, tableau vidé)
+#   retry_delay : attente avant la première nouvelle tentative (s), doublée ensuite
+#
+# La séquence historique (double passe) reste la valeur par défaut ; un
+# classeur ne passe à un mode plus court qu'une fois ses données vérifiées.
+DEFAULT_REFRESH_POLICY = {
+    "mode": "double",
+    "model": True,
+    "connections": None,
+    "recalc": "full",
+    "incremental": False,
+    "parallel": 1,
+    "conflicting": [],
+    "retries": 0,
+    "retry_delay": 10,
+}
+
 # Configurations par fichier
 SUIVI_KPIS_CONFIG = {
     "folder": "SUIVI_KPIS",
     "file_prefix": "SUIVI_KPIS",
+    # Script de mise à jour (lancé par le planificateur du lanceur)
+    "script": "scripts.update_kpis",
     "date_sheet": "REPORT_HEBDO",
     "date_cell": "A1",
     "timeout_refresh": 300,
+    "refresh_policy": DEFAULT_REFRESH_POLICY,
 }
 
 SUIVI_MDR_CONFIG = {
     "folder": "SUIVI_MDR",
     "file_prefix": "SUIVI_MDR",
+    "script": "scripts.update_mdr",
+    # Étapes sans Excel (prepare_file) et avec Excel (finish_file) utilisées par le
+    # lanceur pour préparer ce classeur pendant l'actualisation du précédent
+    "pipeline": "scripts.update_autres",
     "date_sheet": "REPORT_MDR",
     "date_cell": "A1",
     "timeout_refresh": 300,
+    "refresh_policy": DEFAULT_REFRESH_POLICY,
 }
 
 SUIVI_PMA_CONFIG = {
     "folder": "SUIVI_PMA",
     "file_prefix": "SUIVI_PMA",
+    "script": "scripts.update_pma",
+    "pipeline": "scripts.update_autres",
     "file_ext": ".xlsm",
     "date_sheet": "REPORT_MONDE",
     "date_cell": "A1",
     "timeout_refresh": 300,
+    "refresh_policy": DEFAULT_REFRESH_POLICY,
 }
 
 SUIVI_PRODUIT_CONFIG = {
     "folder": "SUIVI_PRODUIT",
     "file_prefix": "SUIVI_PRODUIT",
+    "script": "scripts.update_produit",
+    "pipeline": "scripts.update_autres",
     "file_ext": ".xlsm",
     "date_sheet": "REPORT_MONDE",
     "date_cell": "A1",
     "timeout_refresh": 300,
+    "refresh_policy": DEFAULT_REFRESH_POLICY,
 }
 
 SUIVI_CRM_CONFIG = {
     "folder": "SUIVI_CRM",
     "file_prefix": "SUIVI_CRM",
+    "script": "scripts.update_crm",
     "date_sheet": "REPORT",
     "date_cell": "A1",
     "timeout_refresh": 300,
+    # Les requêtes réécrites chaque semaine et leurs dépendantes uniquement ;
+    # nouvelles tentatives pour les sources distantes (API piano, exports selligent)
+    "refresh_policy": {**DEFAULT_REFRESH_POLICY, "incremental": True, "retries": 2},
     # Requêtes Power Query à mettre à jour
     "queries": {
         # Requêtes selligent : mettre à jour le numéro de semaine dans le chemin
@@ -102,9 +195,14 @@ FILE_CONFIGS = {
 SUIVI_TRAFIC_CONFIG = {
     "folder": "SUIVI_TRAFIC",
     "file_prefix": "SUIVI_TRAFIC",
+    "script": "scripts.update_trafic",
     "timeout_refresh": 300,
+    "refresh_policy": {**DEFAULT_REFRESH_POLICY, "incremental": True, "retries": 2},
     # Liaisons externes à mettre à jour (vers CRM et KPIS)
     "linked_files": ["SUIVI_CRM", "SUIVI_KPIS"],
+    # Produit directement dans le dossier OneDrive : les liaisons externes
+    # peuvent être enregistrées en chemin relatif au classeur
+    "staging": False,
     # Requêtes Power Query piano
     "queries": {
         "piano_all": {"type": "piano"},
@@ -121,3 +219,7 @@ CRM_CONFIG = {
 TRAFIC_CONFIG = {
     "SUIVI_TRAFIC": SUIVI_TRAFIC_CONFIG,
 }
+
+# Toutes les mises à jour hebdomadaires (lanceur). L'ordre d'exécution est
+# déduit des liaisons entre classeurs (voir src/run_scheduler.py).
+ALL_CONFIGS = {**FILE_CONFIGS, **CRM_CONFIG, **TRAFIC_CONFIG}
@@ -65,52 +65,16 @@ def main():
     print("   LANCEMENT DES MISES A JOUR")
     print("=" * 60)
 
-    results = {}
+    # Ordre déduit des liaisons entre classeurs (TRAFIC après CRM et KPIS)
+    from src.run_scheduler import RunScheduler, build_run_graph
+    from src.run_history import current_run, print_regressions
 
-    # 1. KPIS
-    print("\n>>> [1/5] Mise a jour SUIVI_KPIS...")
-    try:
-        from scripts.update_kpis import main as run_kpis
-        results["KPIS"] = run_kpis()
-    except Exception as e:
-        print(f"ERREUR: {e}")
-        results["KPIS"] = False
-
-    # 2. MDR
-    print("\n>>> [2/5] Mise a jour SUIVI_MDR...")
-    try:
-        from scripts.update_mdr import main as run_mdr
-        results["MDR"] = run_mdr()
-    except Exception as e:
-        print(f"ERREUR: {e}")
-        results["MDR"] = False
-
-    # 3. PMA
-    print("\n>>> [3/5] Mise a jour SUIVI_PMA...")
-    try:
-        from scripts.update_pma import main as run_pma
-        results["PMA"] = run_pma()
-    except Exception as e:
-        print(f"ERREUR: {e}")
-        results["PMA"] = False
+    # Identifiant de l'exécution, transmis aux processus de travail (historique)
+    run_id = current_run()
 
-    # 4. PRODUIT
-    print("\n>>> [4/5] Mise a jour SUIVI_PRODUIT...")
-    try:
-        from scripts.update_produit import main as run_produit
-        results["PRODUIT"] = run_produit()
-    except Exception as e:
-        print(f"ERREUR: {e}")
-        results["PRODUIT"] = False
-
-    # 5. CRM
-    print("\n>>> [5/5] Mise a jour SUIVI_CRM...")
-    try:
-        from scripts.update_crm import main as run_crm
-        results["CRM"] = run_crm()
-    except Exception as e:
-        print(f"ERREUR: {e}")
-        results["CRM"] = False
+    scheduler = RunScheduler(build_run_graph(config.ALL_CONFIGS), max_workers=config.PARALLEL_WORKERS)
+    results = scheduler.run()
+    durations = {name: result["elapsed"] for name, result in scheduler.results.items()}
 
     # Résumé final
     print("\n" + "=" * 60)
@@ -118,8 +82,13 @@ def main():
     print("=" * 60)
     for name, success in results.items():
         status = "OK" if success else "ERREUR"
+        if name in durations:
+            status += f" ({durations[name]:.0f} s)"
         print(f"  {name}: {status}")
 
+    scheduler.print_report()
+    print_regressions(run_id)
+
     all_ok = all(results.values())
     if all_ok:
         print("\n  Toutes les mises à jour ont été effectuées avec succès!")
@@ -131,6 +100,9 @@ def main():
 
 
 if __name__ == "__main__":
+    # Nécessaire pour les processus de travail de l'exécutable PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception as e:
@@ -0,0 +1,223 @@
+"""
+Mesure de bout en bout des scripts de mise à jour sur classeurs synthétiques,
+avec l'Excel simulé (EXCEL_BACKEND=fake).
+
+Chaque répétition régénère les classeurs (mêmes octets d'une fois à
+l'autre), puis lance les scripts dans l'ordre du lanceur. Les durées par
+étape et par connexion sont relevées dans l'historique des exécutions,
+tenu dans un dossier de travail isolé (les journaux et l'historique du
+projet ne sont pas touchés). Le résultat est écrit en JSON dans
+logs/benchmarks avec la révision git, pour comparaison d'un commit à
+l'autre (--compare).
+
+Usage:
+    python scripts/benchmark.py [--repeat 3] [--scripts SUIVI_CRM SUIVI_TRAFIC]
+        [--rows 5000 --sheets 4 --queries 12 --size-mb 5]
+        [--latencies FICHIER|JSON] [--excel-edit] [--compare logs/benchmarks/bench_xxx.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.generate_fixtures import add_spec_arguments, spec_from_args
+
+# Latences simulées par défaut : faibles et fixes, pour mesurer l'orchestration
+DEFAULT_LATENCIES = {
+    "calls": {"start": 0.2, "Open": 0.05, "Save": 0.05, "default": 0.0},
+    "refresh": {"default": 0.05, "Model": 0.02, "CalculateFull": 0.02},
+}
+
+# Mise à jour groupée MDR / PMA / PRODUIT (pipeline de préparation)
+AUTRES = "AUTRES"
+
+
+def _median(values):
+    return statistics.median(values) if values else None
+
+
+def _prepare_environment(workdir: Path, args):
+    """Variables lues par config.py : tout est produit dans le dossier de travail."""
+    os.environ["EXCEL_BACKEND"] = "fake"
+    os.environ["ONEDRIVE_BASE_PATH"] = str(workdir / "onedrive")
+    os.environ["LOGS_DIR"] = str(workdir / "logs")
+    os.environ["STAGING_DIR"] = str(workdir / "staging")
+    os.environ["RUN_HISTORY"] = "1"
+    os.environ["PARALLEL_WORKERS"] = "1"
+    os.environ["HEADLESS_EDIT"] = "0" if args.excel_edit else "1"
+    os.environ["FAKE_EXCEL_LATENCIES"] = args.latencies or json.dumps(DEFAULT_LATENCIES)
+    os.environ.pop("KIABI_RUN_ID", None)
+
+
+def run_benchmark(args, workdir: Path) -> dict:
+    """
+    Lance les répétitions.
+
+    Returns:
+        Résultats : durée, appels COM et mesures de l'historique par script
+    """
+    import importlib
+
+    import config
+    from src.excel_backend import get_backend
+    from src.run_history import HISTORY_DB, git_revision, series
+    from src.synthetic_workbook import generate_tree
+
+    names = args.scripts or list(config.ALL_CONFIGS)
+    modules = {
+        name: "scripts.update_autres" if name == AUTRES else config.ALL_CONFIGS[name]["script"]
+        for name in names
+    }
+    spec = spec_from_args(args)
+    backend = get_backend("fake")
+    scripts = {name: {"wall": [], "com_calls": [], "success": True} for name in names}
+
+    for repetition in range(1, args.repeat + 1):
+        shutil.rmtree(config.ONEDRIVE_BASE_PATH, ignore_errors=True)
+        shutil.rmtree(config.LOGS_DIR / "journal", ignore_errors=True)
+        paths = generate_tree(config.ONEDRIVE_BASE_PATH, config.ALL_CONFIGS, args.year, args.week, spec)
+        # Classeurs datés de la semaine précédente : pas d'attente de stabilité (hydratation)
+        week_ago = time.time() - 7 * 24 * 3600
+        for path in paths.values():
+            os.utime(path, (week_ago, week_ago))
+        print(f"\nRépétition {repetition}/{args.repeat}")
+        for name, module_name in modules.items():
+            main = importlib.import_module(module_name).main
+            output = io.StringIO()
+            calls_before = sum(backend.call_counts.values())
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+                success = main()
+            elapsed = time.perf_counter() - start
+            calls = sum(backend.call_counts.values()) - calls_before
+            result = scripts[name]
+            result["wall"].append(round(elapsed, 4))
+            result["com_calls"].append(calls)
+            result["success"] = result["success"] and bool(success)
+            status = "OK" if success else "ERREUR"
+            print(f"  {name:<15} {elapsed:8.3f} s  {calls:6d} appels COM  {status}")
+            if not success and not args.verbose:
+                print(output.getvalue()[-2000:])
+
+    measures = {}
+    if HISTORY_DB.exists():
+        for (prefix, measure), values in series(limit=args.repeat * len(names)).items():
+            measures.setdefault(prefix, {})[measure] = [round(value, 4) for _, value in values]
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "headless_edit": not args.excel_edit,
+        "spec": {**spec.to_dict(), "year": args.year, "week": args.week},
+        "latencies": json.loads(os.environ["FAKE_EXCEL_LATENCIES"])
+        if os.environ["FAKE_EXCEL_LATENCIES"].lstrip().startswith("{")
+        else os.environ["FAKE_EXCEL_LATENCIES"],
+        "scripts": scripts,
+        "measures": measures,
+    }
+
+
+def print_results(results: dict, previous: dict = None, threshold: float = 1.2):
+    """Affiche les médianes, et l'écart avec une mesure précédente."""
+    print("\n" + "=" * 60)
+    print(f"   MESURE (révision {results['revision'] or '?'}, {results['repeat']} répétition(s))")
+    if previous:
+        print(f"   comparée à {previous.get('revision') or '?'} ({previous.get('created')})")
+    print("=" * 60)
+
+    def delta(current, before):
+        if before is None or current is None:
+            return ""
+        change = (current - before) / before * 100 if before else 0.0
+        # Écart absolu minimal : les étapes de quelques millisecondes sont bruitées
+        slower = before and current > before * threshold and current - before >= 0.05
+        flag = "  <-- plus lent" if slower else ""
+        return f"  ({change:+6.1f} %){flag}"
+
+    print("\n  Scripts (médiane):")
+    for name, result in results["scripts"].items():
+        wall = _median(result["wall"])
+        before = _median(((previous or {}).get("scripts", {}).get(name) or {}).get("wall", []))
+        status = "OK" if result["success"] else "ERREUR"
+        print(f"    {name:<15} {wall:8.3f} s  {_median(result['com_calls']):7.0f} appels COM  {status}"
+              f"{delta(wall, before)}")
+
+    print("\n  Étapes (médiane):")
+    for prefix, measures in results["measures"].items():
+        print(f"    {prefix}")
+        for measure, values in measures.items():
+            if not measure.startswith(("étape ", "total")):
+                continue
+            value = _median(values)
+            before = _median(((previous or {}).get("measures", {}).get(prefix) or {}).get(measure, []))
+            print(f"      {measure:<28} {value:8.3f} s{delta(value, before)}")
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description="Mesure de bout en bout sur classeurs synthétiques")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions")
+    parser.add_argument("--scripts", nargs="+", metavar="NOM",
+                        help=f"Mises à jour à lancer (noms de ALL_CONFIGS, ou {AUTRES})")
+    parser.add_argument("--latencies", help="Latences de l'Excel simulé (JSON en ligne ou fichier)")
+    parser.add_argument("--excel-edit", action="store_true",
+                        help="Édition dans Excel (HEADLESS_EDIT=0) au lieu de l'édition OOXML")
+    parser.add_argument("--compare", type=Path, help="Résultat JSON précédent à comparer")
+    parser.add_argument("--output", type=Path, help="Fichier JSON du résultat")
+    parser.add_argument("--keep", action="store_true", help="Conserver le dossier de travail")
+    parser.add_argument("--verbose", action="store_true", help="Afficher la sortie des scripts")
+    add_spec_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Dossier des résultats, déterminé avant d'isoler LOGS_DIR
+    results_dir = Path(os.getenv("LOGS_DIR") or PROJECT_ROOT / "logs") / "benchmarks"
+    previous = None
+    if args.compare:
+        try:
+            previous = json.loads(args.compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"ERREUR: Résultat précédent illisible: {e}")
+            return False
+
+    workdir = Path(tempfile.mkdtemp(prefix="kiabi_bench_"))
+    _prepare_environment(workdir, args)
+    try:
+        import config
+        unknown = [name for name in args.scripts or [] if name not in config.ALL_CONFIGS and name != AUTRES]
+        if unknown:
+            print(f"Mises à jour inconnues: {', '.join(unknown)} (choix: {', '.join(config.ALL_CONFIGS)}, {AUTRES})")
+            return False
+        results = run_benchmark(args, workdir)
+    finally:
+        if args.keep:
+            print(f"\nDossier de travail conservé: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, previous)
+
+    output = args.output or results_dir / (
+        f"bench_{results['revision'] or 'local'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nRésultat écrit: {output}")
+    return all(result["success"] for result in results["scripts"].values())
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
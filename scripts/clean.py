@@ -1,14 +1,20 @@
 """
-Supprime les fichiers générés (le SXX le plus élevé dans chaque dossier)
-pour pouvoir relancer le script sur la semaine précédente.
+Supprime les fichiers générés pour pouvoir relancer le script sur la
+semaine précédente.
+
+Si la dernière mise à jour d'un classeur est journalisée (logs/journal),
+seul ce qu'elle a produit est annulé : le fichier publié (s'il n'a pas été
+modifié depuis) et l'espace de travail local. Sinon, le fichier de la
+semaine la plus récente est supprimé.
 """
 import sys
-import re
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ONEDRIVE_BASE_PATH, FILE_CONFIGS, CRM_CONFIG, TRAFIC_CONFIG
+from src.week_index import find_latest_file
+from src.run_journal import StepJournal
 
 
 def main():
@@ -26,20 +32,17 @@ def main():
             print(f"{name}: dossier introuvable")
             continue
 
-        # Trouver le fichier avec le SXX le plus élevé
-        best_file = None
-        best_week = -1
-        for f in folder.glob(f"{prefix}_S*{ext}"):
-            match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-            if match:
-                week = int(match.group(1))
-                if week > best_week:
-                    best_week = week
-                    best_file = f
-
-        if best_file:
-            best_file.unlink()
-            print(f"{name}: supprimé {best_file.name}")
+        journal = StepJournal(prefix)
+        if journal.exists():
+            journal.rollback()
+            continue
+
+        # Sans journal : fichier de la semaine la plus récente
+        latest = find_latest_file(folder, prefix, ext, quiet=True)
+
+        if latest:
+            latest.path.unlink()
+            print(f"{name}: supprimé {latest.path.name}")
         else:
             print(f"{name}: aucun fichier trouvé")
 
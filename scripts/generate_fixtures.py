@@ -0,0 +1,65 @@
+"""
+Crée un dossier OneDrive synthétique (un classeur SUIVI_*_SXX par
+configuration) pour essayer ou mesurer les scripts sans les fichiers Kiabi.
+
+Usage:
+    python scripts/generate_fixtures.py DOSSIER [--year 2026] [--week 3]
+        [--sheets 3] [--rows 1000] [--columns 8] [--queries 8] [--size-mb 0] [--seed 0]
+
+Puis, par exemple :
+    ONEDRIVE_BASE_PATH=DOSSIER EXCEL_BACKEND=fake python scripts/update_crm.py
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    """Options de génération communes (aussi utilisées par benchmark.py)."""
+    parser.add_argument("--year", type=int, default=2026, help="Année ISO")
+    parser.add_argument("--week", type=int, default=3, help="Semaine ISO des classeurs")
+    parser.add_argument("--sheets", type=int, default=3, help="Feuilles par classeur")
+    parser.add_argument("--rows", type=int, default=1000, help="Lignes par tableau de données")
+    parser.add_argument("--columns", type=int, default=8, help="Colonnes par tableau de données")
+    parser.add_argument("--queries", type=int, default=8, help="Requêtes Power Query par classeur (minimum)")
+    parser.add_argument("--size-mb", type=float, default=0.0, help="Taille visée par classeur (Mo)")
+    parser.add_argument("--seed", type=int, default=0, help="Graine des valeurs générées")
+
+
+def spec_from_args(args):
+    """WorkbookSpec des options de génération."""
+    from src.synthetic_workbook import WorkbookSpec
+
+    return WorkbookSpec(
+        sheets=args.sheets, rows=args.rows, columns=args.columns,
+        queries=args.queries, size_mb=args.size_mb, seed=args.seed,
+    )
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description="Génération de classeurs SUIVI synthétiques")
+    parser.add_argument("folder", type=Path, help="Dossier racine à créer (ONEDRIVE_BASE_PATH)")
+    add_spec_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Import tardif : benchmark.py règle l'environnement avant de charger config
+    from config import ALL_CONFIGS
+    from src.synthetic_workbook import generate_tree
+
+    start = time.perf_counter()
+    try:
+        paths = generate_tree(args.folder, ALL_CONFIGS, args.year, args.week, spec_from_args(args))
+    except (OSError, ValueError) as e:
+        print(f"ERREUR: {e}")
+        return False
+    for name, path in paths.items():
+        print(f"  {name:<15} {path} ({path.stat().st_size / 1e6:.1f} Mo)")
+    print(f"{len(paths)} classeur(s) générés en {time.perf_counter() - start:.1f} s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,72 @@
+"""
+Affiche l'historique des exécutions (logs/run_history.sqlite3) : évolution
+des durées par classeur, étape et connexion, de la taille des classeurs et
+du nombre de lignes, avec les régressions par rapport à la médiane des
+exécutions précédentes.
+
+Usage:
+    python scripts/history_report.py [--prefix SUIVI_CRM] [--runs 8] [--threshold 1.5]
+
+Code de sortie 1 si une régression est détectée sur la dernière mesure.
+"""
+import argparse
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import REGRESSION_THRESHOLD
+from src.run_history import HISTORY_DB, regressions, series
+
+
+def _format(measure: str, value: float) -> str:
+    if measure == "lignes":
+        return f"{value:,.0f}".replace(",", " ")
+    return f"{value:.1f}"
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description="Historique des exécutions hebdomadaires")
+    parser.add_argument("--prefix", help="Classeur à afficher (ex: SUIVI_CRM)")
+    parser.add_argument("--runs", type=int, default=8, help="Nombre d'exécutions affichées")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Rapport à la médiane signalé comme régression")
+    args = parser.parse_args(argv)
+
+    if not HISTORY_DB.exists():
+        print(f"Aucun historique ({HISTORY_DB})")
+        return True
+
+    data = series(args.prefix, limit=args.runs)
+    if not data:
+        print("Aucune mise à jour réussie enregistrée")
+        return True
+    flagged = {
+        (item["prefix"], item["measure"]): item
+        for item in regressions(args.threshold, window=args.runs - 1, prefix=args.prefix)
+    }
+
+    current = None
+    for (prefix, measure), values in sorted(data.items(), key=lambda item: item[0][0]):
+        if prefix != current:
+            current = prefix
+            last_run = values[-1][0]
+            print(f"\n{'=' * 60}")
+            print(f"   {prefix} (dernière exécution: {last_run})")
+            print(f"{'=' * 60}")
+        numbers = [value for _, value in values]
+        history = " ".join(f"{_format(measure, value):>7}" for value in numbers)
+        median = statistics.median(numbers[:-1]) if len(numbers) > 1 else numbers[-1]
+        flag = ""
+        if (prefix, measure) in flagged:
+            flag = f"  RÉGRESSION x{flagged[prefix, measure]['ratio']:.1f}"
+        print(f"  {measure:<36} {history}  | médiane {_format(measure, median)}{flag}")
+
+    if flagged:
+        print(f"\n{len(flagged)} régression(s) au-delà de {args.threshold:g} x la médiane")
+    return not flagged
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
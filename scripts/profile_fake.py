@@ -0,0 +1,62 @@
+"""
+Exécute les scripts de mise à jour contre l'Excel simulé (sans Excel ni Windows)
+et affiche le temps d'orchestration et le nombre d'allers-retours COM.
+
+Usage:
+    python scripts/profile_fake.py [autres] [crm] [trafic] [kpis]
+
+Le dossier ONEDRIVE_BASE_PATH doit contenir des classeurs SUIVI_*_SXX
+(réels ou générés). Les latences simulées se règlent via FAKE_EXCEL_LATENCIES.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ["EXCEL_BACKEND"] = "fake"
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.excel_backend import get_backend
+from src.com_trace import span
+
+SCRIPTS = {
+    "kpis": "scripts.update_kpis",
+    "autres": "scripts.update_autres",
+    "crm": "scripts.update_crm",
+    "trafic": "scripts.update_trafic",
+}
+
+
+def main(names):
+    import importlib
+
+    backend = get_backend("fake")
+    timings = {}
+    results = {}
+    for name in names:
+        module = importlib.import_module(SCRIPTS[name])
+        calls_before = sum(backend.call_counts.values())
+        start = time.perf_counter()
+        with span(name):
+            results[name] = module.main()
+        timings[name] = (time.perf_counter() - start, sum(backend.call_counts.values()) - calls_before)
+
+    print("\n" + "=" * 60)
+    print("   MESURE (Excel simulé)")
+    print("=" * 60)
+    for name, (elapsed, calls) in timings.items():
+        status = "OK" if results[name] else "ERREUR"
+        print(f"  {name:<8} {elapsed:8.3f} s  {calls:6d} appels COM  {status}")
+    print("\n  Appels les plus fréquents:")
+    for call, count in backend.call_counts.most_common(10):
+        print(f"    {call:<28} {count}")
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or ["autres", "crm", "trafic"]
+    unknown = [name for name in names if name not in SCRIPTS]
+    if unknown:
+        print(f"Scripts inconnus: {', '.join(unknown)} (choix: {', '.join(SCRIPTS)})")
+        sys.exit(2)
+    sys.exit(0 if main(names) else 1)
@@ -2,41 +2,55 @@
 Script d'automatisation de la mise à jour des fichiers MDR, PMA, PRODUIT.
 """
 import sys
-import re
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import ONEDRIVE_BASE_PATH, AUTRES_CONFIGS
+from config import ONEDRIVE_BASE_PATH, AUTRES_CONFIGS, PARALLEL_WORKERS
 from src.excel_automation import ExcelAutomation
-
-
-def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx"):
-    """Trouve le fichier avec le numéro de semaine le plus élevé."""
-    pattern = f"{prefix}_S*{ext}"
-    matches = list(folder.glob(pattern))
-
-    if not matches:
-        print(f"  ERREUR: Aucun fichier trouvé pour '{pattern}' dans {folder}")
-        return None, None
-
-    best_file = None
-    best_week = -1
-    for f in matches:
-        match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-        if match:
-            week = int(match.group(1))
-            if week > best_week:
-                best_week = week
-                best_file = f
-
-    return best_file, best_week
-
-
-def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
-    """Traite un fichier."""
+from src.week_index import find_latest_file, following_week
+from src.hydration import prefetch_latest, ensure_local
+from src.staging import publish, discard
+from src.run_journal import StepJournal
+from src.run_history import record_file
+from src.week_diff import report_week_diff
+from src.weekly_edit import open_editor, open_headless_editor, commit_edits, save_edits, shift_date_cell
+from src.pipeline import PreparationPipeline
+from src.com_trace import span, step
+
+
+class PreparedFile:
+    """Classeur préparé (étapes 1 à 3), en attente d'actualisation dans Excel."""
+
+    def __init__(self, name: str, config: dict, source_file: Path, new_file: Path, work_file: Path,
+                 journal: StepJournal, resume: Optional[str] = None):
+        self.name = name
+        self.config = config
+        self.source_file = source_file
+        self.new_file = new_file
+        self.work_file = work_file
+        self.journal = journal
+        # Point de reprise du journal ("edited", "saved") ou None
+        self.resume = resume
+        # True si la date a déjà été mise à jour hors d'Excel (édition OOXML)
+        self.edited = False
+
+    def discard(self):
+        # Espace de travail conservé s'il contient un point de reprise
+        if not self.journal.has_checkpoint():
+            discard(self.work_file, self.new_file)
+
+
+def prepare_file(name: str, config: dict) -> Optional[PreparedFile]:
+    """
+    Étapes sans Excel : recherche, duplication et mise à jour de la date (OOXML).
+    Peut s'exécuter dans un thread pendant l'actualisation d'un autre classeur.
+
+    Returns:
+        PreparedFile, ou None en cas d'erreur
+    """
     print(f"\n{'=' * 60}")
     print(f"   {name}")
     print(f"{'=' * 60}")
@@ -47,64 +61,132 @@ def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
 
     if not folder.exists():
         print(f"  ERREUR: Dossier introuvable: {folder}")
-        return False
+        return None
+
+    step("[1/5] Recherche du dernier fichier")
 
     print(f"\n  [1/5] Recherche du dernier fichier...")
-    source_file, source_week = find_latest_file(folder, prefix, ext)
-    if not source_file:
-        return False
-    next_week = source_week + 1
-    print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    source = find_latest_file(folder, prefix, ext)
+    if source is None:
+        return None
+    journal = StepJournal(prefix)
+    if journal.pending(source.path):
+        # Mise à jour interrompue : même source, même cible
+        source_file, source_week, next_week = journal.source_file, journal.source_week, journal.target_week
+        print(f"  Mise à jour interrompue: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    else:
+        source_file, source_week = source.path, source.week
+        _, next_week = following_week(source.year, source.week)
+        print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
 
     new_name = f"{prefix}_S{next_week:02d}{ext}"
     new_file = folder / new_name
+    step("[2/5] Duplication")
     print(f"\n  [2/5] Duplication: {source_file.name} -> {new_name}")
 
     if new_file.exists():
         print(f"  ATTENTION: {new_name} existe déjà, il sera écrasé")
 
-    shutil.copy2(source_file, new_file)
+    work_file, resume = journal.begin(source_file, new_file, source_week, next_week,
+                                      config.get("staging", True))
+    prepared = PreparedFile(name, config, source_file, new_file, work_file, journal, resume)
+    if resume:
+        prepared.edited = True
+        return prepared
+
+    if not ensure_local(source_file):
+        prepared.discard()
+        return None
+
+    # Sans édition OOXML, la date est mise à jour dans Excel (finish_file)
+    editor = open_headless_editor(source_file)
+    if editor is None:
+        return prepared
+
+    step("[3/5] Mise à jour de la date")
+    print(f"\n  [3/5] Mise à jour de la date...")
+    journal.record("copied")
+    if not shift_date_cell(editor, config["date_sheet"], config["date_cell"]):
+        editor.close()
+        prepared.discard()
+        return None
+    journal.record("date_bumped")
+    if not save_edits(editor, work_file):
+        prepared.discard()
+        return None
+    journal.checkpoint(work_file)
+    prepared.edited = True
+    return prepared
+
+
+def finish_file(prepared: Optional[PreparedFile], excel: ExcelAutomation) -> bool:
+    """
+    Étapes dans Excel : actualisation, sauvegarde et publication du classeur préparé.
+
+    Args:
+        prepared: Résultat de prepare_file (None si la préparation a échoué)
+        excel: Instance Excel
+
+    Returns:
+        True si le classeur est traité avec succès
+    """
+    if prepared is None:
+        return False
+    config = prepared.config
+    work_file = prepared.work_file
+    journal = prepared.journal
+    # Temps passé en attente dans le pipeline non compté
+    journal.mark()
 
+    success = False
     try:
-        print(f"\n  [3/5] Mise à jour de la date...")
-
-        if not excel.open_workbook(new_file):
-            return False
+        if not prepared.edited:
+            step("[3/5] Mise à jour de la date")
+            print(f"\n  [3/5] Mise à jour de la date...")
 
-        sheet = config["date_sheet"]
-        cell = config["date_cell"]
-        current_date = excel.read_cell(sheet, cell)
+            editor = open_editor(prepared.source_file, work_file, excel)
+            if editor is None:
+                return False
+            journal.record("copied")
 
-        if current_date is None:
-            return False
+            if not shift_date_cell(editor, config["date_sheet"], config["date_cell"]):
+                return False
+            journal.record("date_bumped")
 
-        if isinstance(current_date, datetime):
-            new_date = current_date + timedelta(days=7)
-        else:
-            try:
-                current_date = datetime.strptime(str(current_date), "%Y-%m-%d %H:%M:%S")
-                new_date = current_date + timedelta(days=7)
-            except ValueError:
-                print(f"  ERREUR: '{current_date}' n'est pas une date valide")
+            if not commit_edits(editor, excel, work_file):
+                return False
+        elif prepared.resume != "saved":
+            if not excel.open_workbook(work_file):
                 return False
 
-        print(f"  {current_date.strftime('%d/%m/%Y')} -> {new_date.strftime('%d/%m/%Y')}")
+        if prepared.resume != "saved":
+            step("[4/5] Actualisation des données")
 
-        if not excel.write_cell(sheet, cell, new_date):
-            return False
+            print(f"\n  [4/5] Actualisation des données...")
+            if not excel.refresh_all_queries(
+                    timeout=config["timeout_refresh"], policy=config.get("refresh_policy")
+                ):
+                print("  ATTENTION: L'actualisation peut ne pas être complète")
 
-        print(f"\n  [4/5] Actualisation des données...")
-        if not excel.refresh_all_queries(timeout=config["timeout_refresh"]):
-            print("  ATTENTION: L'actualisation peut ne pas être complète")
+            excel.check_connections_status()
+            journal.record("refreshed")
 
-        excel.check_connections_status()
+            step("[5/5] Sauvegarde")
 
-        print(f"\n  [5/5] Sauvegarde...")
-        if not excel.save():
-            return False
+            print(f"\n  [5/5] Sauvegarde...")
+            if not excel.save():
+                return False
+            journal.record("saved")
+
+            excel.close(save=False)
+            journal.checkpoint(work_file)
 
-        excel.close(save=False)
-        print(f"  OK - {new_name} traité avec succès")
+        if not publish(work_file, prepared.new_file):
+            return False
+        journal.published(prepared.new_file)
+        report_week_diff(prepared.source_file, prepared.new_file)
+        print(f"  OK - {prepared.new_file.name} traité avec succès")
+        success = True
         return True
 
     except Exception as e:
@@ -117,8 +199,46 @@ def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
             pass
         return False
 
+    finally:
+        prepared.discard()
+        record_file(journal, success, excel)
+
+
+def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
+    """Traite un fichier."""
+    return finish_file(prepare_file(name, config), excel)
+
+
+def main_parallel() -> bool:
+    """Traite chaque fichier dans son propre processus (instance Excel dédiée)."""
+    from src.worker_pool import WorkerJob, run_parallel
 
-def main():
+    jobs = [
+        WorkerJob(name, "scripts.update_autres", "process_file", (name, config))
+        for name, config in AUTRES_CONFIGS.items()
+    ]
+    # Téléchargés par le processus principal pendant le lancement des processus
+    prefetch_latest(AUTRES_CONFIGS.values())
+    outcomes = run_parallel(jobs, PARALLEL_WORKERS)
+
+    print("\n" + "=" * 60)
+    print("   RÉSUMÉ")
+    print("=" * 60)
+    for name, outcome in outcomes.items():
+        status = "OK" if outcome["success"] else "ERREUR"
+        print(f"  {name}: {status} ({outcome['elapsed']:.0f} s)")
+
+    return all(outcome["success"] for outcome in outcomes.values())
+
+
+def main(excel: Optional[ExcelAutomation] = None):
+    """
+    Lance la mise à jour.
+
+    Args:
+        excel: Instance Excel partagée (lanceur) ; sinon une instance est
+               démarrée puis fermée par le script
+    """
     print("=" * 60)
     print("   MISE A JOUR - MDR, PMA, PRODUIT")
     print(f"   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -130,21 +250,37 @@ def main():
 
     print(f"\nFichiers à traiter: {len(AUTRES_CONFIGS)}")
 
-    excel = None
+    if excel is None and PARALLEL_WORKERS > 1:
+        return main_parallel()
+
+    shared = excel is not None
     results = {}
+    pipeline = None
     try:
-        excel = ExcelAutomation(visible=True)
-        for name, config in AUTRES_CONFIGS.items():
-            results[name] = process_file(name, config, excel)
+        # Fichiers OneDrive téléchargés et premier classeur préparé pendant
+        # le démarrage d'Excel ; ensuite, le classeur suivant est préparé
+        # pendant l'actualisation du classeur courant
+        prefetch_latest(AUTRES_CONFIGS.values())
+        pipeline = PreparationPipeline(AUTRES_CONFIGS, prepare_file, PreparedFile.discard)
+        if not shared:
+            excel = ExcelAutomation(visible=True)
+        for name, config, prepared in pipeline:
+            with span(name):
+                results[name] = finish_file(prepared, excel)
     except Exception as e:
         print(f"\nERREUR: {e}")
         return False
     finally:
-        if excel:
+        if pipeline is not None:
+            pipeline.close()
+        if excel and not shared:
             try:
                 excel.quit()
             except:
                 pass
+        elif excel and excel.workbook:
+            # Instance partagée : fermer le classeur, pas Excel
+            excel.close(save=False)
 
     print("\n" + "=" * 60)
     print("   RÉSUMÉ")
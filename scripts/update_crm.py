@@ -8,102 +8,37 @@ Ce script :
    - piano_all / piano_all_histo : dates start/end (+7 jours)
 3. Actualise toutes les connexions de données
 4. Sauvegarde et ferme
+5. Compare avec le classeur de la semaine précédente
 """
 import sys
-import re
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ONEDRIVE_BASE_PATH, SUIVI_CRM_CONFIG
-from src.excel_automation import ExcelAutomation
-
-
-def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx"):
-    """Trouve le fichier avec le numéro de semaine le plus élevé."""
-    pattern = f"{prefix}_S*{ext}"
-    matches = list(folder.glob(pattern))
-
-    if not matches:
-        print(f"  ERREUR: Aucun fichier trouvé pour '{pattern}' dans {folder}")
-        return None, None
-
-    best_file = None
-    best_week = -1
-    for f in matches:
-        match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-        if match:
-            week = int(match.group(1))
-            if week > best_week:
-                best_week = week
-                best_file = f
-
-    if best_file is None:
-        print(f"  ERREUR: Aucun fichier avec un numéro de semaine valide")
-        return None, None
-
-    return best_file, best_week
-
-
-def update_selligent_query(excel, query_name: str, old_week: int, new_week: int) -> bool:
+from src.excel_automation import ExcelAutomation, RefreshPolicy
+from src.week_index import find_latest_file, following_week
+from src.hydration import prefetch, ensure_local
+from src.staging import publish, discard
+from src.run_journal import StepJournal
+from src.run_history import record_file
+from src.week_diff import report_week_diff
+from src.weekly_edit import open_editor, commit_edits, shift_date_cell
+from src.m_rewrite import rewrite_queries
+from src.query_graph import plan_refresh
+from src.com_trace import step
+
+
+def main(excel: Optional[ExcelAutomation] = None):
     """
-    Met à jour le numéro de semaine dans une requête selligent.
-    Ex: 2026_S03 -> 2026_S04
-    """
-    formula = excel.get_query_formula(query_name)
-    if formula is None:
-        return False
-
-    # Remplacer le pattern YYYY_SXX par YYYY_S(XX+1)
-    # Le pattern peut contenir n'importe quelle année
-    pattern = rf'(\d{{4}})_S{old_week:02d}'
-    replacement = rf'\1_S{new_week:02d}'
-
-    new_formula = re.sub(pattern, replacement, formula)
-
-    if new_formula == formula:
-        print(f"  ATTENTION: Aucun pattern S{old_week:02d} trouvé dans '{query_name}'")
-        return False
-
-    # Afficher ce qui a changé
-    old_matches = re.findall(pattern, formula)
-    for year in old_matches:
-        print(f"  {year}_S{old_week:02d} -> {year}_S{new_week:02d}")
-
-    return excel.set_query_formula(query_name, new_formula)
+    Lance la mise à jour.
 
-
-def update_piano_query(excel, query_name: str) -> bool:
-    """
-    Met à jour les dates start/end dans une requête piano (+7 jours).
-    Trouve les dates dans le JSON encodé et ajoute 7 jours.
+    Args:
+        excel: Instance Excel partagée (lanceur) ; sinon une instance est
+               démarrée puis fermée par le script
     """
-    formula = excel.get_query_formula(query_name)
-    if formula is None:
-        return False
-
-    # Trouver toutes les dates au format YYYY-MM-DD dans la formule
-    date_pattern = r'(\d{4}-\d{2}-\d{2})'
-    dates_found = re.findall(date_pattern, formula)
-
-    if not dates_found:
-        print(f"  ATTENTION: Aucune date trouvée dans '{query_name}'")
-        return False
-
-    new_formula = formula
-    for date_str in dates_found:
-        old_date = datetime.strptime(date_str, "%Y-%m-%d")
-        new_date = old_date + timedelta(days=7)
-        new_date_str = new_date.strftime("%Y-%m-%d")
-        new_formula = new_formula.replace(date_str, new_date_str)
-        print(f"  {date_str} -> {new_date_str}")
-
-    return excel.set_query_formula(query_name, new_formula)
-
-
-def main():
     print("=" * 60)
     print("   MISE A JOUR AUTOMATIQUE - SUIVI_CRM")
     print(f"   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -123,88 +58,115 @@ def main():
         return False
 
     # 1. Trouver le dernier fichier
+    step("[1/5] Recherche du dernier fichier")
     print(f"\n[1/5] Recherche du dernier fichier {prefix}_SXX{ext}...")
-    source_file, source_week = find_latest_file(folder, prefix, ext)
-    if not source_file:
+    source = find_latest_file(folder, prefix, ext)
+    if source is None:
         return False
-    next_week = source_week + 1
-    print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    journal = StepJournal(prefix)
+    if journal.pending(source.path):
+        # Mise à jour interrompue : même source, même cible
+        source_file, source_week, next_week = journal.source_file, journal.source_week, journal.target_week
+        print(f"  Mise à jour interrompue: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    else:
+        source_file, source_week = source.path, source.week
+        _, next_week = following_week(source.year, source.week)
+        print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    prefetch([source_file])
 
     # 2. Dupliquer et renommer
     new_name = f"{prefix}_S{next_week:02d}{ext}"
     new_file = folder / new_name
+    step("[2/5] Duplication")
     print(f"\n[2/5] Duplication: {source_file.name} -> {new_name}")
 
     if new_file.exists():
         print(f"  ATTENTION: {new_name} existe déjà, il sera écrasé")
 
-    shutil.copy2(source_file, new_file)
+    work_file, resume = journal.begin(source_file, new_file, source_week, next_week,
+                                      config.get("staging", True))
 
     # 3. Ouvrir et mettre à jour les requêtes
-    excel = None
+    shared = excel is not None
     success = False
 
     try:
-        excel = ExcelAutomation(visible=True)
-
-        if not excel.open_workbook(new_file):
-            print("ERREUR: Impossible d'ouvrir le fichier")
-            return False
-
-        # 3. Mise à jour de la date
-        print(f"\n[3/6] Mise à jour de la date...")
-        sheet = config.get("date_sheet")
-        cell = config.get("date_cell")
-
-        if sheet and cell:
-            current_date = excel.read_cell(sheet, cell)
-
-            if current_date is not None:
-                if isinstance(current_date, datetime):
-                    new_date = current_date + timedelta(days=7)
+        if not shared:
+            excel = ExcelAutomation(visible=True)
+
+        policy = RefreshPolicy.from_config(config.get("refresh_policy"))
+        if resume is None:
+            if not ensure_local(source_file):
+                return False
+            editor = open_editor(source_file, work_file, excel)
+            if editor is None:
+                print("ERREUR: Impossible d'ouvrir le fichier")
+                return False
+            journal.record("copied")
+
+            # 3. Mise à jour de la date
+            step("[3/6] Mise à jour de la date")
+            print(f"\n[3/6] Mise à jour de la date...")
+            sheet = config.get("date_sheet")
+            cell = config.get("date_cell")
+
+            if sheet and cell:
+                if shift_date_cell(editor, sheet, cell):
+                    journal.record("date_bumped")
                 else:
-                    try:
-                        current_date = datetime.strptime(str(current_date), "%Y-%m-%d %H:%M:%S")
-                        new_date = current_date + timedelta(days=7)
-                    except ValueError:
-                        print(f"  ERREUR: '{current_date}' n'est pas une date valide")
-                        new_date = None
-
-                if new_date:
-                    print(f"  {current_date.strftime('%d/%m/%Y')} -> {new_date.strftime('%d/%m/%Y')}")
-                    excel.write_cell(sheet, cell, new_date)
+                    print("  ATTENTION: Impossible de mettre à jour la date")
             else:
-                print("  ATTENTION: Impossible de lire la date")
-        else:
-            print("  Pas de date à mettre à jour")
-
-        print(f"\n[4/6] Mise à jour des requêtes Power Query...")
-        queries = config.get("queries", {})
-
-        for query_name, query_config in queries.items():
-            query_type = query_config["type"]
-            print(f"\n  --- {query_name} ({query_type}) ---")
-
-            if query_type == "selligent":
-                update_selligent_query(excel, query_name, source_week, next_week)
-            elif query_type == "piano":
-                update_piano_query(excel, query_name)
-
-        # 5. Actualiser les données
-        print(f"\n[5/6] Actualisation des données...")
-        if not excel.refresh_all_queries(timeout=config["timeout_refresh"]):
-            print("ATTENTION: L'actualisation peut ne pas être complète")
-
-        print("  Vérification des connexions...")
-        excel.check_connections_status()
-
-        # 6. Sauvegarder et fermer
-        print(f"\n[6/6] Sauvegarde et fermeture...")
-        if not excel.save():
-            print("ERREUR: Impossible de sauvegarder")
+                print("  Pas de date à mettre à jour")
+
+            step("[4/6] Mise à jour des requêtes Power Query")
+
+            print(f"\n[4/6] Mise à jour des requêtes Power Query...")
+            queries = config.get("queries", {})
+            report = rewrite_queries(editor, queries, source_week, next_week)
+            journal.record("queries_patched")
+
+            # Requêtes modifiées ou lisant une source, et leurs dépendantes
+            if policy.incremental:
+                policy = policy.restrict(plan_refresh(editor, report))
+                journal.note("refresh_queries", policy.connections)
+
+            if not commit_edits(editor, excel, work_file):
+                print("ERREUR: Impossible d'ouvrir le fichier")
+                return False
+            if editor is not excel:
+                journal.checkpoint(work_file)
+        elif resume == "edited":
+            print("  Mise à jour de la date et des requêtes déjà faite (journal)")
+            policy = policy.restrict(journal.get("refresh_queries"))
+            if not excel.open_workbook(work_file):
+                return False
+
+        if resume != "saved":
+            # 5. Actualiser les données
+            step("[5/6] Actualisation des données")
+            print(f"\n[5/6] Actualisation des données...")
+            if not excel.refresh_all_queries(timeout=config["timeout_refresh"], policy=policy):
+                print("ATTENTION: L'actualisation peut ne pas être complète")
+
+            print("  Vérification des connexions...")
+            excel.check_connections_status()
+            journal.record("refreshed")
+
+            # 6. Sauvegarder et fermer
+            step("[6/6] Sauvegarde et fermeture")
+            print(f"\n[6/6] Sauvegarde et fermeture...")
+            if not excel.save():
+                print("ERREUR: Impossible de sauvegarder")
+                return False
+            journal.record("saved")
+
+            excel.close(save=False)
+            journal.checkpoint(work_file)
+
+        if not publish(work_file, new_file):
             return False
-
-        excel.close(save=False)
+        journal.published(new_file)
+        report_week_diff(source_file, new_file)
         success = True
 
         print("\n" + "=" * 60)
@@ -218,11 +180,18 @@ def main():
         traceback.print_exc()
 
     finally:
-        if excel:
+        if excel and not shared:
             try:
                 excel.quit()
             except:
                 pass
+        elif excel and excel.workbook:
+            # Instance partagée : fermer le classeur, pas Excel
+            excel.close(save=False)
+        # Espace de travail conservé s'il contient un point de reprise
+        if not journal.has_checkpoint():
+            discard(work_file, new_file)
+        record_file(journal, success, excel)
 
     return success
 
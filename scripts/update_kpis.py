@@ -2,37 +2,22 @@
 Script d'automatisation de la mise à jour du fichier SUIVI_KPIS uniquement.
 """
 import sys
-import re
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ONEDRIVE_BASE_PATH, KPIS_CONFIG
 from src.excel_automation import ExcelAutomation
-
-
-def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx"):
-    """Trouve le fichier avec le numéro de semaine le plus élevé."""
-    pattern = f"{prefix}_S*{ext}"
-    matches = list(folder.glob(pattern))
-
-    if not matches:
-        print(f"  ERREUR: Aucun fichier trouvé pour '{pattern}' dans {folder}")
-        return None, None
-
-    best_file = None
-    best_week = -1
-    for f in matches:
-        match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-        if match:
-            week = int(match.group(1))
-            if week > best_week:
-                best_week = week
-                best_file = f
-
-    return best_file, best_week
+from src.week_index import find_latest_file, following_week
+from src.hydration import prefetch_latest, ensure_local
+from src.staging import publish, discard
+from src.run_journal import StepJournal
+from src.run_history import record_file
+from src.week_diff import report_week_diff
+from src.weekly_edit import open_editor, commit_edits, shift_date_cell
+from src.com_trace import span, step
 
 
 def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
@@ -49,62 +34,87 @@ def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
         print(f"  ERREUR: Dossier introuvable: {folder}")
         return False
 
+    step("[1/5] Recherche du dernier fichier")
+
     print(f"\n  [1/5] Recherche du dernier fichier...")
-    source_file, source_week = find_latest_file(folder, prefix, ext)
-    if not source_file:
+    source = find_latest_file(folder, prefix, ext)
+    if source is None:
         return False
-    next_week = source_week + 1
-    print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    journal = StepJournal(prefix)
+    if journal.pending(source.path):
+        # Mise à jour interrompue : même source, même cible
+        source_file, source_week, next_week = journal.source_file, journal.source_week, journal.target_week
+        print(f"  Mise à jour interrompue: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    else:
+        source_file, source_week = source.path, source.week
+        _, next_week = following_week(source.year, source.week)
+        print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
 
     new_name = f"{prefix}_S{next_week:02d}{ext}"
     new_file = folder / new_name
+    step("[2/5] Duplication")
     print(f"\n  [2/5] Duplication: {source_file.name} -> {new_name}")
 
     if new_file.exists():
         print(f"  ATTENTION: {new_name} existe déjà, il sera écrasé")
 
-    shutil.copy2(source_file, new_file)
+    work_file, resume = journal.begin(source_file, new_file, source_week, next_week,
+                                      config.get("staging", True))
 
+    success = False
     try:
+        step("[3/5] Mise à jour de la date")
         print(f"\n  [3/5] Mise à jour de la date...")
 
-        if not excel.open_workbook(new_file):
-            return False
-
-        sheet = config["date_sheet"]
-        cell = config["date_cell"]
-        current_date = excel.read_cell(sheet, cell)
+        if resume is None:
+            if not ensure_local(source_file):
+                return False
+            editor = open_editor(source_file, work_file, excel)
+            if editor is None:
+                return False
+            journal.record("copied")
 
-        if current_date is None:
-            return False
+            if not shift_date_cell(editor, config["date_sheet"], config["date_cell"]):
+                return False
+            journal.record("date_bumped")
 
-        if isinstance(current_date, datetime):
-            new_date = current_date + timedelta(days=7)
-        else:
-            try:
-                current_date = datetime.strptime(str(current_date), "%Y-%m-%d %H:%M:%S")
-                new_date = current_date + timedelta(days=7)
-            except ValueError:
-                print(f"  ERREUR: '{current_date}' n'est pas une date valide")
+            if not commit_edits(editor, excel, work_file):
+                return False
+            if editor is not excel:
+                journal.checkpoint(work_file)
+        elif resume == "edited":
+            print("  Déjà faite (journal)")
+            if not excel.open_workbook(work_file):
                 return False
 
-        print(f"  {current_date.strftime('%d/%m/%Y')} -> {new_date.strftime('%d/%m/%Y')}")
+        if resume != "saved":
+            step("[4/5] Actualisation des données")
 
-        if not excel.write_cell(sheet, cell, new_date):
-            return False
+            print(f"\n  [4/5] Actualisation des données...")
+            if not excel.refresh_all_queries(
+                    timeout=config["timeout_refresh"], policy=config.get("refresh_policy")
+                ):
+                print("  ATTENTION: L'actualisation peut ne pas être complète")
 
-        print(f"\n  [4/5] Actualisation des données...")
-        if not excel.refresh_all_queries(timeout=config["timeout_refresh"]):
-            print("  ATTENTION: L'actualisation peut ne pas être complète")
+            excel.check_connections_status()
+            journal.record("refreshed")
 
-        excel.check_connections_status()
+            step("[5/5] Sauvegarde")
 
-        print(f"\n  [5/5] Sauvegarde...")
-        if not excel.save():
-            return False
+            print(f"\n  [5/5] Sauvegarde...")
+            if not excel.save():
+                return False
+            journal.record("saved")
+
+            excel.close(save=False)
+            journal.checkpoint(work_file)
 
-        excel.close(save=False)
+        if not publish(work_file, new_file):
+            return False
+        journal.published(new_file)
+        report_week_diff(source_file, new_file)
         print(f"  OK - {new_name} traité avec succès")
+        success = True
         return True
 
     except Exception as e:
@@ -117,8 +127,21 @@ def process_file(name: str, config: dict, excel: ExcelAutomation) -> bool:
             pass
         return False
 
+    finally:
+        # Espace de travail conservé s'il contient un point de reprise
+        if not journal.has_checkpoint():
+            discard(work_file, new_file)
+        record_file(journal, success, excel)
+
+
+def main(excel: Optional[ExcelAutomation] = None):
+    """
+    Lance la mise à jour.
 
-def main():
+    Args:
+        excel: Instance Excel partagée (lanceur) ; sinon une instance est
+               démarrée puis fermée par le script
+    """
     print("=" * 60)
     print("   MISE A JOUR - SUIVI_KPIS")
     print(f"   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -128,21 +151,28 @@ def main():
         print(f"ERREUR: Chemin OneDrive invalide: {ONEDRIVE_BASE_PATH}")
         return False
 
-    excel = None
+    shared = excel is not None
     results = {}
     try:
-        excel = ExcelAutomation(visible=True)
+        # Fichiers OneDrive téléchargés pendant le démarrage d'Excel
+        prefetch_latest(KPIS_CONFIG.values())
+        if not shared:
+            excel = ExcelAutomation(visible=True)
         for name, config in KPIS_CONFIG.items():
-            results[name] = process_file(name, config, excel)
+            with span(name):
+                results[name] = process_file(name, config, excel)
     except Exception as e:
         print(f"\nERREUR: {e}")
         return False
     finally:
-        if excel:
+        if excel and not shared:
             try:
                 excel.quit()
             except:
                 pass
+        elif excel and excel.workbook:
+            # Instance partagée : fermer le classeur, pas Excel
+            excel.close(save=False)
 
     all_ok = all(results.values())
     print("\n" + "=" * 60)
@@ -2,40 +2,32 @@
 Script d'automatisation de la mise à jour du fichier SUIVI_PMA uniquement.
 """
 import sys
-import re
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ONEDRIVE_BASE_PATH, SUIVI_PMA_CONFIG
 from src.excel_automation import ExcelAutomation
-
-
-def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx"):
-    """Trouve le fichier avec le numéro de semaine le plus élevé."""
-    pattern = f"{prefix}_S*{ext}"
-    matches = list(folder.glob(pattern))
-
-    if not matches:
-        print(f"  ERREUR: Aucun fichier trouvé pour '{pattern}' dans {folder}")
-        return None, None
-
-    best_file = None
-    best_week = -1
-    for f in matches:
-        match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-        if match:
-            week = int(match.group(1))
-            if week > best_week:
-                best_week = week
-                best_file = f
-
-    return best_file, best_week
-
-
-def main():
+from src.week_index import find_latest_file, following_week
+from src.hydration import prefetch, ensure_local
+from src.staging import publish, discard
+from src.run_journal import StepJournal
+from src.run_history import record_file
+from src.week_diff import report_week_diff
+from src.weekly_edit import open_editor, commit_edits, shift_date_cell
+from src.com_trace import step
+
+
+def main(excel: Optional[ExcelAutomation] = None):
+    """
+    Lance la mise à jour.
+
+    Args:
+        excel: Instance Excel partagée (lanceur) ; sinon une instance est
+               démarrée puis fermée par le script
+    """
     print("=" * 60)
     print("   MISE A JOUR - SUIVI_PMA")
     print(f"   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -55,71 +47,93 @@ def main():
         return False
 
     # 1. Trouver le dernier fichier
+    step("[1/5] Recherche du dernier fichier")
     print(f"\n[1/5] Recherche du dernier fichier...")
-    source_file, source_week = find_latest_file(folder, prefix, ext)
-    if not source_file:
+    source = find_latest_file(folder, prefix, ext)
+    if source is None:
         return False
-    next_week = source_week + 1
-    print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    journal = StepJournal(prefix)
+    if journal.pending(source.path):
+        # Mise à jour interrompue : même source, même cible
+        source_file, source_week, next_week = journal.source_file, journal.source_week, journal.target_week
+        print(f"  Mise à jour interrompue: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    else:
+        source_file, source_week = source.path, source.week
+        _, next_week = following_week(source.year, source.week)
+        print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    prefetch([source_file])
 
     # 2. Dupliquer
     new_name = f"{prefix}_S{next_week:02d}{ext}"
     new_file = folder / new_name
+    step("[2/5] Duplication")
     print(f"\n[2/5] Duplication: {source_file.name} -> {new_name}")
 
     if new_file.exists():
         print(f"  ATTENTION: {new_name} existe déjà, il sera écrasé")
 
-    shutil.copy2(source_file, new_file)
+    work_file, resume = journal.begin(source_file, new_file, source_week, next_week,
+                                      config.get("staging", True))
 
     # 3-5. Ouvrir et mettre à jour
-    excel = None
+    shared = excel is not None
     success = False
 
     try:
-        excel = ExcelAutomation(visible=True)
-
-        if not excel.open_workbook(new_file):
-            return False
+        if not shared:
+            excel = ExcelAutomation(visible=True)
 
         # 3. Mise à jour de la date
+        step("[3/5] Mise à jour de la date")
         print(f"\n[3/5] Mise à jour de la date...")
-        sheet = config["date_sheet"]
-        cell = config["date_cell"]
-        current_date = excel.read_cell(sheet, cell)
-
-        if current_date is None:
-            print("ERREUR: Impossible de lire la date")
-            return False
-
-        if isinstance(current_date, datetime):
-            new_date = current_date + timedelta(days=7)
-        else:
-            try:
-                current_date = datetime.strptime(str(current_date), "%Y-%m-%d %H:%M:%S")
-                new_date = current_date + timedelta(days=7)
-            except ValueError:
-                print(f"  ERREUR: '{current_date}' n'est pas une date valide")
+        if resume is None:
+            if not ensure_local(source_file):
                 return False
+            editor = open_editor(source_file, work_file, excel)
+            if editor is None:
+                return False
+            journal.record("copied")
 
-        print(f"  {current_date.strftime('%d/%m/%Y')} -> {new_date.strftime('%d/%m/%Y')}")
+            if not shift_date_cell(editor, config["date_sheet"], config["date_cell"]):
+                print("ERREUR: Impossible de mettre à jour la date")
+                return False
+            journal.record("date_bumped")
 
-        if not excel.write_cell(sheet, cell, new_date):
-            return False
+            if not commit_edits(editor, excel, work_file):
+                return False
+            if editor is not excel:
+                journal.checkpoint(work_file)
+        elif resume == "edited":
+            print("  Déjà faite (journal)")
+            if not excel.open_workbook(work_file):
+                return False
 
-        # 4. Actualisation
-        print(f"\n[4/5] Actualisation des données...")
-        if not excel.refresh_all_queries(timeout=config["timeout_refresh"]):
-            print("  ATTENTION: L'actualisation peut ne pas être complète")
+        if resume != "saved":
+            # 4. Actualisation
+            step("[4/5] Actualisation des données")
+            print(f"\n[4/5] Actualisation des données...")
+            if not excel.refresh_all_queries(
+                    timeout=config["timeout_refresh"], policy=config.get("refresh_policy")
+                ):
+                print("  ATTENTION: L'actualisation peut ne pas être complète")
+
+            excel.check_connections_status()
+            journal.record("refreshed")
+
+            # 5. Sauvegarde
+            step("[5/5] Sauvegarde")
+            print(f"\n[5/5] Sauvegarde...")
+            if not excel.save():
+                return False
+            journal.record("saved")
 
-        excel.check_connections_status()
+            excel.close(save=False)
+            journal.checkpoint(work_file)
 
-        # 5. Sauvegarde
-        print(f"\n[5/5] Sauvegarde...")
-        if not excel.save():
+        if not publish(work_file, new_file):
             return False
-
-        excel.close(save=False)
+        journal.published(new_file)
+        report_week_diff(source_file, new_file)
         success = True
 
         print("\n" + "=" * 60)
@@ -132,11 +146,18 @@ def main():
         traceback.print_exc()
 
     finally:
-        if excel:
+        if excel and not shared:
             try:
                 excel.quit()
             except:
                 pass
+        elif excel and excel.workbook:
+            # Instance partagée : fermer le classeur, pas Excel
+            excel.close(save=False)
+        # Espace de travail conservé s'il contient un point de reprise
+        if not journal.has_checkpoint():
+            discard(work_file, new_file)
+        record_file(journal, success, excel)
 
     return success
 
@@ -7,67 +7,28 @@ Ce script :
 3. Met à jour les requêtes Power Query piano (dates +7 jours)
 4. Actualise toutes les connexions de données
 5. Sauvegarde et ferme
+6. Compare avec le classeur de la semaine précédente
 """
 import sys
 import re
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import ONEDRIVE_BASE_PATH, SUIVI_TRAFIC_CONFIG, SUIVI_KPIS_CONFIG, SUIVI_CRM_CONFIG
-from src.excel_automation import ExcelAutomation
-
-
-def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx"):
-    """Trouve le fichier avec le numéro de semaine le plus élevé."""
-    pattern = f"{prefix}_S*{ext}"
-    matches = list(folder.glob(pattern))
-
-    if not matches:
-        print(f"  ERREUR: Aucun fichier trouvé pour '{pattern}' dans {folder}")
-        return None, None
-
-    best_file = None
-    best_week = -1
-    for f in matches:
-        match = re.search(rf'{re.escape(prefix)}_S(\d+)', f.stem)
-        if match:
-            week = int(match.group(1))
-            if week > best_week:
-                best_week = week
-                best_file = f
-
-    if best_file is None:
-        print(f"  ERREUR: Aucun fichier avec un numéro de semaine valide")
-        return None, None
-
-    return best_file, best_week
-
-
-def update_piano_query(excel, query_name: str) -> bool:
-    """Met à jour les dates start/end dans une requête piano (+7 jours)."""
-    formula = excel.get_query_formula(query_name)
-    if formula is None:
-        return False
-
-    date_pattern = r'(\d{4}-\d{2}-\d{2})'
-    dates_found = re.findall(date_pattern, formula)
-
-    if not dates_found:
-        print(f"  ATTENTION: Aucune date trouvée dans '{query_name}'")
-        return False
-
-    new_formula = formula
-    for date_str in dates_found:
-        old_date = datetime.strptime(date_str, "%Y-%m-%d")
-        new_date = old_date + timedelta(days=7)
-        new_date_str = new_date.strftime("%Y-%m-%d")
-        new_formula = new_formula.replace(date_str, new_date_str)
-        print(f"  {date_str} -> {new_date_str}")
-
-    return excel.set_query_formula(query_name, new_formula)
+from src.excel_automation import ExcelAutomation, RefreshPolicy
+from src.week_index import find_latest_file, following_week
+from src.hydration import prefetch, prefetch_latest, ensure_local
+from src.staging import publish, discard
+from src.run_journal import StepJournal
+from src.run_history import record_file
+from src.week_diff import report_week_diff
+from src.weekly_edit import open_editor, commit_edits
+from src.m_rewrite import rewrite_queries
+from src.query_graph import plan_refresh
+from src.com_trace import step
 
 
 def update_external_links(excel, old_week: int, new_week: int, linked_prefixes: list) -> bool:
@@ -101,7 +62,14 @@ def update_external_links(excel, old_week: int, new_week: int, linked_prefixes:
     return success
 
 
-def main():
+def main(excel: Optional[ExcelAutomation] = None):
+    """
+    Lance la mise à jour.
+
+    Args:
+        excel: Instance Excel partagée (lanceur) ; sinon une instance est
+               démarrée puis fermée par le script
+    """
     print("=" * 60)
     print("   MISE A JOUR AUTOMATIQUE - SUIVI_TRAFIC")
     print(f"   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -121,61 +89,111 @@ def main():
         return False
 
     # 1. Trouver le dernier fichier
+    step("[1/6] Recherche du dernier fichier")
     print(f"\n[1/6] Recherche du dernier fichier {prefix}_SXX{ext}...")
-    source_file, source_week = find_latest_file(folder, prefix, ext)
-    if not source_file:
+    source = find_latest_file(folder, prefix, ext)
+    if source is None:
         return False
-    next_week = source_week + 1
-    print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    journal = StepJournal(prefix)
+    if journal.pending(source.path):
+        # Mise à jour interrompue : même source, même cible
+        source_file, source_week, next_week = journal.source_file, journal.source_week, journal.target_week
+        print(f"  Mise à jour interrompue: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    else:
+        source_file, source_week = source.path, source.week
+        _, next_week = following_week(source.year, source.week)
+        print(f"  Trouvé: {source_file.name} (S{source_week:02d} -> S{next_week:02d})")
+    prefetch([source_file])
+    # Classeurs liés (CRM, KPIS) : ouverts par Excel pour la mise à jour des liaisons
+    prefetch_latest([SUIVI_CRM_CONFIG, SUIVI_KPIS_CONFIG])
 
     # 2. Dupliquer et renommer
     new_name = f"{prefix}_S{next_week:02d}{ext}"
     new_file = folder / new_name
+    step("[2/6] Duplication")
     print(f"\n[2/6] Duplication: {source_file.name} -> {new_name}")
 
     if new_file.exists():
         print(f"  ATTENTION: {new_name} existe déjà, il sera écrasé")
 
-    shutil.copy2(source_file, new_file)
+    work_file, resume = journal.begin(source_file, new_file, source_week, next_week,
+                                      config.get("staging", True))
 
     # 3-6. Ouvrir et mettre à jour
-    excel = None
+    shared = excel is not None
     success = False
 
     try:
-        excel = ExcelAutomation(visible=True)
-
-        if not excel.open_workbook(new_file):
-            print("ERREUR: Impossible d'ouvrir le fichier")
+        if not shared:
+            excel = ExcelAutomation(visible=True)
+
+        policy = RefreshPolicy.from_config(config.get("refresh_policy"))
+        if resume is None:
+            if not ensure_local(source_file):
+                return False
+            editor = open_editor(source_file, work_file, excel)
+            if editor is None:
+                print("ERREUR: Impossible d'ouvrir le fichier")
+                return False
+            journal.record("copied")
+
+            # 3. Mettre à jour les liaisons externes
+            step("[3/6] Mise à jour des liaisons externes (CRM, KPIS)")
+            print(f"\n[3/6] Mise à jour des liaisons externes (CRM, KPIS)...")
+            linked_prefixes = config.get("linked_files", [])
+            update_external_links(editor, source_week, next_week, linked_prefixes)
+            journal.record("links_changed")
+
+            # 4. Mettre à jour les requêtes piano
+            step("[4/6] Mise à jour des requêtes Power Query (piano)")
+            print(f"\n[4/6] Mise à jour des requêtes Power Query (piano)...")
+            queries = config.get("queries", {})
+            report = rewrite_queries(editor, queries, source_week, next_week)
+            journal.record("queries_patched")
+
+            # Requêtes modifiées ou lisant une source (dont les cellules liées à
+            # CRM/KPIS, lues par Excel.CurrentWorkbook), et leurs dépendantes
+            if policy.incremental:
+                policy = policy.restrict(plan_refresh(editor, report))
+                journal.note("refresh_queries", policy.connections)
+
+            if not commit_edits(editor, excel, work_file):
+                print("ERREUR: Impossible d'ouvrir le fichier")
+                return False
+            if editor is not excel:
+                journal.checkpoint(work_file)
+        elif resume == "edited":
+            print("  Mise à jour des liaisons et des requêtes déjà faite (journal)")
+            policy = policy.restrict(journal.get("refresh_queries"))
+            if not excel.open_workbook(work_file):
+                return False
+
+        if resume != "saved":
+            # 5. Actualiser les données
+            step("[5/6] Actualisation des données")
+            print(f"\n[5/6] Actualisation des données...")
+            if not excel.refresh_all_queries(timeout=config["timeout_refresh"], policy=policy):
+                print("ATTENTION: L'actualisation peut ne pas être complète")
+
+            print("  Vérification des connexions...")
+            excel.check_connections_status()
+            journal.record("refreshed")
+
+            # 6. Sauvegarder et fermer
+            step("[6/6] Sauvegarde et fermeture")
+            print(f"\n[6/6] Sauvegarde et fermeture...")
+            if not excel.save():
+                print("ERREUR: Impossible de sauvegarder")
+                return False
+            journal.record("saved")
+
+            excel.close(save=False)
+            journal.checkpoint(work_file)
+
+        if not publish(work_file, new_file):
             return False
-
-        # 3. Mettre à jour les liaisons externes
-        print(f"\n[3/6] Mise à jour des liaisons externes (CRM, KPIS)...")
-        linked_prefixes = config.get("linked_files", [])
-        update_external_links(excel, source_week, next_week, linked_prefixes)
-
-        # 4. Mettre à jour les requêtes piano
-        print(f"\n[4/6] Mise à jour des requêtes Power Query (piano)...")
-        queries = config.get("queries", {})
-        for query_name, query_config in queries.items():
-            print(f"\n  --- {query_name} ---")
-            update_piano_query(excel, query_name)
-
-        # 5. Actualiser les données
-        print(f"\n[5/6] Actualisation des données...")
-        if not excel.refresh_all_queries(timeout=config["timeout_refresh"]):
-            print("ATTENTION: L'actualisation peut ne pas être complète")
-
-        print("  Vérification des connexions...")
-        excel.check_connections_status()
-
-        # 6. Sauvegarder et fermer
-        print(f"\n[6/6] Sauvegarde et fermeture...")
-        if not excel.save():
-            print("ERREUR: Impossible de sauvegarder")
-            return False
-
-        excel.close(save=False)
+        journal.published(new_file)
+        report_week_diff(source_file, new_file)
         success = True
 
         print("\n" + "=" * 60)
@@ -189,11 +207,18 @@ def main():
         traceback.print_exc()
 
     finally:
-        if excel:
+        if excel and not shared:
             try:
                 excel.quit()
             except:
                 pass
+        elif excel and excel.workbook:
+            # Instance partagée : fermer le classeur, pas Excel
+            excel.close(save=False)
+        # Espace de travail conservé s'il contient un point de reprise
+        if not journal.has_checkpoint():
+            discard(work_file, new_file)
+        record_file(journal, success, excel)
 
     return success
 
@@ -0,0 +1,113 @@
+"""
+Vérifie, sans Excel, que les derniers classeurs SUIVI contiennent des
+données à jour : pour chaque feuille, nombre de lignes, plage des dates
+et présence de la date cible (par défaut la veille) sur toute la plage
+utilisée.
+
+Un classeur est en erreur si aucune de ses colonnes de dates ne contient
+la date cible. La clé "validate_sheets" d'une configuration limite la
+vérification à certaines feuilles (chacune doit alors contenir la date).
+
+Usage:
+    python scripts/validate.py [--date 2026-01-14] [--only SUIVI_CRM SUIVI_TRAFIC] [--json]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ONEDRIVE_BASE_PATH, ALL_CONFIGS
+from src.week_index import find_latest_file
+from src.xlsx_stream import validate_workbook
+
+
+def validate_config(name: str, config: dict, target_date: date) -> dict:
+    """
+    Valide le dernier classeur d'une configuration.
+
+    Returns:
+        {"name", "file", "success", "seconds", "sheets": [...], "error"}
+    """
+    result = {"name": name, "file": None, "success": False, "sheets": []}
+    latest = find_latest_file(
+        ONEDRIVE_BASE_PATH / config["folder"], config["file_prefix"],
+        config.get("file_ext", ".xlsx"), quiet=True,
+    )
+    if latest is None:
+        result["error"] = "aucun fichier"
+        return result
+    result["file"] = str(latest.path)
+
+    required = config.get("validate_sheets")
+    start = time.perf_counter()
+    try:
+        stats = validate_workbook(latest.path, target_date, required)
+    except (OSError, KeyError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+    except Exception as e:
+        result["error"] = f"classeur illisible ({e})"
+        return result
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["sheets"] = [sheet.to_dict() for sheet in stats]
+
+    if required:
+        result["success"] = all(sheet.target_found for sheet in stats)
+    else:
+        result["success"] = any(sheet.target_found for sheet in stats)
+    return result
+
+
+def print_result(result: dict):
+    status = "OK" if result["success"] else "ERREUR"
+    if result["file"] is None or result.get("error"):
+        print(f"\n{result['name']}: {status} - {result.get('error')}")
+        return
+    print(f"\n{result['name']}: {status} - {Path(result['file']).name} ({result['seconds']:.2f} s)")
+    for sheet in result["sheets"]:
+        line = f"    {sheet['sheet']:<20} {sheet['data_rows']:>8} lignes  {sheet['columns']:>3} colonnes"
+        if sheet["date_min"]:
+            found = "trouvée" if sheet["target_found"] else "ABSENTE"
+            line += f"  dates {sheet['date_min']} -> {sheet['date_max']}  date cible {found}"
+        print(line)
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description="Validation des derniers classeurs SUIVI (sans Excel)")
+    parser.add_argument("--date", help="Date attendue (AAAA-MM-JJ, défaut: la veille)")
+    parser.add_argument("--only", nargs="+", metavar="NOM", help="Configurations à valider")
+    parser.add_argument("--json", action="store_true", help="Résultat au format JSON")
+    args = parser.parse_args(argv)
+
+    if not ONEDRIVE_BASE_PATH or not ONEDRIVE_BASE_PATH.exists():
+        print(f"ERREUR: Chemin OneDrive invalide: {ONEDRIVE_BASE_PATH}")
+        return False
+    try:
+        target_date = (
+            datetime.strptime(args.date, "%Y-%m-%d").date() if args.date
+            else date.today() - timedelta(days=1)
+        )
+    except ValueError:
+        print(f"ERREUR: Date invalide: {args.date}")
+        return False
+
+    configs = {name: config for name, config in ALL_CONFIGS.items() if not args.only or name in args.only}
+    start = time.perf_counter()
+    results = [validate_config(name, config, target_date) for name, config in configs.items()]
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(f"Date cible: {target_date:%d/%m/%Y}")
+        for result in results:
+            print_result(result)
+        print(f"\n{len(results)} classeur(s) vérifié(s) en {time.perf_counter() - start:.1f} s")
+    return all(result["success"] for result in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,80 @@
+"""
+Compare, sans Excel, le dernier classeur SUIVI de chaque configuration
+avec celui de la semaine précédente : nombre de lignes et empreinte du
+contenu par feuille et par tableau chargé par une requête. Les données
+de requête identiques d'une semaine à l'autre sont signalées.
+
+Usage:
+    python scripts/week_diff.py [--only SUIVI_CRM SUIVI_TRAFIC] [--json]
+    python scripts/week_diff.py --files SUIVI_CRM_S02.xlsx SUIVI_CRM_S03.xlsx
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ONEDRIVE_BASE_PATH, ALL_CONFIGS
+from src.week_index import week_files
+from src.week_diff import diff_workbooks, print_diff
+
+
+def latest_pair(config: dict):
+    """Les deux derniers classeurs d'une configuration (précédent, dernier), ou None."""
+    files = week_files(ONEDRIVE_BASE_PATH / config["folder"], config["file_prefix"],
+                       config.get("file_ext", ".xlsx"))
+    if len(files) < 2:
+        return None
+    return files[-2].path, files[-1].path
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description="Comparaison des classeurs SUIVI d'une semaine à l'autre")
+    parser.add_argument("--only", nargs="+", metavar="NOM", help="Configurations à comparer")
+    parser.add_argument("--files", nargs=2, type=Path, metavar=("PRECEDENT", "COURANT"),
+                        help="Compare deux classeurs donnés")
+    parser.add_argument("--json", action="store_true", help="Résultat au format JSON")
+    args = parser.parse_args(argv)
+
+    if args.files:
+        pairs = {args.files[1].stem: tuple(args.files)}
+    else:
+        if not ONEDRIVE_BASE_PATH or not ONEDRIVE_BASE_PATH.exists():
+            print(f"ERREUR: Chemin OneDrive invalide: {ONEDRIVE_BASE_PATH}")
+            return False
+        pairs = {}
+        for name, config in ALL_CONFIGS.items():
+            if args.only and name not in args.only:
+                continue
+            pair = latest_pair(config)
+            if pair is None:
+                print(f"{name}: moins de deux classeurs, comparaison ignorée")
+                continue
+            pairs[name] = pair
+
+    start = time.perf_counter()
+    results = {}
+    success = True
+    for name, (previous_file, current_file) in pairs.items():
+        try:
+            results[name] = diff_workbooks(previous_file, current_file)
+        except Exception as e:
+            print(f"{name}: ERREUR - {e}")
+            success = False
+            continue
+        success = success and not results[name]["unchanged"]
+        if not args.json:
+            print(f"\n{name}:")
+            print_diff(results[name])
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(f"\n{len(results)} classeur(s) comparé(s) en {time.perf_counter() - start:.1f} s")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,341 @@
+"""
+Traçage optionnel des allers-retours COM (activé par COM_TRACE=1).
+
+Les objets COM utilisés par ExcelAutomation sont enveloppés dans un proxy
+qui compte et chronomètre chaque lecture/écriture de propriété et chaque
+appel de méthode. Les mesures sont regroupées sous des sections nommées
+(les étapes [1/5]...[5/5] des scripts), puis écrites dans LOGS_DIR à la
+fin de l'exécution :
+    - com_trace_AAAAMMJJ_HHMMSS.json   : rapport détaillé
+    - com_trace_AAAAMMJJ_HHMMSS.folded : piles repliées ("a;b;c durée_µs"),
+      utilisables par flamegraph.pl / speedscope
+
+Sans COM_TRACE, wrap() retourne l'objet tel quel et span()/step() sont
+sans effet. Les sections ne sont suivies que dans le thread principal
+(celui qui pilote Excel) : span()/step() sont ignorés ailleurs.
+"""
+import atexit
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import COM_TRACE, LOGS_DIR
+
+# Libellé des objets retournés par certaines méthodes (sinon : nom de la méthode)
+_RESULT_LABELS = {"Open": "Workbook", "Add": "Workbook"}
+
+# Valeurs retournées telles quelles (jamais enveloppées)
+_PLAIN_TYPES = (str, bytes, int, float, bool, complex, tuple, list, dict, datetime, type(None))
+
+
+class _Frame:
+    """Section ouverte : chemin, début, et indicateur d'étape séquentielle."""
+
+    def __init__(self, path: Tuple[str, ...], is_step: bool):
+        self.path = path
+        self.is_step = is_step
+        self.started = time.perf_counter()
+
+
+class ComTracer:
+    """Accumulateur des mesures d'une exécution."""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._stack: List[_Frame] = []
+        # (chemin de section, type, membre) -> [nombre, secondes]
+        self.calls: Dict[tuple, list] = {}
+        # chemin de section -> [nombre, secondes]
+        self.spans: Dict[Tuple[str, ...], list] = {}
+        self._written = False
+
+    # ------------------------------------------------------------------
+    # Sections
+    # ------------------------------------------------------------------
+
+    @property
+    def path(self) -> Tuple[str, ...]:
+        return self._stack[-1].path if self._stack else ()
+
+    def push(self, name: str, is_step: bool = False):
+        self._stack.append(_Frame(self.path + (name,), is_step))
+
+    def pop(self):
+        frame = self._stack.pop()
+        entry = self.spans.setdefault(frame.path, [0, 0.0])
+        entry[0] += 1
+        entry[1] += time.perf_counter() - frame.started
+
+    def step(self, name: str):
+        """Termine l'étape en cours (si elle existe) et en ouvre une nouvelle."""
+        if self._stack and self._stack[-1].is_step:
+            self.pop()
+        self.push(name, is_step=True)
+
+    @contextmanager
+    def span(self, name: str):
+        depth = len(self._stack)
+        self.push(name)
+        try:
+            yield
+        finally:
+            # Fermer aussi les étapes ouvertes dans la section
+            while len(self._stack) > depth:
+                self.pop()
+
+    # ------------------------------------------------------------------
+    # Mesures
+    # ------------------------------------------------------------------
+
+    def record(self, kind: str, member: str, seconds: float):
+        entry = self.calls.setdefault((self.path, kind, member), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+
+    def report(self) -> dict:
+        """Rapport structuré (sections et appels triés par durée décroissante)."""
+        com_seconds = sum(seconds for _, seconds in self.calls.values())
+        span_com = {}
+        for (path, _, _), (count, seconds) in self.calls.items():
+            totals = span_com.setdefault(path, [0, 0.0])
+            totals[0] += count
+            totals[1] += seconds
+        return {
+            "started": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self._started, 6),
+            "total_calls": sum(count for count, _ in self.calls.values()),
+            "com_seconds": round(com_seconds, 6),
+            "spans": [
+                {
+                    "span": " / ".join(path),
+                    "count": count,
+                    "seconds": round(seconds, 6),
+                    "com_calls": span_com.get(path, [0, 0.0])[0],
+                    "com_seconds": round(span_com.get(path, [0, 0.0])[1], 6),
+                }
+                for path, (count, seconds) in sorted(self.spans.items())
+            ],
+            "calls": [
+                {
+                    "span": " / ".join(path),
+                    "kind": kind,
+                    "member": member,
+                    "count": count,
+                    "seconds": round(seconds, 6),
+                }
+                for (path, kind, member), (count, seconds) in sorted(
+                    self.calls.items(), key=lambda item: -item[1][1]
+                )
+            ],
+        }
+
+    def collapsed_stacks(self) -> List[str]:
+        """
+        Lignes "section;sous-section;membre durée_µs".
+        Le temps propre de chaque section (hors COM et sous-sections) y figure aussi.
+        """
+        lines = []
+        child_seconds: Dict[Tuple[str, ...], float] = {}
+        for (path, kind, member), (_, seconds) in self.calls.items():
+            frames = [name.replace(";", ",") for name in path] + [f"{kind} {member}"]
+            lines.append(f"{';'.join(frames) or 'root'} {int(seconds * 1e6)}")
+            child_seconds[path] = child_seconds.get(path, 0.0) + seconds
+        for path, (_, seconds) in self.spans.items():
+            if len(path) > 1:
+                child_seconds[path[:-1]] = child_seconds.get(path[:-1], 0.0) + seconds
+        for path, (_, seconds) in self.spans.items():
+            own = seconds - child_seconds.get(path, 0.0)
+            if own > 0:
+                frames = [name.replace(";", ",") for name in path]
+                lines.append(f"{';'.join(frames)} {int(own * 1e6)}")
+        return sorted(lines)
+
+    def write(self, directory: Optional[Path] = None) -> Optional[Path]:
+        """
+        Écrit le rapport JSON et le fichier de piles repliées.
+
+        Returns:
+            Chemin du rapport JSON, ou None si rien n'a été mesuré
+        """
+        while self._stack:
+            self.pop()
+        if not self.calls and not self.spans:
+            return None
+        directory = Path(directory or LOGS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"com_trace_{self.started_at.strftime('%Y%m%d_%H%M%S')}"
+        json_path = directory / f"{stem}.json"
+        json_path.write_text(json.dumps(self.report(), indent=2, ensure_ascii=False), encoding="utf-8")
+        (directory / f"{stem}.folded").write_text("\n".join(self.collapsed_stacks()) + "\n", encoding="utf-8")
+        self._written = True
+        print(f"Trace COM écrite: {json_path}")
+        return json_path
+
+
+class TracingProxy:
+    """Enveloppe d'un objet COM : chaque accès est mesuré par le traceur."""
+
+    __slots__ = ("_target", "_tracer", "_label")
+
+    def __init__(self, target, tracer: ComTracer, label: str):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_tracer", tracer)
+        object.__setattr__(self, "_label", label)
+
+    def __getattr__(self, name: str):
+        start = time.perf_counter()
+        value = getattr(self._target, name)
+        if inspect.ismethod(value) or inspect.isfunction(value) or inspect.isbuiltin(value):
+            return _traced_method(
+                value, self._tracer, f"{self._label}.{name}", _RESULT_LABELS.get(name, name)
+            )
+        self._tracer.record("Get", f"{self._label}.{name}", time.perf_counter() - start)
+        return _wrap(value, self._tracer, name)
+
+    def __setattr__(self, name: str, value):
+        start = time.perf_counter()
+        setattr(self._target, name, unwrap(value))
+        self._tracer.record("Set", f"{self._label}.{name}", time.perf_counter() - start)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._target(*_unwrap_args(args), **_unwrap_kwargs(kwargs))
+        self._tracer.record("Call", f"{self._label}()", time.perf_counter() - start)
+        return _wrap(result, self._tracer, f"{self._label}[]")
+
+    def __iter__(self):
+        for item in self._target:
+            yield _wrap(item, self._tracer, f"{self._label}[]")
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"<TracingProxy {self._label}: {self._target!r}>"
+
+
+def _traced_method(method, tracer: ComTracer, member: str, label: str):
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*_unwrap_args(args), **_unwrap_kwargs(kwargs))
+        finally:
+            tracer.record("Call", member, time.perf_counter() - start)
+        return _wrap(result, tracer, label)
+    return call
+
+
+def _wrap(value, tracer: ComTracer, label: str):
+    if isinstance(value, _PLAIN_TYPES) or isinstance(value, TracingProxy):
+        return value
+    return TracingProxy(value, tracer, label)
+
+
+def unwrap(value):
+    """Objet COM d'origine d'un proxy (ou la valeur elle-même)."""
+    if isinstance(value, TracingProxy):
+        return object.__getattribute__(value, "_target")
+    return value
+
+
+def _unwrap_args(args):
+    return tuple(unwrap(arg) for arg in args)
+
+
+def _unwrap_kwargs(kwargs):
+    return {key: unwrap(value) for key, value in kwargs.items()}
+
+
+_tracer: Optional[ComTracer] = None
+
+
+def get_tracer() -> Optional[ComTracer]:
+    """Traceur de l'exécution courante (None si COM_TRACE est désactivé)."""
+    global _tracer
+    if _tracer is None and COM_TRACE:
+        _tracer = ComTracer()
+        atexit.register(_write_at_exit)
+    return _tracer
+
+
+def _write_at_exit():
+    if _tracer is not None and not _tracer._written:
+        _tracer.write()
+
+
+def _in_main_thread() -> bool:
+    return threading.current_thread() is threading.main_thread()
+
+
+def wrap(com_object, label: str = "Application"):
+    """
+    Enveloppe un objet COM si le traçage est actif.
+
+    Args:
+        com_object: Objet à tracer (ex: l'application Excel)
+        label: Nom affiché dans le rapport
+
+    Returns:
+        Proxy traçant, ou l'objet lui-même si le traçage est désactivé
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return com_object
+    return _wrap(com_object, tracer, label)
+
+
+def timed(member: str, func, *args, **kwargs):
+    """
+    Appelle func en mesurant sa durée comme un appel COM (ex: démarrage d'Excel).
+
+    Returns:
+        Résultat de func
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return func(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        tracer.record("Call", member, time.perf_counter() - start)
+
+
+@contextmanager
+def span(name: str):
+    """Regroupe les appels COM du bloc sous une section nommée."""
+    tracer = get_tracer()
+    if tracer is None or not _in_main_thread():
+        yield
+        return
+    with tracer.span(name):
+        yield
+
+
+def step(name: str):
+    """Ouvre une étape (ex: "[2/5] Duplication"), fermant la précédente."""
+    tracer = get_tracer()
+    if tracer is not None and _in_main_thread():
+        tracer.step(name)
+
+
+def write_report(directory: Optional[Path] = None) -> Optional[Path]:
+    """Écrit immédiatement le rapport de l'exécution courante."""
+    tracer = get_tracer()
+    return tracer.write(directory) if tracer is not None else None
@@ -0,0 +1,269 @@
+"""
+Registre des connexions de données d'un classeur ouvert.
+
+workbook.Connections est énuméré une seule fois par classeur : nom, type,
+objet OLEDBConnection / ODBCConnection et réglages d'actualisation sont
+relevés puis partagés par l'activation des connexions, le suivi des
+actualisations (RefreshTracker) et la vérification finale.
+
+Le type de connexion (Type) désigne directement l'objet à lire : les
+accès OLEDBConnection / ODBCConnection qui lèvent une erreur COM (connexion
+d'un autre type) ne sont tentés que si Type est illisible.
+
+La requête Power Query chargée par une connexion est lue dans sa chaîne de
+connexion (Provider=Microsoft.Mashup.OleDb.1;...;Location=<requête>) : le
+nom de la connexion dépend de la langue d'Excel ("Requête - ", "Query - ")
+et peut avoir été modifié.
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# XlConnectionType : 1 = OLEDB, 2 = ODBC (les autres types n'ont pas d'objet d'actualisation)
+CONNECTION_KINDS = {1: "OLEDB", 2: "ODBC"}
+
+# Fournisseur OLE DB des requêtes Power Query, et requête désignée par Location
+MASHUP_PROVIDER = "Microsoft.Mashup.OleDb"
+_LOCATION_RE = re.compile(r'(?:^|;)\s*Location\s*=\s*(?:"((?:[^"]|"")*)"|([^;]*))', re.IGNORECASE)
+
+
+def connection_query(connection_string) -> Optional[str]:
+    """
+    Requête Power Query désignée par une chaîne de connexion OLE DB.
+
+    Returns:
+        Nom de la requête, ou None si la connexion n'est pas une requête
+    """
+    if not isinstance(connection_string, str) or MASHUP_PROVIDER.lower() not in connection_string.lower():
+        return None
+    match = _LOCATION_RE.search(connection_string)
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return match.group(1).replace('""', '"')
+    return match.group(2).strip() or None
+
+
+class ConnectionInfo:
+    """Connexion d'un classeur et ses réglages connus."""
+
+    def __init__(self, name: str, connection, conn_type: Optional[int] = None):
+        self.name = name
+        self.connection = connection
+        self.type = conn_type
+        self.kind: Optional[str] = None   # "OLEDB", "ODBC" ou None
+        self.proxy = None                 # OLEDBConnection / ODBCConnection
+        self.enable_refresh: Optional[bool] = None
+        self.background_query: Optional[bool] = None
+        self.refresh_date = None
+        self.query: Optional[str] = None  # requête Power Query chargée (Location)
+        self.configured = False           # réglages d'actualisation appliqués
+        self.list_object = None           # tableau chargé par la connexion (load_tables)
+        self.query_table = None
+
+    @property
+    def refreshable(self) -> bool:
+        """Connexion actualisable et suivie (objet OLEDB/ODBC présent)."""
+        return self.proxy is not None and self.enable_refresh is not False
+
+    def read_refresh_date(self):
+        """Relit la date de dernière actualisation (None si illisible)."""
+        try:
+            self.refresh_date = self.proxy.RefreshDate
+        except Exception:
+            self.refresh_date = None
+        return self.refresh_date
+
+    def is_refreshing(self) -> Optional[bool]:
+        """État Refreshing de la connexion (None si illisible)."""
+        if self.proxy is None:
+            return False
+        try:
+            return bool(self.proxy.Refreshing)
+        except Exception:
+            return None
+
+    def loaded_rows(self) -> Optional[int]:
+        """Lignes de données du tableau chargé (None si pas de tableau ou illisible)."""
+        if self.list_object is None:
+            return None
+        try:
+            return int(self.list_object.ListRows.Count)
+        except Exception:
+            return None
+
+    def cancel(self):
+        """Interrompt une actualisation en cours (erreurs ignorées)."""
+        try:
+            self.proxy.CancelRefresh()
+        except Exception:
+            pass
+
+    def __repr__(self):
+        return f"ConnectionInfo({self.name!r}, {self.kind or self.type})"
+
+
+class ConnectionRegistry:
+    """
+    Connexions d'un classeur, énumérées une seule fois.
+
+    Usage:
+        registry = ConnectionRegistry(workbook)
+        registry.enable_all()
+        for info in registry.refreshable():
+            info.connection.Refresh()
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._entries: Dict[str, ConnectionInfo] = {}
+        self._queries: Dict[str, ConnectionInfo] = {}
+        self._tables_loaded = False
+        self._discover()
+
+    def _discover(self):
+        for connection in self.workbook.Connections:
+            try:
+                name = connection.Name
+            except Exception:
+                continue
+            try:
+                conn_type = connection.Type
+            except Exception:
+                conn_type = None
+            info = ConnectionInfo(name, connection, conn_type)
+
+            if conn_type in CONNECTION_KINDS:
+                attributes = [CONNECTION_KINDS[conn_type]]
+            elif conn_type is None:
+                attributes = list(CONNECTION_KINDS.values())
+            else:
+                attributes = []
+            for kind in attributes:
+                try:
+                    proxy = getattr(connection, f"{kind}Connection")
+                except Exception:
+                    continue
+                if proxy:
+                    info.kind, info.proxy = kind, proxy
+                    break
+
+            if info.proxy is not None:
+                try:
+                    info.enable_refresh = bool(info.proxy.EnableRefresh)
+                    info.background_query = bool(info.proxy.BackgroundQuery)
+                except Exception:
+                    pass
+                info.read_refresh_date()
+                if info.kind == "OLEDB":
+                    try:
+                        info.query = connection_query(info.proxy.Connection)
+                    except Exception:
+                        pass
+            self._entries[name] = info
+            if info.query is not None:
+                self._queries.setdefault(info.query.lower(), info)
+
+    def load_tables(self):
+        """
+        Associe à chaque connexion le tableau (ListObject / QueryTable) qu'elle
+        charge. Les feuilles ne sont parcourues qu'une fois par classeur.
+        """
+        if self._tables_loaded:
+            return
+        self._tables_loaded = True
+        try:
+            sheets = list(self.workbook.Worksheets)
+        except Exception:
+            return
+        for sheet in sheets:
+            try:
+                list_objects = list(sheet.ListObjects)
+            except Exception:
+                continue
+            for list_object in list_objects:
+                try:
+                    query_table = list_object.QueryTable
+                    name = query_table.WorkbookConnection.Name
+                except Exception:
+                    continue
+                info = self._entries.get(name)
+                if info is not None:
+                    info.list_object, info.query_table = list_object, query_table
+
+    def __iter__(self) -> Iterator[ConnectionInfo]:
+        return iter(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def get(self, name: str) -> Optional[ConnectionInfo]:
+        return self._entries.get(name)
+
+    def for_query(self, query_name: str) -> Optional[ConnectionInfo]:
+        """Connexion chargeant une requête Power Query (nom insensible à la casse)."""
+        return self._queries.get(query_name.lower())
+
+    def resolve(self, names: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Noms de connexions correspondant à des noms de connexions ou de requêtes.
+
+        Args:
+            names: Connexions ou requêtes, dans l'ordre d'actualisation
+
+        Returns:
+            (connexions dans l'ordre, sans doublon ; noms sans connexion)
+        """
+        resolved, missing = [], []
+        for name in names:
+            info = self._entries.get(name) or self.for_query(name)
+            if info is None:
+                missing.append(name)
+            elif info.name not in resolved:
+                resolved.append(info.name)
+        return resolved, missing
+
+    def refreshable(self, names: Optional[List[str]] = None) -> List[ConnectionInfo]:
+        """Connexions actualisables (toutes, ou celles nommées)."""
+        return [
+            info for name, info in self._entries.items()
+            if info.refreshable and (names is None or name in names)
+        ]
+
+    def enable_all(self, background: bool = False) -> List[ConnectionInfo]:
+        """
+        Active l'actualisation des connexions OLEDB/ODBC et règle BackgroundQuery.
+        Seuls les réglages différents de ceux déjà connus sont écrits.
+
+        Returns:
+            Connexions activées
+        """
+        enabled = []
+        for info in self._entries.values():
+            if info.proxy is None:
+                continue
+            try:
+                if info.enable_refresh is not True:
+                    info.proxy.EnableRefresh = True
+                    info.enable_refresh = True
+                if info.background_query is not background:
+                    info.proxy.BackgroundQuery = background
+                    info.background_query = background
+            except Exception as e:
+                print(f"  Activation impossible ({info.kind}): {info.name} ({e})")
+                continue
+            if info.kind == "OLEDB" and not info.configured:
+                # Désactiver la vérification de certificat pour les sources locales
+                try:
+                    info.proxy.AlwaysUseConnectionFile = False
+                except Exception:
+                    pass
+            info.configured = True
+            enabled.append(info)
+        return enabled
@@ -0,0 +1,370 @@
+"""
+Lecture/écriture du bloc DataMashup (Power Query) d'un classeur OOXML.
+
+Les requêtes Power Query d'un classeur sont stockées dans une partie
+customXml/itemN.xml contenant un élément <DataMashup> encodé en base64.
+Le contenu binaire (format MS-QDEFF) est composé de :
+    - version (4 octets)
+    - longueur + package (zip contenant Formulas/Section1.m)
+    - longueur + permissions
+    - longueur + métadonnées
+    - longueur + liaisons de permissions
+"""
+import io
+import re
+import base64
+import struct
+import zipfile
+from typing import Optional, List, Tuple, Dict, Iterator
+
+DATAMASHUP_NS = "http://schemas.microsoft.com/DataMashup"
+SECTION_PART = "Formulas/Section1.m"
+
+_DATAMASHUP_RE = re.compile(r"(<DataMashup\b[^>]*>)(.*?)(</DataMashup>)", re.DOTALL)
+
+
+def detect_xml_encoding(data: bytes) -> str:
+    """Détermine l'encodage d'une partie XML à partir de son BOM."""
+    if data.startswith(b"\xff\xfe"):
+        return "utf-16-le"
+    if data.startswith(b"\xfe\xff"):
+        return "utf-16-be"
+    if data.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    return "utf-8"
+
+
+def is_datamashup_part(data: bytes) -> bool:
+    """Indique si une partie customXml contient un bloc DataMashup."""
+    encoding = detect_xml_encoding(data)
+    try:
+        text = data.decode(encoding)
+    except UnicodeDecodeError:
+        return False
+    return "<DataMashup" in text and DATAMASHUP_NS in text
+
+
+def _read_block(data: bytes, offset: int) -> Tuple[bytes, int]:
+    """Lit un bloc préfixé par sa longueur (entier 32 bits little-endian)."""
+    (length,) = struct.unpack_from("<I", data, offset)
+    start = offset + 4
+    end = start + length
+    if end > len(data):
+        raise ValueError("DataMashup tronqué")
+    return data[start:end], end
+
+
+class DataMashup:
+    """
+    Représentation décodée d'un bloc DataMashup.
+    Seul le package (Formulas/Section1.m) est modifiable, les autres
+    blocs sont conservés tels quels.
+
+    Note: les liaisons de permissions (MS-QDEFF 2.6) contiennent une empreinte
+    du package et des permissions chiffrée par DPAPI ; elles ne peuvent pas
+    être régénérées hors de Windows. Après modification du package, Excel ne
+    les reconnaît plus et revient aux permissions par défaut (niveaux de
+    confidentialité actifs). ExcelAutomation.ignore_privacy_levels() réapplique
+    le réglage à l'ouverture dans Excel, avant toute actualisation.
+    """
+
+    def __init__(self, xml_bytes: bytes):
+        self.encoding = detect_xml_encoding(xml_bytes)
+        # BOM UTF-16 retiré du texte : to_xml_bytes() le réécrit une seule fois
+        self._xml = xml_bytes.decode(self.encoding).lstrip("\ufeff")
+        match = _DATAMASHUP_RE.search(self._xml)
+        if not match:
+            raise ValueError("Aucun élément DataMashup trouvé")
+        self._match_span = match.span(2)
+        binary = base64.b64decode("".join(match.group(2).split()))
+
+        (self.version,) = struct.unpack_from("<I", binary, 0)
+        self.package, offset = _read_block(binary, 4)
+        self.permissions, offset = _read_block(binary, offset)
+        self.metadata, offset = _read_block(binary, offset)
+        self.permission_bindings, offset = _read_block(binary, offset)
+        self._section: Optional[str] = None
+        self._section_encoding = "utf-8-sig"
+
+    @property
+    def section(self) -> str:
+        """Texte du document Section1.m."""
+        if self._section is None:
+            with zipfile.ZipFile(io.BytesIO(self.package)) as zf:
+                raw = zf.read(SECTION_PART)
+            self._section_encoding = "utf-8-sig" if raw.startswith(b"\xef\xbb\xbf") else "utf-8"
+            self._section = raw.decode(self._section_encoding)
+        return self._section
+
+    @section.setter
+    def section(self, text: str):
+        self._section = text
+        self.package = self._rebuild_package(text)
+
+    def _rebuild_package(self, text: str) -> bytes:
+        """Reconstruit le zip du package en remplaçant Section1.m."""
+        source = zipfile.ZipFile(io.BytesIO(self.package))
+        output = io.BytesIO()
+        with source, zipfile.ZipFile(output, "w") as target:
+            for info in source.infolist():
+                if info.filename == SECTION_PART:
+                    target.writestr(info, text.encode(self._section_encoding), info.compress_type)
+                else:
+                    target.writestr(info, source.read(info), info.compress_type)
+        return output.getvalue()
+
+    def to_binary(self) -> bytes:
+        """Encode le contenu binaire (format MS-QDEFF)."""
+        parts = [struct.pack("<I", self.version)]
+        for block in (self.package, self.permissions, self.metadata, self.permission_bindings):
+            parts.append(struct.pack("<I", len(block)))
+            parts.append(block)
+        return b"".join(parts)
+
+    def to_xml_bytes(self) -> bytes:
+        """Ré-encode la partie customXml complète avec le même encodage."""
+        encoded = base64.b64encode(self.to_binary()).decode("ascii")
+        start, end = self._match_span
+        xml = self._xml[:start] + encoded + self._xml[end:]
+        data = xml.encode(self.encoding)
+        if self.encoding == "utf-16-le":
+            data = b"\xff\xfe" + data
+        elif self.encoding == "utf-16-be":
+            data = b"\xfe\xff" + data
+        return data
+
+
+def _skip_string(text: str, i: int) -> int:
+    """Retourne l'index après une chaîne M ("..." avec "" comme échappement)."""
+    n = len(text)
+    i += 1
+    while i < n:
+        if text[i] == '"':
+            if i + 1 < n and text[i + 1] == '"':
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_trivia(text: str, i: int) -> int:
+    """Saute les espaces et commentaires M."""
+    n = len(text)
+    while i < n:
+        if text[i].isspace():
+            i += 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end + 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        else:
+            break
+    return i
+
+
+def parse_section_members(text: str) -> List[Tuple[str, int, int]]:
+    """
+    Découpe un document de section M en membres partagés.
+
+    Args:
+        text: Contenu de Section1.m
+
+    Returns:
+        Liste de tuples (nom, début, fin) où [début:fin] délimite
+        l'expression du membre (sans le ';' final ni les espaces autour)
+    """
+    members = []
+    n = len(text)
+    i = 0
+    while i < n:
+        i = _skip_trivia(text, i)
+        if i >= n:
+            break
+        if text[i] == "[":
+            # Attributs littéraux avant le membre ([ Description = "..." ])
+            depth = 0
+            while i < n:
+                if text[i] == '"':
+                    i = _skip_string(text, i)
+                    continue
+                if text[i] == "[":
+                    depth += 1
+                elif text[i] == "]":
+                    depth -= 1
+                    if depth == 0:
+                        i += 1
+                        break
+                i += 1
+            continue
+        if not text.startswith("shared", i) or (i + 6 < n and (text[i + 6].isalnum() or text[i + 6] == "_")):
+            # Ignorer tout ce qui n'est pas un membre partagé jusqu'au ';'
+            while i < n and text[i] != ";":
+                if text[i] == '"':
+                    i = _skip_string(text, i)
+                elif text.startswith("//", i) or text.startswith("/*", i):
+                    i = _skip_trivia(text, i)
+                else:
+                    i += 1
+            i += 1
+            continue
+
+        i = _skip_trivia(text, i + 6)
+        if text.startswith('#"', i):
+            end = _skip_string(text, i + 1)
+            name = text[i + 2:end - 1].replace('""', '"')
+        else:
+            end = i
+            while end < n and (text[end].isalnum() or text[end] in "_."):
+                end += 1
+            name = text[i:end]
+        i = _skip_trivia(text, end)
+        if i >= n or text[i] != "=":
+            raise ValueError(f"Membre de section invalide: {name}")
+        body_start = _skip_trivia(text, i + 1)
+
+        i = body_start
+        while i < n and text[i] != ";":
+            if text[i] == '"':
+                i = _skip_string(text, i)
+            elif text.startswith("//", i) or text.startswith("/*", i):
+                i = _skip_trivia(text, i)
+            else:
+                i += 1
+        body_end = i
+        while body_end > body_start and text[body_end - 1].isspace():
+            body_end -= 1
+        members.append((name, body_start, body_end))
+        i += 1
+    return members
+
+
+def find_datamashup_part(zf: zipfile.ZipFile) -> Optional[str]:
+    """Retourne le nom de la partie customXml contenant le DataMashup."""
+    for name in sorted(zf.namelist()):
+        if name.startswith("customXml/item") and name.endswith(".xml"):
+            if "/_rels/" in name or "Props" in name:
+                continue
+            if is_datamashup_part(zf.read(name)):
+                return name
+    return None
+
+
+class QueryCatalog:
+    """
+    Index nom -> formule M des requêtes d'un DataMashup.
+
+    La section est découpée une seule fois ; les lectures et écritures sont
+    ensuite des accès dictionnaire (noms insensibles à la casse) et la section
+    n'est reconstruite qu'une fois, au moment de commit().
+    """
+
+    def __init__(self, mashup: DataMashup):
+        self.mashup = mashup
+        section = mashup.section
+        # Morceaux de texte alternant séparateurs et corps de requêtes
+        self._chunks: List[str] = []
+        self._names: List[str] = []
+        self._index: Dict[str, int] = {}
+        position = 0
+        for name, start, end in parse_section_members(section):
+            self._chunks.append(section[position:start])
+            self._index[name.lower()] = len(self._chunks)
+            self._names.append(name)
+            self._chunks.append(section[start:end])
+            position = end
+        self._chunks.append(section[position:])
+        self._dirty = set()
+
+    def _slot(self, name: str) -> int:
+        try:
+            return self._index[name.lower()]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def __getitem__(self, name: str) -> str:
+        return self._chunks[self._slot(name)]
+
+    def __setitem__(self, name: str, formula: str):
+        slot = self._slot(name)
+        if self._chunks[slot] != formula:
+            self._chunks[slot] = formula
+            self._dirty.add(slot)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self[name] if name in self else default
+
+    def names(self) -> List[str]:
+        """Noms des requêtes, dans l'ordre de la section."""
+        return list(self._names)
+
+    def items(self):
+        return [(name, self[name]) for name in self._names]
+
+    def update(self, formulas: Dict[str, str]) -> List[str]:
+        """
+        Remplace plusieurs formules en une fois.
+
+        Args:
+            formulas: Dictionnaire nom -> nouvelle formule
+
+        Returns:
+            Liste des noms introuvables (les autres sont appliqués)
+        """
+        missing = []
+        for name, formula in formulas.items():
+            if name in self:
+                self[name] = formula
+            else:
+                missing.append(name)
+        return missing
+
+    @property
+    def dirty(self) -> bool:
+        """True si au moins une formule a été modifiée depuis le dernier commit."""
+        return bool(self._dirty)
+
+    def to_section(self) -> str:
+        """Reconstruit le texte complet de Section1.m."""
+        return "".join(self._chunks)
+
+    def commit(self) -> bool:
+        """
+        Réécrit la section dans le DataMashup (une seule reconstruction du package).
+
+        Returns:
+            True si des modifications ont été appliquées
+        """
+        if not self._dirty:
+            return False
+        self.mashup.section = self.to_section()
+        self._dirty.clear()
+        return True
+
+
+def load_catalog(file_path) -> Optional[QueryCatalog]:
+    """
+    Charge le catalogue des requêtes d'un classeur (lecture seule).
+
+    Args:
+        file_path: Chemin du classeur .xlsx/.xlsm
+
+    Returns:
+        QueryCatalog ou None si le classeur ne contient pas de requête
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        part = find_datamashup_part(zf)
+        if part is None:
+            return None
+        return QueryCatalog(DataMashup(zf.read(part)))
@@ -1,37 +1,186 @@
 """
 Module d'automatisation Excel via COM (Windows uniquement).
 Permet d'actualiser les requêtes Power Query et de manipuler les classeurs.
+L'application Excel est fournie par un backend (src/excel_backend.py) :
+Excel réel via pywin32, ou Excel simulé pour les mesures sous Linux.
 """
 import time
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Set
 from datetime import datetime, timedelta
 
+from src.excel_backend import ExcelBackend, get_backend
+from src import com_trace
+from src.refresh_tracker import RefreshTracker
+from src.connection_registry import ConnectionRegistry
+from src.query_graph import QueryGraph
+from src.ooxml_workbook import split_cell_ref, column_index, column_letters
+
+# Séquences d'actualisation possibles (clé "mode" de refresh_policy)
+#   double     : deux RefreshAll systématiques (comportement historique)
+#   single     : un seul RefreshAll
+#   verify     : un RefreshAll, puis une seconde passe limitée aux connexions
+#                en échec ou dont la date d'actualisation n'a pas changé
+#   model_only : actualisation du modèle de données uniquement
+REFRESH_MODES = ("double", "single", "verify", "model_only")
+# Recalcul après actualisation (clé "recalc") : CalculateFull, Calculate ou aucun
+RECALC_MODES = ("full", "normal", "none")
+
+# Attente maximale (secondes) avant une nouvelle tentative d'actualisation
+RETRY_DELAY_MAX = 120
+
+# Nombre maximal de lignes par transfert Range.Value (lecture/écriture par blocs)
+RANGE_CHUNK_ROWS = 10000
+
+
+class RefreshPolicy:
+    """
+    Politique d'actualisation d'un classeur, décrite dans sa configuration.
+
+    Exemple de clé "refresh_policy" d'un *_CONFIG :
+        {"mode": "verify", "model": True, "connections": None, "recalc": "full",
+         "incremental": True}
+
+    Avec "incremental", le script restreint l'actualisation aux requêtes
+    touchées par ses modifications (voir src/query_graph.py et restrict()).
+    "connections" accepte des noms de connexions ou de requêtes : les
+    connexions sont retrouvées par la requête qu'elles chargent ; si l'une
+    d'elles est introuvable, l'actualisation complète (RefreshAll) est faite.
+    Après une actualisation connexion par connexion, les tableaux croisés
+    et le modèle de données alimentés par ces connexions sont actualisés.
+
+    Avec "parallel": N (N > 1), les connexions restent en actualisation
+    d'arrière-plan et jusqu'à N sont lancées en même temps, chacune après
+    les requêtes dont elle dépend. Les connexions (ou requêtes) listées dans
+    "conflicting" sont actualisées seules, en série.
+
+    Avec "retries": N, les connexions en échec après les passes prévues
+    (toujours en cours au timeout, erreur, date d'actualisation inchangée
+    ou tableau chargé vidé) sont actualisées à nouveau, elles seules,
+    jusqu'à N fois, après une attente doublée à chaque tentative
+    ("retry_delay" secondes la première fois, RETRY_DELAY_MAX au plus).
+
+    Sans politique, la séquence historique est appliquée
+    (Model.Refresh + double RefreshAll + CalculateFull).
+    """
+
+    def __init__(self, mode: str = "double", model: bool = True,
+                 connections: Optional[List[str]] = None, recalc: str = "full",
+                 incremental: bool = False, parallel: int = 1,
+                 conflicting: Optional[List[str]] = None, retries: int = 0,
+                 retry_delay: float = 10.0):
+        """
+        Args:
+            mode: Séquence d'actualisation (voir REFRESH_MODES)
+            model: Si True, actualise le modèle de données avant les connexions
+            connections: Connexions (ou requêtes) à actualiser, dans l'ordre
+                         (par défaut toutes, via RefreshAll)
+            recalc: Recalcul final (voir RECALC_MODES)
+            incremental: Autorise la restriction aux requêtes modifiées
+            parallel: Nombre maximal de connexions actualisées en même temps
+                      (1 = actualisation en série, comportement historique)
+            conflicting: Connexions ou requêtes à ne jamais actualiser en parallèle
+            retries: Nouvelles tentatives pour les connexions en échec
+            retry_delay: Attente avant la première nouvelle tentative (secondes)
+        """
+        if mode not in REFRESH_MODES:
+            raise ValueError(f"Mode d'actualisation inconnu: {mode}")
+        if recalc not in RECALC_MODES:
+            raise ValueError(f"Mode de recalcul inconnu: {recalc}")
+        if int(parallel) < 1:
+            raise ValueError(f"Nombre de connexions en parallèle invalide: {parallel}")
+        if int(retries) < 0 or float(retry_delay) < 0:
+            raise ValueError(f"Nouvelles tentatives invalides: {retries} (attente {retry_delay} s)")
+        self.mode = mode
+        self.model = model or mode == "model_only"
+        self.connections = list(connections) if connections is not None else None
+        self.recalc = recalc
+        self.incremental = incremental
+        self.parallel = int(parallel)
+        self.conflicting = list(conflicting or [])
+        self.retries = int(retries)
+        self.retry_delay = float(retry_delay)
+
+    @classmethod
+    def from_config(cls, policy) -> "RefreshPolicy":
+        """
+        Construit une politique depuis la clé "refresh_policy" d'une configuration.
+
+        Args:
+            policy: Dictionnaire, RefreshPolicy ou None (séquence historique)
+
+        Returns:
+            Instance de RefreshPolicy
+        """
+        if isinstance(policy, cls):
+            return policy
+        return cls(**(policy or {}))
+
+    def _copy(self, connections: Optional[List[str]]) -> "RefreshPolicy":
+        return RefreshPolicy(self.mode, self.model, connections, self.recalc, self.incremental,
+                             parallel=self.parallel, conflicting=self.conflicting,
+                             retries=self.retries, retry_delay=self.retry_delay)
+
+    def restrict(self, connections: Optional[List[str]]) -> "RefreshPolicy":
+        """
+        Politique limitée à une liste ordonnée de requêtes ou de connexions
+        (plan incrémental). Le modèle de données et les tableaux croisés qui
+        en dépendent sont actualisés après les connexions.
+
+        Args:
+            connections: Requêtes ou connexions à actualiser (None = politique inchangée)
+
+        Returns:
+            Nouvelle politique, ou la politique courante si elle n'est pas incrémentale
+        """
+        if not self.incremental or connections is None or self.mode == "model_only":
+            return self
+        return self._copy(connections)
+
+    def unrestricted(self) -> "RefreshPolicy":
+        """Même politique, sur toutes les connexions (RefreshAll)."""
+        return self if self.connections is None else self._copy(None)
+
+    def describe(self) -> str:
+        parts = [self.mode]
+        if self.model:
+            parts.append("modèle")
+        if self.connections is not None:
+            parts.append(f"{len(self.connections)} connexion(s)")
+        if self.parallel > 1:
+            parts.append(f"{self.parallel} en parallèle")
+        if self.retries:
+            parts.append(f"{self.retries} nouvelle(s) tentative(s)")
+        parts.append(f"recalcul {self.recalc}")
+        return ", ".join(parts)
+
 
 class ExcelAutomation:
     """
     Classe pour automatiser Excel via COM automation (pywin32).
-    Nécessite Windows et Excel installé.
+    Nécessite Windows et Excel installé (sauf avec le backend "fake").
     """
 
-    def __init__(self, visible: bool = True):
+    def __init__(self, visible: bool = True, backend: Optional[ExcelBackend] = None,
+                 application=None, new_instance: bool = False):
         """
         Initialise une instance Excel.
 
         Args:
             visible: Si True, Excel sera visible pendant l'exécution
+            backend: Backend fournissant l'application Excel
+                     (par défaut: celui de la variable EXCEL_BACKEND)
+            application: Application Excel déjà démarrée à reprendre
+                         (sinon une nouvelle instance est démarrée)
+            new_instance: Si True, démarre un processus Excel dédié (DispatchEx)
         """
-        try:
-            import win32com.client
-            import pythoncom
-        except ImportError:
-            raise ImportError(
-                "pywin32 n'est pas installé. "
-                "Exécutez: pip install pywin32"
+        self.backend = backend or get_backend()
+        if application is None:
+            application = com_trace.timed(
+                "Backend.start", self.backend.start, visible, new_instance=new_instance
             )
-
-        pythoncom.CoInitialize()
-        self.excel = win32com.client.Dispatch("Excel.Application")
+        # Avec COM_TRACE=1, tous les objets obtenus depuis l'application sont tracés
+        self.excel = com_trace.wrap(application)
         self.excel.Visible = visible
         self.excel.DisplayAlerts = False
         self.excel.AskToUpdateLinks = False  # Désactive la pop-up des liaisons externes
@@ -47,7 +196,12 @@ class ExcelAutomation:
         except:
             pass
         self.workbook = None
-        self._pythoncom = pythoncom
+        self._queries: Optional[Dict[str, object]] = None
+        self._connections: Optional[ConnectionRegistry] = None
+        # Durées d'actualisation par connexion, une entrée par passe
+        self.refresh_passes: List[Dict[str, Optional[float]]] = []
+        # Tentative ayant abouti par connexion (1 = passes prévues, None = échec)
+        self.refresh_attempts: Dict[str, Optional[int]] = {}
 
     def open_workbook(self, file_path: Path, update_links: bool = True) -> bool:
         """
@@ -67,6 +221,8 @@ class ExcelAutomation:
                 str(file_path.absolute()),
                 UpdateLinks=update_links_value
             )
+            self._queries = None
+            self._connections = None
             print(f"Classeur ouvert: {file_path.name}")
 
             # Activer le contenu (macros et connexions de données)
@@ -83,31 +239,44 @@ class ExcelAutomation:
 
     def ignore_privacy_levels(self) -> bool:
         """
-        Ignore les contrôles de niveaux de confidentialité Power Query.
-        Note: La configuration doit être faite manuellement sur le fichier source
-        via Données → Obtenir des données → Paramètres de la source de données.
+        Ignore les contrôles de niveaux de confidentialité Power Query
+        (Queries.FastCombine, équivalent de "Ignorer les niveaux de
+        confidentialité" dans les options de requête du classeur).
+
+        Une modification hors Excel des requêtes (DataMashup) invalide les
+        liaisons de permissions : Excel rétablit alors les niveaux de
+        confidentialité et une actualisation sans surveillance peut rester
+        bloquée sur l'invite du pare-feu. Le réglage est donc réappliqué à
+        chaque actualisation, après l'édition du classeur.
 
         Returns:
-            True (toujours, car on ne peut pas forcer ce paramètre via COM)
+            True si le réglage est appliqué
         """
         if not self.workbook:
             return False
 
-        # Note: Les niveaux de confidentialité Power Query ne peuvent pas être
-        # modifiés de manière fiable via COM automation.
-        # Le paramètre doit être configuré manuellement sur le fichier source :
-        # 1. Données → Obtenir des données → Paramètres de la source de données
-        # 2. Pour chaque source → Modifier les autorisations → Public/Organisationnel
-        # 3. Sauvegarder le fichier
-        # Ce paramètre sera ensuite hérité par les fichiers dupliqués.
-
-        return True
+        try:
+            queries = self.workbook.Queries
+            if not queries.FastCombine:
+                queries.FastCombine = True
+                print("  Niveaux de confidentialité ignorés (FastCombine)")
+            return True
+        except Exception as e:
+            # Versions d'Excel sans Queries.FastCombine : le paramètre doit être
+            # configuré sur le fichier source (Données → Obtenir des données →
+            # Options de requête → Confidentialité) et hérité par les copies
+            print(f"  ATTENTION: Niveaux de confidentialité non modifiables ({e})")
+            return False
 
-    def enable_all_connections(self) -> bool:
+    def enable_all_connections(self, background: bool = False) -> bool:
         """
         Active toutes les connexions de données du classeur.
         Nécessaire car Excel désactive les connexions externes par sécurité.
 
+        Args:
+            background: Actualisation en arrière-plan (BackgroundQuery),
+                        nécessaire à l'actualisation en parallèle
+
         Returns:
             True si l'activation est réussie
         """
@@ -117,62 +286,28 @@ class ExcelAutomation:
 
         try:
             print("Activation des connexions de données...")
-            count = 0
-            for connection in self.workbook.Connections:
-                name = connection.Name
-                conn_type = None
-                try:
-                    # Type 1 = OLEDB, Type 2 = ODBC, Type 4 = Web, Type 5 = Text
-                    conn_type = connection.Type
-                except:
-                    pass
-
-                # Activer la connexion OLEDB si présente
-                try:
-                    if connection.OLEDBConnection:
-                        connection.OLEDBConnection.EnableRefresh = True
-                        connection.OLEDBConnection.BackgroundQuery = False
-                        # Désactiver la vérification de certificat pour les sources locales
-                        try:
-                            connection.OLEDBConnection.AlwaysUseConnectionFile = False
-                        except:
-                            pass
-                        print(f"  Activée (OLEDB): {name}")
-                        count += 1
-                        continue
-                except:
-                    pass
-
-                # Activer la connexion ODBC si présente
-                try:
-                    if connection.ODBCConnection:
-                        connection.ODBCConnection.EnableRefresh = True
-                        connection.ODBCConnection.BackgroundQuery = False
-                        print(f"  Activée (ODBC): {name}")
-                        count += 1
-                        continue
-                except:
-                    pass
-
-                # Pour les autres types de connexions (ModelTables, etc.)
-                try:
-                    # Essayer de rafraîchir directement pour voir si la connexion est active
-                    print(f"  Connexion détectée: {name} (type={conn_type})")
-                except:
-                    pass
-
-            print(f"  Total: {count} connexion(s) activée(s)")
+            registry = self._connection_registry()
+            enabled = registry.enable_all(background=background)
+            for info in registry:
+                if info in enabled:
+                    print(f"  Activée ({info.kind}): {info.name}")
+                elif info.proxy is None:
+                    print(f"  Connexion détectée: {info.name} (type={info.type})")
+
+            print(f"  Total: {len(enabled)} connexion(s) activée(s)")
             return True
         except Exception as e:
             print(f"Erreur lors de l'activation des connexions: {e}")
             return False
 
-    def refresh_all_queries(self, timeout: int = 300) -> bool:
+    def refresh_all_queries(self, timeout: int = 300, policy=None) -> bool:
         """
-        Actualise toutes les requêtes Power Query du classeur.
+        Actualise les requêtes Power Query du classeur selon une politique.
 
         Args:
             timeout: Timeout en secondes pour l'actualisation
+            policy: RefreshPolicy ou clé "refresh_policy" de la configuration
+                    (par défaut: séquence historique en double passe)
 
         Returns:
             True si l'actualisation est réussie
@@ -181,76 +316,398 @@ class ExcelAutomation:
             print("Aucun classeur ouvert")
             return False
 
+        try:
+            policy = RefreshPolicy.from_config(policy)
+        except (TypeError, ValueError) as e:
+            print(f"Politique d'actualisation invalide: {e}")
+            return False
+        print(f"Politique d'actualisation: {policy.describe()}")
+
         try:
             # Ignorer les contrôles de confidentialité Power Query
             self.ignore_privacy_levels()
 
             # D'abord activer toutes les connexions
-            self.enable_all_connections()
+            self.enable_all_connections(background=policy.parallel > 1)
+            policy = self._resolve_connections(policy)
 
             # Essayer d'activer les requêtes via le modèle de données si présent
+            # (plan restreint : actualisé après ses connexions, voir _refresh_dependents)
+            if policy.model and policy.connections is None:
+                try:
+                    if self.workbook.Model:
+                        print("  Modèle de données détecté")
+                        try:
+                            self.workbook.Model.Refresh()
+                            print("  Modèle de données actualisé")
+                        except Exception as me:
+                            print(f"  Note: Modèle de données non actualisable ({me})")
+                except:
+                    pass
+
+            self.refresh_passes = []
+            if policy.mode != "model_only":
+                if not self._run_refresh_passes(policy, timeout):
+                    return False
+                if policy.connections is not None:
+                    self._refresh_dependents(policy.connections, policy.model)
+
+            self._recalculate(policy.recalc)
+
+            print("Actualisation terminée")
+            return True
+
+        except Exception as e:
+            print(f"Erreur lors de l'actualisation: {e}")
+            return False
+
+    def _resolve_connections(self, policy: RefreshPolicy) -> RefreshPolicy:
+        """
+        Remplace les requêtes et connexions d'une politique restreinte par les
+        connexions actualisables du classeur (retrouvées par leur requête,
+        quel que soit leur nom). Si l'une d'elles est introuvable ou non
+        actualisable, la politique porte sur toutes les connexions.
+        """
+        if not policy.connections:
+            return policy
+        registry = self._connection_registry()
+        resolved, missing = registry.resolve(policy.connections)
+        missing += [name for name in resolved if not registry.get(name).refreshable]
+        if missing:
+            print(f"  ATTENTION: Requête(s) sans connexion actualisable: {', '.join(missing)}")
+            print("  Actualisation complète (RefreshAll)")
+            return policy.unrestricted()
+        return policy._copy(resolved)
+
+    def _refresh_dependents(self, connections: List[str], model: bool):
+        """
+        Après une actualisation connexion par connexion, actualise ce que
+        RefreshAll aurait actualisé avec elles : caches des tableaux croisés
+        alimentés par ces connexions (ou par leurs tableaux) et modèle de
+        données s'il charge l'une d'elles. Une source illisible est traitée
+        comme dépendante.
+        """
+        refreshed = set(connections)
+        registry = self._connection_registry()
+        registry.load_tables()
+        tables = set()
+        for name in connections:
+            info = registry.get(name)
+            if info is not None and info.list_object is not None:
+                try:
+                    tables.add(info.list_object.Name)
+                except Exception:
+                    pass
+
+        try:
+            caches = list(self.workbook.PivotCaches())
+        except Exception:
+            caches = []
+        count = 0
+        for cache in caches:
             try:
-                if self.workbook.Model:
-                    print("  Modèle de données détecté")
-                    try:
-                        self.workbook.Model.Refresh()
-                        print("  Modèle de données actualisé")
-                    except Exception as me:
-                        print(f"  Note: Modèle de données non actualisable ({me})")
-            except:
-                pass
+                depends = cache.WorkbookConnection.Name in refreshed
+            except Exception:
+                try:
+                    source = str(cache.SourceData)
+                    depends = any(table in source for table in tables)
+                except Exception:
+                    depends = True
+            if not depends:
+                continue
+            try:
+                cache.Refresh()
+                count += 1
+            except Exception as e:
+                print(f"  ATTENTION: Tableau croisé non actualisé ({e})")
+        if count:
+            print(f"  {count} cache(s) de tableaux croisés actualisé(s)")
+
+        if not model:
+            return
+        try:
+            data_model = self.workbook.Model
+            if not data_model:
+                return
+        except Exception:
+            return
+        try:
+            sources = {table.SourceWorkbookConnection.Name for table in data_model.ModelTables}
+            depends = bool(sources & refreshed)
+        except Exception:
+            depends = True
+        if depends:
+            try:
+                data_model.Refresh()
+                print("  Modèle de données actualisé")
+            except Exception as e:
+                print(f"  Note: Modèle de données non actualisable ({e})")
 
-            # Première actualisation
-            print("Actualisation des données (RefreshAll)...")
-            self.workbook.RefreshAll()
+    def _run_refresh_passes(self, policy: RefreshPolicy, timeout: float) -> bool:
+        """
+        Enchaîne les passes d'actualisation prévues par la politique, puis
+        les nouvelles tentatives limitées aux connexions en échec.
+
+        Returns:
+            True si toutes les connexions sont à jour (au besoin après
+            nouvelle tentative) ; False si une connexion reste en échec
+            ou si une passe n'a pas abouti avant le timeout
+        """
+        self.refresh_attempts = {}
+        if policy.connections is not None and not policy.connections:
+            print("  Aucune connexion à actualiser")
+            return True
+
+        tracker = RefreshTracker(self.workbook, self.backend, self._connection_registry())
+        dependencies = self._connection_dependencies() if policy.parallel > 1 else None
+        completed = self._refresh_passes(tracker, policy, timeout, dependencies)
+
+        failed = self._failed_connections(tracker, policy.connections)
+        attempted = self.refresh_passes[0] if self.refresh_passes else {}
+        self.refresh_attempts = {name: None if name in failed else 1 for name in attempted}
+        if not failed:
+            return completed
+        print(f"  Connexion(s) en échec: {', '.join(failed)}")
+        if not policy.retries:
+            return False
+        return self._retry_failed(tracker, policy, failed, timeout, dependencies)
+
+    def _refresh_passes(self, tracker: RefreshTracker, policy: RefreshPolicy, timeout: float,
+                        dependencies: Optional[Dict[str, Set[str]]]) -> bool:
+        """
+        Passes d'actualisation prévues par la politique (une ou deux).
+
+        Returns:
+            True si toutes les passes se sont terminées avant le timeout
+        """
+        start_time = time.time()
+
+        # Première actualisation
+        if dependencies is not None:
+            if not self._refresh_parallel(tracker, policy, policy.connections, dependencies, timeout):
+                return False
+        else:
+            print("Actualisation des données...")
+            self._refresh_connections(tracker, policy.connections)
 
             # Attendre que toutes les requêtes soient terminées
             print("  Attente de la fin des actualisations...")
-            start_time = time.time()
-            while True:
-                refreshing = False
-                for connection in self.workbook.Connections:
-                    try:
-                        if connection.OLEDBConnection:
-                            if connection.OLEDBConnection.Refreshing:
-                                refreshing = True
-                                break
-                    except:
-                        pass
-
-                if not refreshing:
-                    break
+            if not self._wait_refresh(tracker, timeout):
+                return False
 
-                if time.time() - start_time > timeout:
-                    print(f"  Timeout après {timeout} secondes")
-                    return False
+        if policy.mode == "double":
+            print("Deuxième actualisation (sécurité)...")
+            second_pass = policy.connections
+        elif policy.mode == "verify":
+            second_pass = tracker.stale()
+            if policy.connections is not None:
+                # Conserver l'ordre topologique du plan
+                second_pass = [name for name in policy.connections if name in second_pass]
+            if not second_pass:
+                print("  Données à jour, pas de deuxième actualisation")
+                return True
+            print(f"Deuxième actualisation ({len(second_pass)} connexion(s) non à jour)...")
+        else:
+            return True
 
-                time.sleep(2)
+        remaining = max(timeout - (time.time() - start_time), 0)
+        if dependencies is not None:
+            return self._refresh_parallel(tracker, policy, second_pass, dependencies, remaining)
+        self._refresh_connections(tracker, second_pass)
+        return self._wait_refresh(tracker, remaining)
 
-            # Attendre un peu pour que les calculs se terminent
-            time.sleep(3)
+    def _failed_connections(self, tracker: RefreshTracker, order: Optional[List[str]] = None) -> List[str]:
+        """
+        Connexions en échec à l'issue de la dernière passe : toujours en cours,
+        erreur signalée, date d'actualisation inchangée (voir RefreshTracker.stale)
+        ou tableau chargé vidé par l'actualisation (RefreshTracker.emptied).
 
-            # Deuxième actualisation (comme mentionné dans le process)
-            print("Deuxième actualisation (sécurité)...")
-            self.workbook.RefreshAll()
-            time.sleep(5)
+        Args:
+            order: Ordre d'actualisation (plan de la politique), sinon celui du classeur
+        """
+        failed = set(tracker.stale())
+        for name in tracker.emptied():
+            if name not in failed:
+                print(f"    {name}: plus aucune ligne chargée")
+                failed.add(name)
+        return [name for name in (order or tracker.names) if name in failed]
+
+    def _retry_failed(self, tracker: RefreshTracker, policy: RefreshPolicy, failed: List[str],
+                      timeout: float, dependencies: Optional[Dict[str, Set[str]]]) -> bool:
+        """
+        Actualise à nouveau les seules connexions en échec, jusqu'à policy.retries
+        fois, avec une attente doublée à chaque tentative (RETRY_DELAY_MAX au plus).
+
+        Returns:
+            True si toutes les connexions ont fini par aboutir
+        """
+        registry = self._connection_registry()
+        for retry in range(1, policy.retries + 1):
+            delay = min(policy.retry_delay * 2 ** (retry - 1), RETRY_DELAY_MAX)
+            print(f"Nouvelle tentative {retry}/{policy.retries} dans {delay:.0f} s"
+                  f" ({len(failed)} connexion(s))...")
+            # Actualisations encore en cours : interrompues avant d'être relancées
+            for name in tracker.pending():
+                registry.get(name).cancel()
+            time.sleep(delay)
+
+            if dependencies is not None:
+                self._refresh_parallel(tracker, policy, failed, dependencies, timeout)
+            else:
+                self._refresh_connections(tracker, failed)
+                self._wait_refresh(tracker, timeout)
+
+            still_failed = self._failed_connections(tracker, policy.connections)
+            for name in failed:
+                if name not in still_failed:
+                    self.refresh_attempts[name] = retry + 1
+                    print(f"  {name}: à jour (tentative {retry + 1})")
+            failed = still_failed
+            if not failed:
+                return True
 
-            # Forcer le recalcul de toutes les formules
-            print("Recalcul des formules...")
+        print(f"ERREUR: Connexion(s) toujours en échec après {policy.retries} nouvelle(s)"
+              f" tentative(s): {', '.join(failed)}")
+        return False
+
+    def _connection_dependencies(self) -> Optional[Dict[str, Set[str]]]:
+        """
+        Dépendances entre connexions de requêtes, d'après les formules M.
+
+        Returns:
+            Dictionnaire connexion -> connexions de requêtes amont,
+            ou None si le graphe n'a pas pu être construit (actualisation en série)
+        """
+        try:
+            graph = QueryGraph(self.get_query_formulas())
+        except Exception as e:
+            print(f"  ATTENTION: Graphe des requêtes indisponible ({e}), actualisation en série")
+            return None
+        registry = self._connection_registry()
+        connections = {name: registry.for_query(name) for name in graph.nodes}
+        loaded = [name for name, info in connections.items() if info is not None]
+        return {
+            connections[name].name: {connections[reference].name for reference in graph.upstream(name, loaded)}
+            for name in loaded
+        }
+
+    def _refresh_parallel(self, tracker: RefreshTracker, policy: RefreshPolicy,
+                          names: Optional[List[str]], dependencies: Dict[str, Set[str]],
+                          timeout: float) -> bool:
+        """
+        Actualise des connexions en arrière-plan, au plus policy.parallel à la fois.
+        Une connexion est lancée quand les connexions dont elle dépend (parmi
+        celles à actualiser) sont terminées ; une connexion en conflit est
+        lancée seule, une fois les autres terminées.
+
+        Returns:
+            True si toutes les connexions sont terminées avant le timeout
+        """
+        if names is None:
+            names = tracker.names
+        unknown = [name for name in names if name not in tracker.names]
+        if unknown:
+            print(f"  Connexion(s) absente(s), ignorée(s): {', '.join(unknown)}")
+        waiting = [name for name in names if name in tracker.names]
+        selected = set(waiting)
+        registry = self._connection_registry()
+        conflicting = set(registry.resolve(policy.conflicting)[0])
+        print(f"Actualisation des données ({len(waiting)} connexion(s), {policy.parallel} en parallèle)...")
+
+        tracker.arm([])
+        deadline = time.perf_counter() + timeout
+        running: Set[str] = set()
+        done: Set[str] = set()
+        while waiting or running:
+            for name in list(waiting):
+                if len(running) >= policy.parallel or running & conflicting:
+                    break
+                if not (dependencies.get(name, set()) & selected) <= done:
+                    continue
+                if name in conflicting and running:
+                    break
+                waiting.remove(name)
+                tracker.launch(name)
+                running.add(name)
+                try:
+                    registry.get(name).connection.Refresh()
+                except Exception as e:
+                    print(f"  ERREUR: Actualisation de '{name}' impossible: {e}")
+                    tracker.settle(name, False)
+                if name in conflicting:
+                    break
+            if not running:
+                print(f"  ERREUR: Dépendances circulaires, non actualisées: {', '.join(waiting)}")
+                break
+            finished = tracker.wait_any(deadline)
+            if not finished:
+                break
+            running.difference_update(finished)
+            done.update(finished)
+        if waiting and running:
+            print(f"  Non lancée(s) avant le timeout: {', '.join(waiting)}")
+
+        return self._report_pass(tracker, tracker.durations(), timeout) and not waiting
+
+    def _refresh_connections(self, tracker: RefreshTracker, names: Optional[List[str]] = None):
+        """
+        Lance l'actualisation de connexions (toutes via RefreshAll si names est None),
+        une à une dans l'ordre donné sinon.
+        """
+        if names is None:
+            tracker.arm()
+            self.workbook.RefreshAll()
+            return
+        unknown = [name for name in names if name not in tracker.names]
+        if unknown:
+            print(f"  Connexion(s) absente(s), ignorée(s): {', '.join(unknown)}")
+        names = [name for name in names if name in tracker.names]
+        tracker.arm(names)
+        registry = self._connection_registry()
+        for name in names:
+            try:
+                registry.get(name).connection.Refresh()
+            except Exception as e:
+                print(f"  ERREUR: Actualisation de '{name}' impossible: {e}")
+                tracker.settle(name, False)
+
+    def _recalculate(self, mode: str = "full"):
+        """Recalcule les formules du classeur ("full", "normal" ou "none")."""
+        if mode == "none":
+            return
+        print("Recalcul des formules...")
+        method = "CalculateFull" if mode == "full" else "Calculate"
+        try:
+            getattr(self.excel, method)()
+        except:
             try:
-                self.excel.CalculateFull()
+                getattr(self.workbook.Application, method)()
             except:
-                try:
-                    self.workbook.Application.CalculateFull()
-                except:
-                    pass
+                pass
 
-            print("Actualisation terminée")
-            return True
+    def _wait_refresh(self, tracker: RefreshTracker, timeout: float) -> bool:
+        """
+        Attend la fin des connexions armées et affiche la durée de chacune.
 
-        except Exception as e:
-            print(f"Erreur lors de l'actualisation: {e}")
+        Returns:
+            True si toutes les connexions sont terminées avant le timeout
+        """
+        return self._report_pass(tracker, tracker.wait(timeout), timeout)
+
+    def _report_pass(self, tracker: RefreshTracker, durations: Dict[str, Optional[float]],
+                     timeout: float) -> bool:
+        """Enregistre et affiche les durées d'une passe ; False si des connexions sont en cours."""
+        self.refresh_passes.append(durations)
+        for name, elapsed in durations.items():
+            if elapsed is None:
+                print(f"    {name}: non terminée")
+            else:
+                print(f"    {name}: {elapsed:.1f} s")
+        pending = tracker.pending()
+        if pending:
+            print(f"  Timeout après {timeout:.0f} secondes ({len(pending)} connexion(s) en cours)")
             return False
+        return True
 
     def update_external_links(self) -> bool:
         """
@@ -347,12 +804,13 @@ class ExcelAutomation:
             sheet = self.workbook.Sheets(sheet_name)
             used_range = sheet.UsedRange
 
+            rows = used_range.Rows.Count
             result = {
                 "success": True,
                 "sheet_name": sheet_name,
-                "rows": used_range.Rows.Count,
+                "rows": rows,
                 "columns": used_range.Columns.Count,
-                "has_data": used_range.Rows.Count > 1,
+                "has_data": rows > 1,
             }
 
             if check_yesterday:
@@ -360,15 +818,13 @@ class ExcelAutomation:
                 yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
                 yesterday_found = False
 
-                # Parcourir les premières lignes pour trouver la date
-                for row in range(1, min(used_range.Rows.Count + 1, 100)):
-                    cell_value = sheet.Cells(row, 1).Value
-                    if cell_value:
-                        if isinstance(cell_value, datetime):
-                            cell_date = cell_value.strftime("%Y-%m-%d")
-                            if cell_date == yesterday:
-                                yesterday_found = True
-                                break
+                # Lire les premières lignes en un seul transfert
+                last_row = min(rows, 99)
+                for (cell_value,) in self.read_range(sheet_name, f"A1:A{last_row}") or ():
+                    if isinstance(cell_value, datetime):
+                        if cell_value.strftime("%Y-%m-%d") == yesterday:
+                            yesterday_found = True
+                            break
 
                 result["yesterday_data"] = yesterday_found
                 if yesterday_found:
@@ -430,6 +886,127 @@ class ExcelAutomation:
             print(f"Erreur écriture {sheet_name}!{cell}: {e}")
             return False
 
+    @staticmethod
+    def _parse_address(address: str):
+        """'B2:D10' -> (2, 2, 10, 4) ; une seule cellule est acceptée."""
+        parts = address.replace("$", "").split(":")
+        first_col, first_row = split_cell_ref(parts[0])
+        last_col, last_row = split_cell_ref(parts[-1])
+        return first_row, column_index(first_col), last_row, column_index(last_col)
+
+    @staticmethod
+    def _as_rows(value) -> tuple:
+        """Normalise la valeur d'une plage (scalaire pour une cellule) en tuple de lignes."""
+        if isinstance(value, tuple):
+            return value
+        return ((value,),)
+
+    def iter_range(self, sheet_name: str, address: Optional[str] = None,
+                   chunk_rows: int = RANGE_CHUNK_ROWS):
+        """
+        Lit une plage par blocs de lignes, un transfert Range.Value par bloc.
+
+        Args:
+            sheet_name: Nom de la feuille
+            address: Plage (ex: "A1:F5000"), par défaut la plage utilisée
+            chunk_rows: Nombre maximal de lignes par bloc
+
+        Yields:
+            Tuples (numéro de la première ligne du bloc, lignes du bloc)
+        """
+        sheet = self.workbook.Sheets(sheet_name)
+        if address is None:
+            used_range = sheet.UsedRange
+            first_row, first_col = used_range.Row, used_range.Column
+            last_row = first_row + used_range.Rows.Count - 1
+            last_col = first_col + used_range.Columns.Count - 1
+        else:
+            first_row, first_col, last_row, last_col = self._parse_address(address)
+
+        columns = f"{column_letters(first_col)}{{}}:{column_letters(last_col)}{{}}"
+        for start in range(first_row, last_row + 1, chunk_rows):
+            end = min(start + chunk_rows - 1, last_row)
+            yield start, self._as_rows(sheet.Range(columns.format(start, end)).Value)
+
+    def read_range(self, sheet_name: str, address: Optional[str] = None,
+                   chunk_rows: int = RANGE_CHUNK_ROWS, as_numpy: bool = False):
+        """
+        Lit une plage entière en un minimum d'appels COM.
+
+        Args:
+            sheet_name: Nom de la feuille
+            address: Plage (ex: "A1:F5000"), par défaut la plage utilisée
+            chunk_rows: Nombre maximal de lignes par transfert
+            as_numpy: Si True, retourne un tableau NumPy 2-D (dtype object)
+
+        Returns:
+            Tuple de lignes (tuples de valeurs), tableau NumPy, ou None en cas d'erreur
+        """
+        if not self.workbook:
+            print("Aucun classeur ouvert")
+            return None
+
+        try:
+            rows = []
+            for _, block in self.iter_range(sheet_name, address, chunk_rows):
+                rows.extend(block)
+        except Exception as e:
+            print(f"Erreur lecture {sheet_name}!{address or 'UsedRange'}: {e}")
+            return None
+
+        if as_numpy:
+            try:
+                import numpy
+            except ImportError:
+                raise ImportError(
+                    "numpy n'est pas installé. "
+                    "Exécutez: pip install numpy"
+                )
+            return numpy.array(rows, dtype=object)
+        return tuple(rows)
+
+    def write_range(self, sheet_name: str, top_left: str, values,
+                    chunk_rows: int = RANGE_CHUNK_ROWS) -> bool:
+        """
+        Écrit un bloc de valeurs, un transfert Range.Value par paquet de lignes.
+
+        Args:
+            sheet_name: Nom de la feuille
+            top_left: Cellule en haut à gauche du bloc (ex: "A2")
+            values: Lignes de valeurs (séquence de séquences ou tableau NumPy 2-D)
+            chunk_rows: Nombre maximal de lignes par transfert
+
+        Returns:
+            True si l'écriture est réussie
+        """
+        if not self.workbook:
+            print("Aucun classeur ouvert")
+            return False
+
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        rows = [tuple(row) for row in values]
+        if not rows:
+            return True
+        width = max(len(row) for row in rows)
+        rows = [row + (None,) * (width - len(row)) for row in rows]
+
+        try:
+            sheet = self.workbook.Sheets(sheet_name)
+            column, first_row = split_cell_ref(top_left)
+            first_col = column_index(column)
+            last_col = column_letters(first_col + width - 1)
+            for offset in range(0, len(rows), chunk_rows):
+                block = rows[offset:offset + chunk_rows]
+                start = first_row + offset
+                end = start + len(block) - 1
+                sheet.Range(f"{column}{start}:{last_col}{end}").Value = tuple(block)
+            print(f"Écriture {sheet_name}!{top_left}: {len(rows)} ligne(s) x {width} colonne(s)")
+            return True
+        except Exception as e:
+            print(f"Erreur écriture {sheet_name}!{top_left}: {e}")
+            return False
+
     def check_connections_status(self) -> bool:
         """
         Vérifie l'état de toutes les connexions du classeur.
@@ -443,21 +1020,13 @@ class ExcelAutomation:
 
         try:
             all_ok = True
-            for connection in self.workbook.Connections:
-                try:
-                    name = connection.Name
-                    refreshing = False
-                    try:
-                        refreshing = connection.OLEDBConnection.Refreshing
-                    except:
-                        pass
-                    status = "En cours" if refreshing else "OK"
-                    if refreshing:
-                        all_ok = False
-                    print(f"  Connexion '{name}': {status}")
-                except Exception as e:
-                    print(f"  Connexion erreur: {e}")
+            for info in self._connection_registry():
+                # Connexions sans objet OLEDB/ODBC : jamais en cours d'actualisation
+                refreshing = info.refreshable and bool(info.is_refreshing())
+                status = "En cours" if refreshing else "OK"
+                if refreshing:
                     all_ok = False
+                print(f"  Connexion '{info.name}': {status}")
 
             if all_ok:
                 print("Toutes les connexions sont OK")
@@ -468,6 +1037,28 @@ class ExcelAutomation:
             print(f"Erreur vérification connexions: {e}")
             return False
 
+    def _connection_registry(self) -> ConnectionRegistry:
+        """
+        Registre des connexions du classeur ouvert.
+        Construit une seule fois par classeur : activation, suivi des
+        actualisations et vérification partagent la même énumération COM.
+        """
+        if self._connections is None:
+            self._connections = ConnectionRegistry(self.workbook)
+        return self._connections
+
+    def _query_index(self) -> Dict[str, object]:
+        """
+        Index nom (minuscules) -> objet WorkbookQuery.
+        Construit une seule fois par classeur ouvert : une seule énumération
+        COM de workbook.Queries au lieu d'une par lecture/écriture.
+        """
+        if self._queries is None:
+            self._queries = {}
+            for query in self.workbook.Queries:
+                self._queries[query.Name.lower()] = query
+        return self._queries
+
     def get_query_formula(self, query_name: str) -> Optional[str]:
         """
         Lit la formule M d'une requête Power Query.
@@ -483,20 +1074,31 @@ class ExcelAutomation:
             return None
 
         try:
-            for query in self.workbook.Queries:
-                if query.Name.lower() == query_name.lower():
-                    formula = query.Formula
-                    print(f"Requête '{query_name}' trouvée")
-                    return formula
+            query = self._query_index().get(query_name.lower())
+            if query is not None:
+                formula = query.Formula
+                print(f"Requête '{query_name}' trouvée")
+                return formula
             print(f"ERREUR: Requête '{query_name}' non trouvée")
             print("  Requêtes disponibles:")
-            for query in self.workbook.Queries:
+            for query in self._query_index().values():
                 print(f"    - {query.Name}")
             return None
         except Exception as e:
             print(f"Erreur lecture requête '{query_name}': {e}")
             return None
 
+    def get_query_formulas(self) -> Dict[str, str]:
+        """
+        Formules M de toutes les requêtes du classeur.
+
+        Returns:
+            Dictionnaire nom -> formule
+        """
+        if not self.workbook:
+            return {}
+        return {query.Name: query.Formula for query in self._query_index().values()}
+
     def set_query_formula(self, query_name: str, formula: str) -> bool:
         """
         Met à jour la formule M d'une requête Power Query.
@@ -508,21 +1110,37 @@ class ExcelAutomation:
         Returns:
             True si la mise à jour est réussie
         """
+        return self.set_query_formulas({query_name: formula})
+
+    def set_query_formulas(self, formulas: Dict[str, str]) -> bool:
+        """
+        Met à jour plusieurs formules M en une seule opération.
+
+        Args:
+            formulas: Dictionnaire nom de requête -> nouvelle formule
+
+        Returns:
+            True si toutes les requêtes ont été trouvées et mises à jour
+        """
         if not self.workbook:
             print("Aucun classeur ouvert")
             return False
 
-        try:
-            for query in self.workbook.Queries:
-                if query.Name.lower() == query_name.lower():
-                    query.Formula = formula
-                    print(f"Requête '{query_name}' mise à jour")
-                    return True
-            print(f"ERREUR: Requête '{query_name}' non trouvée")
-            return False
-        except Exception as e:
-            print(f"Erreur mise à jour requête '{query_name}': {e}")
-            return False
+        all_ok = True
+        index = self._query_index()
+        for query_name, formula in formulas.items():
+            try:
+                query = index.get(query_name.lower())
+                if query is None:
+                    print(f"ERREUR: Requête '{query_name}' non trouvée")
+                    all_ok = False
+                    continue
+                query.Formula = formula
+                print(f"Requête '{query_name}' mise à jour")
+            except Exception as e:
+                print(f"Erreur mise à jour requête '{query_name}': {e}")
+                all_ok = False
+        return all_ok
 
     def get_sheet_names(self) -> List[str]:
         """
@@ -593,19 +1211,28 @@ class ExcelAutomation:
         try:
             self.workbook.Close(SaveChanges=save)
             self.workbook = None
+            self._queries = None
+            self._connections = None
             print("Classeur fermé")
             return True
         except Exception as e:
             print(f"Erreur de fermeture: {e}")
             return False
 
+    def is_alive(self) -> bool:
+        """Vérifie que l'application Excel répond encore."""
+        try:
+            self.excel.Workbooks.Count
+            return True
+        except Exception:
+            return False
+
     def quit(self):
         """Ferme l'application Excel."""
         try:
             if self.workbook:
                 self.close(save=False)
-            self.excel.Quit()
-            self._pythoncom.CoUninitialize()
+            self.backend.stop(self.excel)
             print("Excel fermé")
         except Exception as e:
             print(f"Erreur lors de la fermeture d'Excel: {e}")
@@ -0,0 +1,162 @@
+"""
+Backends fournissant l'objet Application Excel utilisé par ExcelAutomation.
+
+ExcelAutomation ne dépend que du modèle objet Excel (Workbooks.Open,
+Sheets/Range/Cells, Connections, Queries, LinkSources/ChangeLink/UpdateLink,
+Model.Refresh, CalculateFull, Save). Le backend choisit qui fournit ce modèle :
+    - "com"  : Excel réel via pywin32 (Windows uniquement)
+    - "fake" : Excel simulé en mémoire (voir src/fake_excel.py), pour
+               exécuter et mesurer les scripts sous Linux
+"""
+import json
+from pathlib import Path
+from typing import Optional
+
+from config import EXCEL_BACKEND, FAKE_EXCEL_LATENCIES
+from src.com_trace import unwrap
+
+
+class ExcelBackend:
+    """
+    Interface d'un backend Excel.
+
+    start() retourne un objet Application compatible avec le modèle objet
+    Excel ; stop() libère les ressources associées.
+    """
+
+    name = "base"
+
+    def start(self, visible: bool = True, new_instance: bool = False):
+        """
+        Démarre (ou récupère) l'application Excel et la retourne.
+
+        Args:
+            visible: Si True, Excel est visible
+            new_instance: Si True, force un processus Excel dédié (exécution parallèle)
+        """
+        raise NotImplementedError
+
+    def stop(self, application):
+        """Ferme l'application et libère l'environnement (COM, etc.)."""
+        raise NotImplementedError
+
+    def attach(self):
+        """
+        Récupère une instance Excel d'automatisation déjà lancée.
+
+        Returns:
+            Application, ou None si aucune instance réutilisable (stop() s'applique ensuite)
+        """
+        return None
+
+    def pump_messages(self):
+        """Traite les messages en attente (évènements COM). Sans effet par défaut."""
+
+    def with_events(self, com_object, handler_class):
+        """
+        Branche un gestionnaire d'évènements sur un objet.
+
+        Returns:
+            Instance du gestionnaire, ou None si le backend ne gère pas les évènements
+        """
+        return None
+
+
+class Win32ComBackend(ExcelBackend):
+    """Excel réel piloté par COM (pywin32)."""
+
+    name = "com"
+
+    def __init__(self):
+        try:
+            import win32com.client
+            import pythoncom
+        except ImportError:
+            raise ImportError(
+                "pywin32 n'est pas installé. "
+                "Exécutez: pip install pywin32"
+            )
+        self._client = win32com.client
+        self._pythoncom = pythoncom
+
+    def start(self, visible: bool = True, new_instance: bool = False):
+        self._pythoncom.CoInitialize()
+        if new_instance:
+            return self._client.DispatchEx("Excel.Application")
+        return self._client.Dispatch("Excel.Application")
+
+    def stop(self, application):
+        try:
+            application.Quit()
+        finally:
+            self._pythoncom.CoUninitialize()
+
+    def attach(self):
+        self._pythoncom.CoInitialize()
+        try:
+            application = self._client.GetActiveObject("Excel.Application")
+            # Ne jamais reprendre l'Excel d'un utilisateur (classeurs ouverts à la main)
+            if not application.UserControl:
+                return application
+        except Exception:
+            pass
+        self._pythoncom.CoUninitialize()
+        return None
+
+    def pump_messages(self):
+        self._pythoncom.PumpWaitingMessages()
+
+    def with_events(self, com_object, handler_class):
+        try:
+            return self._client.WithEvents(unwrap(com_object), handler_class)
+        except Exception:
+            return None
+
+
+_fake_backend = None
+
+
+def load_latencies(value: str) -> dict:
+    """
+    Charge le profil de latences du faux Excel.
+
+    Args:
+        value: JSON en ligne ou chemin d'un fichier JSON (vide = aucune latence)
+
+    Returns:
+        Dictionnaire {"calls": {...}, "refresh": {...}, "failures": {...}}
+    """
+    if not value:
+        return {}
+    if value.lstrip().startswith("{"):
+        return json.loads(value)
+    return json.loads(Path(value).read_text(encoding="utf-8"))
+
+
+def get_backend(name: Optional[str] = None) -> ExcelBackend:
+    """
+    Retourne le backend Excel configuré.
+
+    Args:
+        name: "com" ou "fake" (par défaut: variable EXCEL_BACKEND)
+
+    Returns:
+        Instance de backend
+    """
+    name = (name or EXCEL_BACKEND).lower()
+    if name == "com":
+        return Win32ComBackend()
+    if name == "fake":
+        # Un seul Excel simulé par processus : les compteurs d'appels
+        # s'additionnent sur l'ensemble des scripts exécutés
+        global _fake_backend
+        if _fake_backend is None:
+            from src.fake_excel import FakeExcelBackend
+            latencies = load_latencies(FAKE_EXCEL_LATENCIES)
+            _fake_backend = FakeExcelBackend(
+                call_latencies=latencies.get("calls"),
+                refresh_latencies=latencies.get("refresh"),
+                refresh_failures=latencies.get("failures"),
+            )
+        return _fake_backend
+    raise ValueError(f"Backend Excel inconnu: {name}")
@@ -0,0 +1,106 @@
+"""
+Session Excel partagée entre plusieurs scripts de mise à jour.
+
+Le lanceur exécute KPIS, MDR, PMA, PRODUIT, CRM... à la suite. Plutôt que
+de démarrer puis quitter Excel pour chacun (plusieurs secondes à chaque
+démarrage à froid), une seule instance masquée est démarrée (ou reprise si
+une instance d'automatisation tourne déjà), passée à chaque script, et
+fermée une seule fois à la fin. Elle n'est recréée qu'après un échec.
+
+Usage:
+    with ExcelSession() as session:
+        session.run("KPIS", run_kpis)
+        session.run("MDR", run_mdr)
+"""
+from typing import Callable, Optional
+
+from src.excel_automation import ExcelAutomation
+from src.excel_backend import ExcelBackend, get_backend
+
+
+class ExcelSession:
+    """Instance Excel unique, démarrée à la demande et recyclée après un échec."""
+
+    def __init__(self, visible: bool = False, backend: Optional[ExcelBackend] = None,
+                 attach: bool = True):
+        """
+        Args:
+            visible: Si True, Excel est visible pendant l'exécution
+            backend: Backend Excel (par défaut: celui de la variable EXCEL_BACKEND)
+            attach: Si True, reprend une instance d'automatisation déjà lancée
+        """
+        self.visible = visible
+        self.backend = backend or get_backend()
+        self.attach = attach
+        self._excel: Optional[ExcelAutomation] = None
+        self.starts = 0
+        self.recycles = 0
+
+    def __enter__(self) -> "ExcelSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def get(self) -> ExcelAutomation:
+        """
+        Retourne l'instance partagée, en la (re)démarrant si nécessaire.
+
+        Returns:
+            Instance ExcelAutomation prête à ouvrir un classeur
+        """
+        if self._excel is not None and not self._excel.is_alive():
+            print("ATTENTION: Excel ne répond plus, redémarrage")
+            self._discard()
+        if self._excel is None:
+            application = None
+            if self.attach and self.starts == 0:
+                application = self.backend.attach()
+                if application is not None:
+                    print("Instance Excel existante reprise")
+            self._excel = ExcelAutomation(
+                visible=self.visible, backend=self.backend, application=application
+            )
+            self.starts += 1
+        return self._excel
+
+    def run(self, name: str, main: Callable[..., bool]) -> bool:
+        """
+        Exécute le main d'un script avec l'instance partagée.
+        En cas d'échec, l'instance est recyclée pour le script suivant.
+
+        Args:
+            name: Nom affiché du traitement
+            main: Fonction main(excel=...) du script
+
+        Returns:
+            Résultat du script (False en cas d'exception)
+        """
+        try:
+            success = bool(main(excel=self.get()))
+        except Exception as e:
+            print(f"ERREUR ({name}): {e}")
+            success = False
+        if not success:
+            self.recycle()
+        return success
+
+    def recycle(self):
+        """Ferme l'instance courante ; la suivante sera démarrée à la demande."""
+        if self._excel is not None:
+            print("Recyclage de l'instance Excel")
+            self.recycles += 1
+            self._discard()
+
+    def _discard(self):
+        excel, self._excel = self._excel, None
+        try:
+            excel.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Ferme définitivement l'instance partagée."""
+        if self._excel is not None:
+            self._discard()
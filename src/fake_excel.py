@@ -0,0 +1,556 @@
+"""
+Excel simulé en mémoire, compatible avec le sous-ensemble du modèle objet
+utilisé par ExcelAutomation.
+
+Permet d'exécuter les scripts de mise à jour sous Linux (EXCEL_BACKEND=fake)
+pour mesurer le coût de l'orchestration. Les classeurs sont lus et
+sauvegardés via OOXMLWorkbook ; chaque accès à un attribut ou méthode
+publique compte comme un aller-retour COM et peut se voir attribuer une
+latence, de même que l'actualisation de chaque connexion.
+"""
+import html
+import re
+import time
+import threading
+from collections import Counter
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+
+from src.connection_registry import connection_query
+from src.excel_backend import ExcelBackend
+from src.ooxml_workbook import OOXMLWorkbook, split_cell_ref, column_index, column_letters
+
+# Préfixe des connexions créées par Power Query (Excel en français), pour
+# les classeurs sans xl/connections.xml
+QUERY_CONNECTION_PREFIX = "Requête - "
+MASHUP_CONNECTION = 'Provider=Microsoft.Mashup.OleDb.1;Data Source=$Workbook$;Location={};Extended Properties=""'
+
+_CONNECTION_RE = re.compile(r'<connection\b[^>]*?\bname="([^"]*)"[^>]*>\s*<dbPr\b[^>]*?\bconnection="([^"]*)"')
+
+
+class FakeComError(Exception):
+    """Erreur levée là où Excel lèverait une com_error."""
+
+
+def _item_name(item) -> str:
+    """Nom d'un élément de collection, lu sans aller-retour COM."""
+    return getattr(item, "_name", None) or vars(item).get("Name", "")
+
+
+class _FakeObject:
+    """Objet simulé : chaque accès public compte comme un aller-retour COM."""
+
+    def __getattribute__(self, name):
+        if not name.startswith("_"):
+            object.__getattribute__(self, "_backend").round_trip(name)
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_"):
+            object.__getattribute__(self, "_backend").round_trip(name)
+        object.__setattr__(self, name, value)
+
+
+class FakeCollection(_FakeObject):
+    """Collection COM : appelable par nom/index (base 1), itérable."""
+
+    def __init__(self, backend, items, key=_item_name):
+        self._backend = backend
+        self._items = items
+        self._key = key
+
+    def __call__(self, key):
+        return self.Item(key)
+
+    def Item(self, key):
+        if isinstance(key, int):
+            if 1 <= key <= len(self._items):
+                return self._items[key - 1]
+        else:
+            for item in self._items:
+                if self._key(item).lower() == str(key).lower():
+                    return item
+        raise FakeComError(f"Élément introuvable: {key}")
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FakeRangeAxis(_FakeObject):
+    def __init__(self, backend, count):
+        self._backend = backend
+        self._count = count
+
+    @property
+    def Count(self):
+        return self._count
+
+
+class FakeRange(_FakeObject):
+    """Plage rectangulaire d'une feuille."""
+
+    def __init__(self, sheet, first_row, first_col, last_row, last_col):
+        self._backend = sheet._backend
+        self._sheet = sheet
+        self._bounds = (first_row, first_col, last_row, last_col)
+
+    @property
+    def Value(self):
+        first_row, first_col, last_row, last_col = self._bounds
+        cells = self._sheet._cells()
+        if (first_row, first_col) == (last_row, last_col):
+            return cells.get((first_row, first_col))
+        return tuple(
+            tuple(cells.get((row, col)) for col in range(first_col, last_col + 1))
+            for row in range(first_row, last_row + 1)
+        )
+
+    @Value.setter
+    def Value(self, value):
+        first_row, first_col, last_row, last_col = self._bounds
+        if (first_row, first_col) == (last_row, last_col):
+            # Comme Excel : un tableau 1x1 affecté à une cellule donne sa valeur
+            while isinstance(value, tuple) and len(value) == 1:
+                value = value[0]
+            self._sheet._set(first_row, first_col, value)
+            return
+        for r, row_values in enumerate(value):
+            for c, cell_value in enumerate(row_values):
+                self._sheet._set(first_row + r, first_col + c, cell_value)
+
+    @property
+    def Rows(self):
+        return FakeRangeAxis(self._backend, self._bounds[2] - self._bounds[0] + 1)
+
+    @property
+    def Columns(self):
+        return FakeRangeAxis(self._backend, self._bounds[3] - self._bounds[1] + 1)
+
+    @property
+    def Row(self):
+        return self._bounds[0]
+
+    @property
+    def Column(self):
+        return self._bounds[1]
+
+    @property
+    def Address(self):
+        first_row, first_col, last_row, last_col = self._bounds
+        address = f"${column_letters(first_col)}${first_row}"
+        if (first_row, first_col) != (last_row, last_col):
+            address += f":${column_letters(last_col)}${last_row}"
+        return address
+
+
+class FakeSheet(_FakeObject):
+    """Feuille de calcul : valeurs chargées à la demande depuis le fichier."""
+
+    def __init__(self, workbook, name):
+        self._backend = workbook._backend
+        self._workbook = workbook
+        self._name = name
+        self._values = None
+        self._dirty = set()
+
+    @property
+    def Name(self):
+        return self._name
+
+    def _cells(self) -> Dict[tuple, object]:
+        if self._values is None:
+            self._values = {}
+            book = self._workbook._book
+            if book is not None:
+                for ref, value in book.iter_values(self._name):
+                    column, row = split_cell_ref(ref)
+                    self._values[(row, column_index(column))] = value
+        return self._values
+
+    def _set(self, row, col, value):
+        cells = self._cells()
+        if value is None:
+            cells.pop((row, col), None)
+        else:
+            cells[(row, col)] = value
+        self._dirty.add((row, col))
+
+    def Range(self, ref: str):
+        ref = ref.replace("$", "").upper()
+        parts = ref.split(":")
+        column, row = split_cell_ref(parts[0])
+        last_column, last_row = split_cell_ref(parts[-1])
+        return FakeRange(self, row, column_index(column), last_row, column_index(last_column))
+
+    def Cells(self, row: int, col: int):
+        return FakeRange(self, row, col, row, col)
+
+    @property
+    def UsedRange(self):
+        cells = self._cells()
+        if not cells:
+            return FakeRange(self, 1, 1, 1, 1)
+        rows = [row for row, _ in cells]
+        cols = [col for _, col in cells]
+        return FakeRange(self, min(rows), min(cols), max(rows), max(cols))
+
+
+class FakeOLEDBConnection(_FakeObject):
+    """Partie OLEDB d'une connexion (Power Query)."""
+
+    def __init__(self, connection, connection_string: str):
+        self._backend = connection._backend
+        self._connection = connection
+        self.__dict__.update(
+            Connection=connection_string,
+            EnableRefresh=True,
+            BackgroundQuery=True,
+            AlwaysUseConnectionFile=False,
+            RefreshDate=None,
+        )
+
+    @property
+    def Refreshing(self):
+        return self._connection._is_refreshing()
+
+    def Refresh(self):
+        self._connection._refresh()
+
+    def CancelRefresh(self):
+        self._connection._ends_at = 0.0
+
+
+class FakeConnection(_FakeObject):
+    """Connexion de classeur (xlConnectionTypeOLEDB = 1)."""
+
+    def __init__(self, workbook, name, connection_string: str):
+        self._backend = workbook._backend
+        self._workbook = workbook
+        self._name = name
+        self._ends_at = 0.0
+        self._oledb = FakeOLEDBConnection(self, connection_string)
+
+    @property
+    def Name(self):
+        return self._name
+
+    @property
+    def Type(self):
+        return 1
+
+    @property
+    def OLEDBConnection(self):
+        return self._oledb
+
+    @property
+    def ODBCConnection(self):
+        raise FakeComError("Connexion non ODBC")
+
+    def _is_refreshing(self) -> bool:
+        return time.monotonic() < self._ends_at
+
+    def _refresh(self):
+        # vars() : lecture interne sans compter d'aller-retour COM
+        settings = vars(self._oledb)
+        if not settings["EnableRefresh"]:
+            return
+        query = connection_query(settings["Connection"])
+        latency = self._backend.refresh_latency(self._name, query)
+        self._backend.refresh_counts[self._name] += 1
+        if self._backend.refresh_fails(self._name, query):
+            raise FakeComError(f"Échec de l'actualisation: {self._name}")
+        if settings["BackgroundQuery"]:
+            self._ends_at = max(self._ends_at, time.monotonic() + latency)
+        else:
+            time.sleep(latency)
+        settings["RefreshDate"] = datetime.now()
+
+    def Refresh(self):
+        self._refresh()
+
+
+class FakeQuery(_FakeObject):
+    """Requête Power Query (WorkbookQuery)."""
+
+    def __init__(self, workbook, name, formula):
+        self._backend = workbook._backend
+        self._workbook = workbook
+        self.__dict__.update(Name=name, Formula=formula)
+
+
+class FakeModel(_FakeObject):
+    """Modèle de données du classeur."""
+
+    def __init__(self, workbook):
+        self._backend = workbook._backend
+
+    def Refresh(self):
+        time.sleep(self._backend.refresh_latency("Model"))
+
+
+class FakeQueries(FakeCollection):
+    """Collection Queries ; FastCombine est conservé par le classeur."""
+
+    def __init__(self, workbook):
+        super().__init__(workbook._backend, workbook._queries)
+        self._workbook = workbook
+
+    @property
+    def FastCombine(self):
+        return self._workbook._fast_combine
+
+    @FastCombine.setter
+    def FastCombine(self, value):
+        self._workbook._fast_combine = bool(value)
+
+
+class FakeWorkbook(_FakeObject):
+    """Classeur simulé, initialisé à partir du fichier OOXML."""
+
+    def __init__(self, application, file_path: Path):
+        self._backend = application._backend
+        self._application = application
+        self._path = Path(file_path)
+        self._book: Optional[OOXMLWorkbook] = None
+        sheets, queries, links = [], [], []
+        if self._path.exists():
+            self._book = OOXMLWorkbook(self._path)
+            sheets = self._book.get_sheet_names()
+            catalog = self._book.queries
+            if catalog is not None:
+                queries = catalog.items()
+            links = self._book.get_external_links()
+
+        self._sheets = [FakeSheet(self, name) for name in sheets]
+        self._queries = [FakeQuery(self, name, formula) for name, formula in queries]
+        self._original_formulas = dict(queries)
+        connections = self._read_connections()
+        if not connections:
+            connections = {
+                QUERY_CONNECTION_PREFIX + name: MASHUP_CONNECTION.format(name) for name, _ in queries
+            }
+        self._connections = [
+            FakeConnection(self, name, connection_string) for name, connection_string in connections.items()
+        ]
+        self._links = list(links)
+        self._original_links = list(links)
+        self._model = FakeModel(self)
+        # Permissions réinitialisées à l'ouverture, comme après une édition hors Excel
+        self._fast_combine = False
+        self.__dict__["EnableAutoRecover"] = False
+
+    def _read_connections(self) -> Dict[str, str]:
+        """Connexions du classeur (xl/connections.xml) : nom -> chaîne de connexion."""
+        if self._book is None or not self._book.has_part("xl/connections.xml"):
+            return {}
+        xml = self._book.read_part("xl/connections.xml").decode("utf-8")
+        return {
+            html.unescape(name): html.unescape(connection_string)
+            for name, connection_string in _CONNECTION_RE.findall(xml)
+        }
+
+    @property
+    def Name(self):
+        return self._path.name
+
+    @property
+    def FullName(self):
+        return str(self._path)
+
+    @property
+    def Application(self):
+        return self._application
+
+    @property
+    def Sheets(self):
+        return FakeCollection(self._backend, self._sheets)
+
+    @property
+    def Worksheets(self):
+        return self.Sheets
+
+    @property
+    def Connections(self):
+        return FakeCollection(self._backend, self._connections)
+
+    @property
+    def Queries(self):
+        return FakeQueries(self)
+
+    @property
+    def Model(self):
+        return self._model
+
+    def RefreshAll(self):
+        # Comme Excel, une connexion en erreur n'interrompt pas les suivantes
+        for connection in self._connections:
+            try:
+                connection._refresh()
+            except FakeComError:
+                pass
+
+    def LinkSources(self, link_type: int = 1):
+        return tuple(self._links) if self._links else None
+
+    def ChangeLink(self, old_path: str, new_path: str, link_type: int = 1):
+        for index, link in enumerate(self._links):
+            if link.lower() == old_path.lower():
+                self._links[index] = new_path
+                return
+        raise FakeComError(f"Liaison introuvable: {old_path}")
+
+    def UpdateLink(self, name: str, link_type: int = 1):
+        time.sleep(self._backend.refresh_latency("UpdateLink"))
+
+    def Save(self):
+        self._save_to(self._path)
+
+    def SaveAs(self, file_path: str):
+        self._save_to(Path(file_path))
+        self._path = Path(file_path)
+
+    def _save_to(self, target: Path):
+        book = self._book
+        if book is None:
+            raise FakeComError("Classeur vide : sauvegarde non simulée")
+        for sheet in self._sheets:
+            values = sheet._values or {}
+            for row, col in sorted(sheet._dirty):
+                book.set_value(sheet._name, f"{column_letters(col)}{row}", values.get((row, col)))
+            sheet._dirty.clear()
+        formulas = {vars(query)["Name"]: vars(query)["Formula"] for query in self._queries}
+        changed = {
+            name: formula
+            for name, formula in formulas.items()
+            if formula != self._original_formulas.get(name)
+        }
+        if changed:
+            book.queries.update(changed)
+            self._original_formulas.update(changed)
+        for old, new in zip(self._original_links, self._links):
+            if old != new:
+                book.relink(old, new)
+        self._original_links = list(self._links)
+        if not book.save_as(target):
+            raise FakeComError(f"Sauvegarde impossible: {target}")
+
+    def Close(self, SaveChanges: bool = False):
+        if SaveChanges:
+            self.Save()
+        if self._book is not None:
+            self._book.close()
+            self._book = None
+        self._application._workbooks._items.remove(self)
+
+
+class FakeWorkbooks(FakeCollection):
+    """Collection Workbooks de l'application."""
+
+    def __init__(self, application):
+        super().__init__(application._backend, [])
+        self._application = application
+
+    def Open(self, file_path: str, UpdateLinks: int = 0, **kwargs):
+        path = Path(file_path)
+        if not path.exists():
+            raise FakeComError(f"Fichier introuvable: {file_path}")
+        workbook = FakeWorkbook(self._application, path)
+        self._items.append(workbook)
+        return workbook
+
+
+class FakeApplication(_FakeObject):
+    """Application Excel simulée."""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._workbooks = FakeWorkbooks(self)
+        self.__dict__.update(
+            Visible=False,
+            DisplayAlerts=True,
+            AskToUpdateLinks=True,
+            AutomationSecurity=1,
+            FileValidation=0,
+            ScreenUpdating=True,
+        )
+
+    @property
+    def Workbooks(self):
+        if vars(self).get("_closed"):
+            raise FakeComError("Le serveur RPC n'est pas disponible")
+        return self._workbooks
+
+    def CalculateFull(self):
+        time.sleep(self._backend.refresh_latency("CalculateFull"))
+
+    def Calculate(self):
+        time.sleep(self._backend.refresh_latency("Calculate"))
+
+    def Quit(self):
+        for workbook in list(self._workbooks._items):
+            workbook.Close(SaveChanges=False)
+        vars(self)["_closed"] = True
+
+
+class FakeExcelBackend(ExcelBackend):
+    """
+    Backend Excel simulé.
+
+    Args:
+        call_latencies: Latence (s) par nom d'attribut/méthode ("Open", "Save",
+            ...), "default" pour tous les autres accès
+        refresh_latencies: Durée (s) d'actualisation par nom de connexion,
+            "Model", "CalculateFull", "UpdateLink", "default" sinon
+        refresh_failures: Nombre d'actualisations en erreur par nom de
+            connexion (les premières ; les suivantes aboutissent)
+    """
+
+    name = "fake"
+
+    def __init__(self, call_latencies: Optional[dict] = None, refresh_latencies: Optional[dict] = None,
+                 refresh_failures: Optional[dict] = None):
+        self.call_latencies = dict(call_latencies or {})
+        self.refresh_latencies = dict(refresh_latencies or {})
+        self.refresh_failures = Counter(refresh_failures or {})
+        self.call_counts = Counter()
+        self.refresh_counts = Counter()
+        self._lock = threading.Lock()
+
+    def start(self, visible: bool = True, new_instance: bool = False):
+        # Démarrage d'Excel : compté (et retardé) comme un aller-retour "start"
+        self.round_trip("start")
+        return FakeApplication(self)
+
+    def stop(self, application):
+        application.Quit()
+
+    def round_trip(self, name: str):
+        """Comptabilise (et simule la latence d') un aller-retour COM."""
+        with self._lock:
+            self.call_counts[name] += 1
+        latency = self.call_latencies.get(name, self.call_latencies.get("default", 0.0))
+        if latency:
+            time.sleep(latency)
+
+    def refresh_fails(self, name: str, query: Optional[str] = None) -> bool:
+        """Consomme une erreur simulée pour la connexion (ou sa requête), s'il en reste."""
+        with self._lock:
+            for key in (name, query):
+                if self.refresh_failures[key] > 0:
+                    self.refresh_failures[key] -= 1
+                    return True
+        return False
+
+    def refresh_latency(self, name: str, query: Optional[str] = None) -> float:
+        """Durée simulée de l'actualisation d'une connexion, de sa requête (ou d'une opération)."""
+        if name in self.refresh_latencies:
+            return self.refresh_latencies[name]
+        return self.refresh_latencies.get(query, self.refresh_latencies.get("default", 0.0))
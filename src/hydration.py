@@ -0,0 +1,182 @@
+"""
+Téléchargement anticipé des fichiers OneDrive « en ligne uniquement ».
+
+Un fichier OneDrive non synchronisé localement (espace réservé) n'est
+téléchargé qu'à sa première lecture : la copie du classeur ou son
+ouverture dans Excel se bloque alors sur le téléchargement. Les fichiers
+nécessaires à l'exécution sont donc lus en arrière-plan (threads) pendant
+le démarrage d'Excel, puis chaque fichier n'est remis à l'éditeur ou à
+Excel qu'une fois sa taille et sa date de modification stabilisées.
+
+Usage:
+    prefetch([source_file])                # ne bloque pas
+    excel = ExcelAutomation(...)
+    if not ensure_local(source_file):      # attend le fichier (s'il y a lieu)
+        return False
+"""
+import os
+import stat
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config import HYDRATION_TIMEOUT, ONEDRIVE_BASE_PATH, ONEDRIVE_PREFETCH
+
+# Attributs Windows des fichiers dont le contenu n'est pas local
+_RECALL_ATTRIBUTES = (
+    getattr(stat, "FILE_ATTRIBUTE_OFFLINE", 0x1000)
+    | 0x40000     # FILE_ATTRIBUTE_RECALL_ON_OPEN
+    | 0x400000    # FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS
+)
+
+# Taille des lectures qui déclenchent le téléchargement
+_READ_CHUNK = 1024 * 1024
+
+# Un fichier modifié depuis moins longtemps est peut-être encore en cours
+# d'écriture par le client de synchronisation
+_SETTLE_SECONDS = 30.0
+_POLL_INTERVAL = 0.5
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_futures: Dict[Path, Future] = {}
+
+
+def is_placeholder(path: Path) -> bool:
+    """
+    True si le contenu du fichier n'est pas présent localement.
+
+    Sous Windows : attributs « rappel à l'accès » / hors connexion.
+    Ailleurs : fichier non vide sans aucun bloc alloué.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    attributes = getattr(info, "st_file_attributes", None)
+    if attributes is not None:
+        return bool(attributes & _RECALL_ATTRIBUTES)
+    blocks = getattr(info, "st_blocks", None)
+    return blocks == 0 and info.st_size > 0
+
+
+def _signature(path: Path):
+    info = os.stat(path)
+    return info.st_size, info.st_mtime_ns
+
+
+def wait_stable(path: Path, timeout: float = HYDRATION_TIMEOUT) -> bool:
+    """
+    Attend que la taille et la date de modification du fichier ne changent plus.
+
+    Un fichier local non modifié récemment est considéré stable immédiatement.
+
+    Returns:
+        True si le fichier est stable avant le délai
+    """
+    deadline = time.monotonic() + timeout
+    previous = _signature(path)
+    if not is_placeholder(path) and time.time() - previous[1] / 1e9 > _SETTLE_SECONDS:
+        return True
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        current = _signature(path)
+        if current == previous and not is_placeholder(path):
+            return True
+        previous = current
+    return False
+
+
+def hydrate(path: Path, timeout: float = HYDRATION_TIMEOUT) -> bool:
+    """
+    Rend le fichier disponible localement (lecture complète s'il s'agit
+    d'un espace réservé), puis attend qu'il soit stable.
+
+    Returns:
+        True si le fichier est local et stable
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    if is_placeholder(path):
+        start = time.perf_counter()
+        with open(path, "rb") as handle:
+            while handle.read(_READ_CHUNK):
+                pass
+        print(f"  Téléchargé: {path.name} ({time.perf_counter() - start:.1f} s)")
+    return wait_stable(path, timeout)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hydration")
+    return _executor
+
+
+def prefetch(paths: Iterable[Optional[Path]]):
+    """
+    Lance en arrière-plan la préparation des fichiers (sans attendre).
+
+    Args:
+        paths: Fichiers nécessaires à l'exécution (les None sont ignorés)
+    """
+    if not ONEDRIVE_PREFETCH:
+        return
+    with _lock:
+        for path in paths:
+            if path is None:
+                continue
+            path = Path(path)
+            if path not in _futures:
+                _futures[path] = _get_executor().submit(hydrate, path)
+
+
+def prefetch_latest(configs: Iterable[dict]):
+    """Prépare en arrière-plan le dernier classeur de chaque configuration."""
+    from src.week_index import find_latest_file
+
+    files: List[Path] = []
+    for config in configs:
+        latest = find_latest_file(
+            ONEDRIVE_BASE_PATH / config["folder"], config["file_prefix"],
+            config.get("file_ext", ".xlsx"), quiet=True,
+        )
+        if latest is not None:
+            files.append(latest.path)
+    prefetch(files)
+
+
+def ensure_local(path: Path, timeout: float = HYDRATION_TIMEOUT) -> bool:
+    """
+    Attend que le fichier soit local et stable avant de le remettre à Excel.
+
+    Args:
+        path: Fichier à utiliser
+        timeout: Attente maximale (secondes)
+
+    Returns:
+        True si le fichier peut être ouvert sans blocage
+    """
+    if not ONEDRIVE_PREFETCH:
+        return True
+    path = Path(path)
+    prefetch([path])
+    with _lock:
+        future = _futures[path]
+    try:
+        ready = future.result(timeout=timeout)
+    except FutureTimeout:
+        ready = False
+    except OSError as e:
+        print(f"  ERREUR: Lecture de {path.name} impossible ({e})")
+        ready = False
+    if not ready:
+        print(f"  ERREUR: {path.name} n'est pas disponible localement (délai: {timeout:.0f} s)")
+        # Nouvelle tentative complète au prochain appel
+        with _lock:
+            _futures.pop(path, None)
+    return ready
@@ -0,0 +1,290 @@
+"""
+Moteur de réécriture des formules M (Power Query).
+
+Les formules sont découpées en jetons (chaînes, identifiants #"...",
+commentaires, code) puis chaque chaîne/segment de code est réécrit en une
+seule passe par une expression régulière combinant toutes les
+transformations déclarées. Chaque occurrence n'est donc transformée
+qu'une fois (pas de double décalage d'une date présente deux fois ou
+égale à la valeur décalée d'une autre date).
+"""
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Dict
+
+# Types de jetons
+STRING = "string"
+QUOTED_IDENTIFIER = "quoted_identifier"
+COMMENT = "comment"
+CODE = "code"
+
+
+def tokenize(formula: str) -> List[Tuple[str, int, int]]:
+    """
+    Découpe une formule M en jetons.
+
+    Args:
+        formula: Texte de la formule
+
+    Returns:
+        Liste de tuples (type, début, fin) couvrant toute la formule
+    """
+    tokens = []
+    n = len(formula)
+    i = 0
+    code_start = 0
+
+    def flush_code(end):
+        if end > code_start:
+            tokens.append((CODE, code_start, end))
+
+    while i < n:
+        char = formula[i]
+        if char == '"' or formula.startswith('#"', i):
+            start = i
+            kind = QUOTED_IDENTIFIER if char == "#" else STRING
+            i += 2 if kind == QUOTED_IDENTIFIER else 1
+            while i < n:
+                if formula[i] == '"':
+                    if i + 1 < n and formula[i + 1] == '"':
+                        i += 2
+                        continue
+                    i += 1
+                    break
+                i += 1
+            flush_code(start)
+            tokens.append((kind, start, i))
+            code_start = i
+        elif formula.startswith("//", i) or formula.startswith("/*", i):
+            start = i
+            if formula[i + 1] == "/":
+                end = formula.find("\n", i)
+                i = n if end < 0 else end
+            else:
+                end = formula.find("*/", i + 2)
+                i = n if end < 0 else end + 2
+            flush_code(start)
+            tokens.append((COMMENT, start, i))
+            code_start = i
+        else:
+            i += 1
+    flush_code(n)
+    return tokens
+
+
+class Change:
+    """Modification élémentaire appliquée à une formule."""
+
+    def __init__(self, transform: str, old: str, new: str, position: int):
+        self.transform = transform
+        self.old = old
+        self.new = new
+        self.position = position
+
+    def to_dict(self) -> dict:
+        return {
+            "transform": self.transform,
+            "old": self.old,
+            "new": self.new,
+            "position": self.position,
+        }
+
+    def __repr__(self):
+        return f"Change({self.transform}: {self.old!r} -> {self.new!r} @{self.position})"
+
+
+class Transform:
+    """
+    Transformation typée appliquée aux chaînes et/ou au code d'une formule.
+
+    Les sous-classes définissent string_pattern (appliqué au contenu des
+    chaînes littérales) et/ou code_pattern (appliqué au code hors chaînes et
+    commentaires), sans groupe nommé, ainsi que replace().
+    """
+
+    name = "transform"
+    string_pattern: Optional[str] = None
+    code_pattern: Optional[str] = None
+
+    def replace(self, match: re.Match) -> Optional[str]:
+        """Retourne le texte de remplacement, ou None pour laisser inchangé."""
+        raise NotImplementedError
+
+
+class DateShift(Transform):
+    """
+    Décale les dates de N jours : dates ISO (YYYY-MM-DD) dans les chaînes,
+    y compris dans du JSON encodé en URL (%22start%22%3A%222026-01-05%22),
+    et littéraux #date(YYYY, M, D) dans le code.
+    """
+
+    name = "date_shift"
+    # Un chiffre juste avant la date n'est accepté que s'il termine un
+    # échappement URL (%22 = guillemet encodé)
+    string_pattern = r"(?:(?<!\d)|(?<=%[0-9A-Fa-f]{2}))(\d{4})-(\d{2})-(\d{2})(?!\d)"
+    code_pattern = r"#date\(\s*(\d{4})\s*,\s*(\d{1,2})\s*,\s*(\d{1,2})\s*\)"
+
+    def __init__(self, days: int = 7):
+        self.days = days
+
+    def replace(self, match: re.Match) -> Optional[str]:
+        try:
+            year, month, day = (int(g) for g in match.groups())
+            new_date = datetime(year, month, day) + timedelta(days=self.days)
+        except ValueError:
+            return None
+        if match.group(0).startswith("#date"):
+            return f"#date({new_date.year}, {new_date.month}, {new_date.day})"
+        return new_date.strftime("%Y-%m-%d")
+
+
+class WeekBump(Transform):
+    """
+    Remplace le code semaine YYYY_SXX par YYYY_SYY (ex: 2026_S03 -> 2026_S04).
+    Au changement d'année (new_week < old_week), l'année suit : 2025_S52 -> 2026_S01.
+    """
+
+    name = "week_bump"
+    string_pattern = r"(\d{4})_S(\d{2})(?!\d)"
+
+    def __init__(self, old_week: int, new_week: int):
+        self.old_week = old_week
+        self.new_week = new_week
+
+    def replace(self, match: re.Match) -> Optional[str]:
+        if int(match.group(2)) != self.old_week:
+            return None
+        year = int(match.group(1))
+        if self.new_week < self.old_week:
+            year += 1
+        return f"{year}_S{self.new_week:02d}"
+
+
+class _CompiledTransforms:
+    """Regex combinées (une pour les chaînes, une pour le code)."""
+
+    def __init__(self, transforms: List[Transform]):
+        self.transforms = transforms
+        self.string_regex = self._combine("string_pattern")
+        self.code_regex = self._combine("code_pattern")
+        self._own = {
+            (i, attr): re.compile(getattr(t, attr))
+            for i, t in enumerate(transforms)
+            for attr in ("string_pattern", "code_pattern")
+            if getattr(t, attr)
+        }
+
+    def _combine(self, attr: str) -> Optional[re.Pattern]:
+        parts = []
+        for i, transform in enumerate(self.transforms):
+            pattern = getattr(transform, attr)
+            if pattern:
+                parts.append(f"(?P<t{i}>(?:{pattern}))")
+        return re.compile("|".join(parts)) if parts else None
+
+    def rewrite(self, text: str, offset: int, attr: str, changes: List[Change]) -> str:
+        regex = self.string_regex if attr == "string_pattern" else self.code_regex
+        if regex is None:
+            return text
+
+        def substitute(match: re.Match) -> str:
+            index = int(match.lastgroup[1:])
+            transform = self.transforms[index]
+            own = self._own[(index, attr)].fullmatch(match.group(0))
+            new = transform.replace(own) if own else None
+            if new is None or new == match.group(0):
+                return match.group(0)
+            changes.append(Change(transform.name, match.group(0), new, offset + match.start()))
+            return new
+
+        return regex.sub(substitute, text)
+
+
+def _rewrite(formula: str, compiled: _CompiledTransforms) -> Tuple[str, List[Change]]:
+    """Applique les transformations compilées à une formule, en une seule passe."""
+    changes: List[Change] = []
+    output = []
+    for kind, start, end in tokenize(formula):
+        text = formula[start:end]
+        if kind == STRING:
+            output.append(compiled.rewrite(text, start, "string_pattern", changes))
+        elif kind == CODE:
+            output.append(compiled.rewrite(text, start, "code_pattern", changes))
+        else:
+            output.append(text)
+    return "".join(output), changes
+
+
+def transforms_for(query_type: str, old_week: int, new_week: int) -> List[Transform]:
+    """
+    Transformations associées à un type de requête de la configuration.
+
+    Args:
+        query_type: Type déclaré dans config ("selligent", "piano")
+        old_week: Semaine du fichier source
+        new_week: Semaine du nouveau fichier
+
+    Returns:
+        Liste de transformations
+    """
+    if query_type == "selligent":
+        return [WeekBump(old_week, new_week)]
+    if query_type == "piano":
+        return [DateShift(7)]
+    raise ValueError(f"Type de requête inconnu: {query_type}")
+
+
+def rewrite_queries(editor, queries: Dict[str, dict], old_week: int, new_week: int) -> Dict[str, dict]:
+    """
+    Réécrit en lot les requêtes déclarées dans la configuration
+    (SUIVI_CRM_CONFIG["queries"], SUIVI_TRAFIC_CONFIG["queries"]).
+
+    Les formules sont lues une à une, transformées, puis écrites en une seule
+    opération via set_query_formulas.
+
+    Args:
+        editor: Objet exposant get_query_formula / set_query_formulas
+        queries: Dictionnaire nom -> {"type": ...}
+        old_week: Semaine du fichier source
+        new_week: Semaine du nouveau fichier
+
+    Returns:
+        Diff structuré : nom -> {"type", "status", "changes"}
+        avec status parmi "updated", "unchanged", "missing", "error"
+    """
+    report = {}
+    new_formulas = {}
+    compiled_by_type = {}
+
+    for query_name, query_config in queries.items():
+        query_type = query_config["type"]
+        print(f"\n  --- {query_name} ({query_type}) ---")
+        entry = {"type": query_type, "status": "unchanged", "changes": []}
+        report[query_name] = entry
+
+        formula = editor.get_query_formula(query_name)
+        if formula is None:
+            entry["status"] = "missing"
+            continue
+
+        if query_type not in compiled_by_type:
+            compiled_by_type[query_type] = _CompiledTransforms(
+                transforms_for(query_type, old_week, new_week)
+            )
+        new_formula, changes = _rewrite(formula, compiled_by_type[query_type])
+        entry["changes"] = [change.to_dict() for change in changes]
+
+        if not changes:
+            print(f"  ATTENTION: Aucune modification dans '{query_name}'")
+            continue
+
+        for change in changes:
+            print(f"  {change.old} -> {change.new}")
+        new_formulas[query_name] = new_formula
+        entry["status"] = "updated"
+
+    if new_formulas and not editor.set_query_formulas(new_formulas):
+        for query_name in new_formulas:
+            report[query_name]["status"] = "error"
+
+    return report
@@ -0,0 +1,667 @@
+"""
+Manipulation directe des classeurs Excel au niveau des parties OOXML (zip).
+
+Alternative à ExcelAutomation pour la phase d'édition (date, requêtes
+Power Query, liaisons externes) : ne lance pas Excel, fonctionne sous Linux
+et ne modifie que les parties concernées. Excel n'est ensuite nécessaire
+que pour l'actualisation des données.
+"""
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Optional, List, Dict
+from datetime import datetime, timedelta
+from urllib.parse import unquote, quote
+from xml.sax.saxutils import escape
+
+from src.data_mashup import DataMashup, QueryCatalog, find_datamashup_part
+from src.zip_patch import copy_and_patch
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+REL_OFFICE_DOCUMENT = NS_REL + "/officeDocument"
+REL_WORKSHEET = NS_REL + "/worksheet"
+REL_SHARED_STRINGS = NS_REL + "/sharedStrings"
+REL_STYLES = NS_REL + "/styles"
+REL_TABLE = NS_REL + "/table"
+REL_EXTERNAL_LINK = NS_REL + "/externalLink"
+REL_EXTERNAL_LINK_PATH = NS_REL + "/externalLinkPath"
+
+# Formats numériques intégrés correspondant à des dates/heures
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | {27, 30, 36, 45, 46, 47, 50, 57}
+
+EPOCH_1900 = datetime(1899, 12, 30)
+EPOCH_1904 = datetime(1904, 1, 1)
+
+_CELL_REF_RE = re.compile(r"^([A-Z]+)(\d+)$")
+_DATE_FORMAT_RE = re.compile(r"[dmyhs]", re.IGNORECASE)
+
+
+def _q(ns: str, tag: str) -> str:
+    return f"{{{ns}}}{tag}"
+
+
+def column_index(letters: str) -> int:
+    """Convertit une colonne ('A', 'AB') en index (1, 28)."""
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index
+
+
+def column_letters(index: int) -> str:
+    """Convertit un index de colonne (1, 28) en lettres ('A', 'AB')."""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def split_cell_ref(cell: str):
+    """Découpe une référence 'B12' en ('B', 12)."""
+    match = _CELL_REF_RE.match(cell.replace("$", "").upper())
+    if not match:
+        raise ValueError(f"Référence de cellule invalide: {cell}")
+    return match.group(1), int(match.group(2))
+
+
+def resolve_target(base_part: str, target: str) -> str:
+    """Résout la cible d'une relation par rapport à la partie source."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    base_dir = posixpath.dirname(base_part)
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def rels_part_for(part: str) -> str:
+    """Retourne le nom de la partie .rels associée à une partie."""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def decode_link_target(target: str) -> str:
+    """Convertit la cible d'une liaison externe en chemin lisible."""
+    path = target
+    if path.lower().startswith("file:///"):
+        path = path[8:]
+    if not path.lower().startswith(("http://", "https://")):
+        path = unquote(path)
+    return path
+
+
+def encode_link_target(path: str, template: str) -> str:
+    """Encode un chemin de liaison externe en respectant le style de la cible d'origine."""
+    if template.lower().startswith(("http://", "https://")):
+        return path
+    encoded = quote(path, safe="/\\:._-~!$&'()*+,;=@")
+    if template.lower().startswith("file:///"):
+        return template[:8] + encoded
+    return encoded
+
+
+def excel_serial_to_datetime(serial: float, date1904: bool = False) -> datetime:
+    """Convertit un numéro de série Excel en datetime."""
+    epoch = EPOCH_1904 if date1904 else EPOCH_1900
+    return epoch + timedelta(days=serial)
+
+
+def datetime_to_excel_serial(value: datetime, date1904: bool = False) -> float:
+    """Convertit un datetime en numéro de série Excel."""
+    epoch = EPOCH_1904 if date1904 else EPOCH_1900
+    delta = value - epoch
+    serial = delta.days + delta.seconds / 86400 + delta.microseconds / 86400e6
+    return int(serial) if serial == int(serial) else serial
+
+
+def date_style_indexes(styles_xml: bytes) -> set:
+    """Index des styles de cellule (cellXfs) dont le format est une date/heure."""
+    root = ET.fromstring(styles_xml)
+    custom_dates = set()
+    num_fmts = root.find(_q(NS_MAIN, "numFmts"))
+    if num_fmts is not None:
+        for fmt in num_fmts:
+            code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', "", fmt.get("formatCode", ""))
+            if _DATE_FORMAT_RE.search(code):
+                custom_dates.add(int(fmt.get("numFmtId")))
+    styles = set()
+    cell_xfs = root.find(_q(NS_MAIN, "cellXfs"))
+    if cell_xfs is not None:
+        for index, xf in enumerate(cell_xfs):
+            fmt_id = int(xf.get("numFmtId", "0"))
+            if fmt_id in BUILTIN_DATE_FORMATS or fmt_id in custom_dates:
+                styles.add(index)
+    return styles
+
+
+class OOXMLWorkbook:
+    """
+    Classeur Excel édité directement dans son archive OOXML.
+    Expose les mêmes méthodes qu'ExcelAutomation pour la phase d'édition.
+    """
+
+    def __init__(self, file_path: Path):
+        """
+        Ouvre un classeur en lecture.
+
+        Args:
+            file_path: Chemin du fichier .xlsx/.xlsm
+        """
+        self.file_path = Path(file_path)
+        self._zip = zipfile.ZipFile(self.file_path)
+        self._names = set(self._zip.namelist())
+        self._modified: Dict[str, bytes] = {}
+        self._workbook_part = self._find_workbook_part()
+        self._sheets: Optional[Dict[str, str]] = None
+        self._shared_strings: Optional[List[str]] = None
+        self._date_styles: Optional[set] = None
+        self._date1904 = False
+        self._queries: Optional[QueryCatalog] = None
+        self._mashup_part: Optional[str] = None
+        print(f"Classeur ouvert (OOXML): {self.file_path.name}")
+
+    # ------------------------------------------------------------------
+    # Accès aux parties
+    # ------------------------------------------------------------------
+
+    def read_part(self, name: str) -> bytes:
+        """Lit une partie de l'archive (version modifiée si présente)."""
+        if name in self._modified:
+            return self._modified[name]
+        return self._zip.read(name)
+
+    def write_part(self, name: str, data: bytes):
+        """Remplace le contenu d'une partie existante."""
+        if name not in self._names:
+            raise KeyError(f"Partie inexistante: {name}")
+        self._modified[name] = data
+
+    def has_part(self, name: str) -> bool:
+        return name in self._names
+
+    def _relationships(self, part: str) -> List[dict]:
+        """Retourne les relations d'une partie."""
+        rels_part = rels_part_for(part)
+        if rels_part not in self._names:
+            return []
+        root = ET.fromstring(self.read_part(rels_part))
+        rels = []
+        for rel in root.iter(_q(NS_PKG_REL, "Relationship")):
+            rels.append({
+                "id": rel.get("Id"),
+                "type": rel.get("Type"),
+                "target": rel.get("Target"),
+                "external": rel.get("TargetMode") == "External",
+            })
+        return rels
+
+    def _find_workbook_part(self) -> str:
+        for rel in self._relationships(""):
+            if rel["type"] == REL_OFFICE_DOCUMENT:
+                return resolve_target("", rel["target"])
+        return "xl/workbook.xml"
+
+    def _related_parts(self, rel_type: str) -> List[str]:
+        """Parties liées au classeur pour un type de relation donné."""
+        return [
+            resolve_target(self._workbook_part, rel["target"])
+            for rel in self._relationships(self._workbook_part)
+            if rel["type"] == rel_type and not rel["external"]
+        ]
+
+    # ------------------------------------------------------------------
+    # Feuilles et cellules
+    # ------------------------------------------------------------------
+
+    def _load_workbook_info(self):
+        root = ET.fromstring(self.read_part(self._workbook_part))
+        pr = root.find(_q(NS_MAIN, "workbookPr"))
+        if pr is not None:
+            self._date1904 = pr.get("date1904") in ("1", "true")
+
+        targets = {
+            rel["id"]: resolve_target(self._workbook_part, rel["target"])
+            for rel in self._relationships(self._workbook_part)
+            if rel["type"] == REL_WORKSHEET
+        }
+        self._sheets = {}
+        for sheet in root.iter(_q(NS_MAIN, "sheet")):
+            rid = sheet.get(_q(NS_REL, "id"))
+            if rid in targets:
+                self._sheets[sheet.get("name")] = targets[rid]
+
+    def get_sheet_names(self) -> List[str]:
+        """Retourne la liste des noms de feuilles du classeur."""
+        if self._sheets is None:
+            self._load_workbook_info()
+        return list(self._sheets)
+
+    def _sheet_part(self, sheet_name: str) -> str:
+        if self._sheets is None:
+            self._load_workbook_info()
+        for name, part in self._sheets.items():
+            if name.lower() == sheet_name.lower():
+                return part
+        raise KeyError(f"Feuille introuvable: {sheet_name}")
+
+    def _load_shared_strings(self) -> List[str]:
+        if self._shared_strings is None:
+            self._shared_strings = []
+            for part in self._related_parts(REL_SHARED_STRINGS):
+                root = ET.fromstring(self.read_part(part))
+                for si in root.iter(_q(NS_MAIN, "si")):
+                    # Texte simple ou texte enrichi (plusieurs <r><t>)
+                    texts = [
+                        t.text or ""
+                        for t in si.iter(_q(NS_MAIN, "t"))
+                    ]
+                    self._shared_strings.append("".join(texts))
+        return self._shared_strings
+
+    def _load_date_styles(self) -> set:
+        if self._date_styles is None:
+            self._date_styles = set()
+            for part in self._related_parts(REL_STYLES):
+                self._date_styles |= date_style_indexes(self.read_part(part))
+        return self._date_styles
+
+    @staticmethod
+    def _find_cell(xml: str, cell: str) -> Optional[re.Match]:
+        pattern = rf'<c\b[^>]*?\br="{cell}"[^>]*?(?:/>|>.*?</c>)'
+        return re.search(pattern, xml, re.DOTALL)
+
+    def read_cell(self, sheet_name: str, cell: str):
+        """
+        Lit la valeur d'une cellule.
+
+        Args:
+            sheet_name: Nom de la feuille
+            cell: Référence de la cellule (ex: "A1")
+
+        Returns:
+            Valeur de la cellule (datetime si la cellule est au format date)
+        """
+        try:
+            value = self.get_value(sheet_name, cell)
+            print(f"Lecture {sheet_name}!{cell}: {value}")
+            return value
+        except Exception as e:
+            print(f"Erreur lecture {sheet_name}!{cell}: {e}")
+            return None
+
+    def get_value(self, sheet_name: str, cell: str):
+        """Lit la valeur d'une cellule (sans trace, lève une exception en cas d'erreur)."""
+        column, row = split_cell_ref(cell)
+        xml = self.read_part(self._sheet_part(sheet_name)).decode("utf-8")
+        match = self._find_cell(xml, f"{column}{row}")
+        return self._cell_value(match.group(0)) if match else None
+
+    def iter_values(self, sheet_name: str):
+        """
+        Parcourt les cellules non vides d'une feuille.
+
+        Yields:
+            Tuples (référence, valeur)
+        """
+        xml = self.read_part(self._sheet_part(sheet_name)).decode("utf-8")
+        for match in re.finditer(r'<c\b[^>]*?(?:/>|>.*?</c>)', xml, re.DOTALL):
+            ref = re.search(r'\br="([A-Z]+\d+)"', match.group(0))
+            if ref:
+                value = self._cell_value(match.group(0))
+                if value is not None:
+                    yield ref.group(1), value
+
+    def _cell_value(self, cell_xml: str):
+        open_tag = re.match(r"<c\b[^>]*>", cell_xml).group(0)
+        cell_type = re.search(r'\bt="([^"]*)"', open_tag)
+        cell_type = cell_type.group(1) if cell_type else "n"
+        style = re.search(r'\bs="(\d+)"', open_tag)
+        style = int(style.group(1)) if style else 0
+
+        if cell_type == "inlineStr":
+            texts = re.findall(r"<t\b[^>]*>(.*?)</t>", cell_xml, re.DOTALL)
+            return ET.fromstring(f"<t>{''.join(texts)}</t>").text or ""
+
+        raw = re.search(r"<v>(.*?)</v>", cell_xml, re.DOTALL)
+        if raw is None:
+            return None
+        raw = ET.fromstring(f"<v>{raw.group(1)}</v>").text or ""
+
+        if cell_type == "s":
+            return self._load_shared_strings()[int(raw)]
+        if cell_type in ("str", "e"):
+            return raw
+        if cell_type == "b":
+            return raw == "1"
+        number = float(raw)
+        if style in self._load_date_styles():
+            return excel_serial_to_datetime(number, self._date1904)
+        return int(number) if number.is_integer() else number
+
+    def _format_cell(self, ref: str, value, attrs: str) -> str:
+        """Construit l'élément <c> pour une valeur, en conservant le style."""
+        attrs = re.sub(r'\s+t="[^"]*"', "", attrs)
+        if value is None:
+            return f'<c r="{ref}"{attrs}/>'
+        if isinstance(value, bool):
+            return f'<c r="{ref}"{attrs} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, datetime):
+            serial = datetime_to_excel_serial(value, self._date1904)
+            return f'<c r="{ref}"{attrs}><v>{serial}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"{attrs}><v>{value!r}</v></c>'
+        text = escape(str(value))
+        space = ' xml:space="preserve"' if text != text.strip() else ""
+        return f'<c r="{ref}"{attrs} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+    def write_cell(self, sheet_name: str, cell: str, value) -> bool:
+        """
+        Écrit une valeur dans une cellule.
+        Le style de la cellule est conservé (une date reste au format date).
+
+        Args:
+            sheet_name: Nom de la feuille
+            cell: Référence de la cellule (ex: "A1")
+            value: Valeur à écrire
+
+        Returns:
+            True si l'écriture est réussie
+        """
+        try:
+            self.set_value(sheet_name, cell, value)
+            print(f"Écriture {sheet_name}!{cell}: {value}")
+            return True
+        except Exception as e:
+            print(f"Erreur écriture {sheet_name}!{cell}: {e}")
+            return False
+
+    def set_value(self, sheet_name: str, cell: str, value):
+        """Écrit la valeur d'une cellule (sans trace, lève une exception en cas d'erreur)."""
+        column, row = split_cell_ref(cell)
+        ref = f"{column}{row}"
+        part = self._sheet_part(sheet_name)
+        xml = self.read_part(part).decode("utf-8")
+
+        match = self._find_cell(xml, ref)
+        if match:
+            if "<f" in match.group(0):
+                raise ValueError("la cellule contient une formule")
+            open_tag = re.match(r"<c\b([^>]*?)/?>", match.group(0)).group(1)
+            attrs = re.sub(r'\s*\br="[^"]*"', "", open_tag)
+            new_cell = self._format_cell(ref, value, attrs)
+            xml = xml[:match.start()] + new_cell + xml[match.end():]
+        else:
+            xml = self._insert_cell(xml, column, row, self._format_cell(ref, value, ""))
+
+        self.write_part(part, xml.encode("utf-8"))
+        self._request_full_calc()
+
+    @staticmethod
+    def _insert_cell(xml: str, column: str, row: int, cell_xml: str) -> str:
+        """Insère une cellule absente dans la ligne (créée si nécessaire)."""
+        row_match = re.search(rf'<row\b[^>]*?\br="{row}"[^>]*?(?:/>|>.*?</row>)', xml, re.DOTALL)
+        if row_match:
+            row_xml = row_match.group(0)
+            if row_xml.endswith("/>"):
+                new_row = row_xml[:-2] + ">" + cell_xml + "</row>"
+            else:
+                insert_at = len(row_xml) - len("</row>")
+                target = column_index(column)
+                for cell in re.finditer(r'<c\b[^>]*?\br="([A-Z]+)\d+"', row_xml):
+                    if column_index(cell.group(1)) > target:
+                        insert_at = cell.start()
+                        break
+                new_row = row_xml[:insert_at] + cell_xml + row_xml[insert_at:]
+            return xml[:row_match.start()] + new_row + xml[row_match.end():]
+
+        new_row = f'<row r="{row}">{cell_xml}</row>'
+        if re.search(r"<sheetData\s*/>", xml):
+            return re.sub(r"<sheetData\s*/>", f"<sheetData>{new_row}</sheetData>", xml, count=1)
+        insert_at = xml.index("</sheetData>")
+        for existing in re.finditer(r'<row\b[^>]*?\br="(\d+)"', xml):
+            if int(existing.group(1)) > row:
+                insert_at = existing.start()
+                break
+        return xml[:insert_at] + new_row + xml[insert_at:]
+
+    def _request_full_calc(self):
+        """Demande à Excel un recalcul complet à l'ouverture (valeurs dépendantes)."""
+        xml = self.read_part(self._workbook_part).decode("utf-8")
+        calc = re.search(r"<calcPr\b[^>]*?/?>", xml)
+        if calc:
+            tag = calc.group(0)
+            if "fullCalcOnLoad=" in tag:
+                return
+            new_tag = tag.replace("<calcPr", '<calcPr fullCalcOnLoad="1"', 1)
+            xml = xml[:calc.start()] + new_tag + xml[calc.end():]
+        else:
+            xml = xml.replace("</workbook>", '<calcPr fullCalcOnLoad="1"/></workbook>', 1)
+        self.write_part(self._workbook_part, xml.encode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Requêtes Power Query
+    # ------------------------------------------------------------------
+
+    @property
+    def queries(self) -> Optional[QueryCatalog]:
+        """Index nom -> formule des requêtes Power Query (construit une seule fois)."""
+        if self._queries is None:
+            self._mashup_part = find_datamashup_part(self._zip)
+            if self._mashup_part is not None:
+                self._queries = QueryCatalog(DataMashup(self.read_part(self._mashup_part)))
+        return self._queries
+
+    def get_query_formula(self, query_name: str) -> Optional[str]:
+        """
+        Lit la formule M d'une requête Power Query.
+
+        Args:
+            query_name: Nom de la requête
+
+        Returns:
+            Formule M ou None si non trouvée
+        """
+        try:
+            queries = self.queries
+            if queries is None:
+                print("ERREUR: Aucune requête Power Query dans ce classeur")
+                return None
+            if query_name in queries:
+                print(f"Requête '{query_name}' trouvée")
+                return queries[query_name]
+            print(f"ERREUR: Requête '{query_name}' non trouvée")
+            print("  Requêtes disponibles:")
+            for name in queries:
+                print(f"    - {name}")
+            return None
+        except Exception as e:
+            print(f"Erreur lecture requête '{query_name}': {e}")
+            return None
+
+    def get_query_formulas(self) -> Dict[str, str]:
+        """
+        Formules M de toutes les requêtes, dans l'ordre de la section.
+
+        Returns:
+            Dictionnaire nom -> formule (vide si le classeur n'a pas de requête)
+        """
+        queries = self.queries
+        return dict(queries.items()) if queries is not None else {}
+
+    def set_query_formula(self, query_name: str, formula: str) -> bool:
+        """
+        Met à jour la formule M d'une requête Power Query.
+        La partie DataMashup n'est réécrite qu'à la sauvegarde.
+
+        Args:
+            query_name: Nom de la requête
+            formula: Nouvelle formule M
+
+        Returns:
+            True si la mise à jour est réussie
+        """
+        return self.set_query_formulas({query_name: formula})
+
+    def set_query_formulas(self, formulas: Dict[str, str]) -> bool:
+        """
+        Met à jour plusieurs formules M en une seule opération.
+
+        Args:
+            formulas: Dictionnaire nom de requête -> nouvelle formule
+
+        Returns:
+            True si toutes les requêtes ont été trouvées et mises à jour
+        """
+        try:
+            queries = self.queries
+            if queries is None:
+                print("ERREUR: Aucune requête Power Query dans ce classeur")
+                return False
+            missing = queries.update(formulas)
+            for name in formulas:
+                if name in missing:
+                    print(f"ERREUR: Requête '{name}' non trouvée")
+                else:
+                    print(f"Requête '{name}' mise à jour")
+            return not missing
+        except Exception as e:
+            print(f"Erreur mise à jour requêtes: {e}")
+            return False
+
+    def _flush_queries(self):
+        """Réécrit la partie DataMashup si des formules ont changé."""
+        if self._queries is not None and self._queries.commit():
+            self.write_part(self._mashup_part, self._queries.mashup.to_xml_bytes())
+
+    # ------------------------------------------------------------------
+    # Liaisons externes
+    # ------------------------------------------------------------------
+
+    def _external_link_rels(self) -> List[dict]:
+        """Relations externalLinkPath de toutes les liaisons du classeur."""
+        result = []
+        for part in self._related_parts(REL_EXTERNAL_LINK):
+            for rel in self._relationships(part):
+                if rel["type"] == REL_EXTERNAL_LINK_PATH:
+                    rel["rels_part"] = rels_part_for(part)
+                    result.append(rel)
+        return result
+
+    def get_external_links(self) -> list:
+        """
+        Retourne la liste des liaisons externes du classeur.
+
+        Returns:
+            Liste des chemins des fichiers liés
+        """
+        try:
+            return [decode_link_target(rel["target"]) for rel in self._external_link_rels()]
+        except Exception:
+            return []
+
+    def change_link_path(self, old_path: str, new_path: str) -> bool:
+        """
+        Change le chemin d'une liaison externe.
+
+        Args:
+            old_path: Ancien chemin complet du fichier lié
+            new_path: Nouveau chemin complet
+
+        Returns:
+            True si le changement est réussi
+        """
+        try:
+            if not self.relink(old_path, new_path):
+                print(f"  Erreur modification liaison: {old_path} introuvable")
+                return False
+            print(f"  Liaison modifiée: {old_path} -> {new_path}")
+            return True
+        except Exception as e:
+            print(f"  Erreur modification liaison: {e}")
+            return False
+
+    def relink(self, old_path: str, new_path: str) -> bool:
+        """Change le chemin d'une liaison externe (sans trace). Retourne False si introuvable."""
+        changed = False
+        for rel in self._external_link_rels():
+            if decode_link_target(rel["target"]).lower() != old_path.lower():
+                continue
+            xml = self.read_part(rel["rels_part"]).decode("utf-8")
+            new_target = escape(encode_link_target(new_path, rel["target"]), {'"': "&quot;"})
+            rel_id = re.escape(rel["id"])
+            pattern = rf'(<Relationship\b[^>]*?\bId="{rel_id}"[^>]*?\bTarget=")[^"]*(")'
+            xml, count = re.subn(pattern, lambda m: m.group(1) + new_target + m.group(2), xml)
+            if count == 0:
+                # Attribut Target placé avant Id
+                pattern = rf'(<Relationship\b[^>]*?\bTarget=")[^"]*("[^>]*?\bId="{rel_id}")'
+                xml, count = re.subn(pattern, lambda m: m.group(1) + new_target + m.group(2), xml)
+            if count:
+                self.write_part(rel["rels_part"], xml.encode("utf-8"))
+                changed = True
+        return changed
+
+    # ------------------------------------------------------------------
+    # Sauvegarde
+    # ------------------------------------------------------------------
+
+    def save(self) -> bool:
+        """
+        Sauvegarde le classeur (remplacement atomique du fichier).
+
+        Returns:
+            True si la sauvegarde est réussie
+        """
+        return self.save_as(self.file_path)
+
+    def save_as(self, file_path: Path) -> bool:
+        """
+        Sauvegarde le classeur sous un nouveau nom.
+        Les parties non modifiées sont recopiées sans recompression.
+
+        Args:
+            file_path: Chemin du nouveau fichier
+
+        Returns:
+            True si la sauvegarde est réussie
+        """
+        file_path = Path(file_path)
+        same_file = file_path.exists() and file_path.resolve() == self.file_path.resolve()
+        try:
+            self._flush_queries()
+            if same_file:
+                # Libérer le fichier avant son remplacement (obligatoire sous Windows)
+                self._zip.close()
+            copy_and_patch(self.file_path, file_path, self._modified)
+            if same_file:
+                self._modified.clear()
+            print(f"Classeur sauvegardé (OOXML): {file_path.name}")
+            return True
+        except Exception as e:
+            print(f"Erreur de sauvegarde: {e}")
+            return False
+        finally:
+            if same_file:
+                self._zip = zipfile.ZipFile(self.file_path)
+
+    @property
+    def modified(self) -> bool:
+        """True si des modifications n'ont pas encore été sauvegardées."""
+        return bool(self._modified) or (self._queries is not None and self._queries.dirty)
+
+    def close(self, save: bool = False) -> bool:
+        """
+        Ferme le classeur.
+
+        Args:
+            save: Si True, sauvegarde avant de fermer
+
+        Returns:
+            True si la fermeture est réussie
+        """
+        ok = self.save() if save and self.modified else True
+        self._zip.close()
+        return ok
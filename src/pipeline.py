@@ -0,0 +1,151 @@
+"""
+Préparation du classeur suivant pendant le traitement du classeur courant.
+
+La préparation d'un classeur (recherche, copie, édition OOXML de la date)
+n'utilise pas Excel : elle est faite dans un thread pendant que le thread
+principal démarre Excel puis actualise le classeur précédent (attente des
+sources distantes). Le surcoût par fichier est ainsi masqué par
+l'actualisation.
+
+La sortie console du thread de préparation est mise de côté (tampon propre
+au thread) puis affichée au moment où le classeur préparé est traité, pour
+ne pas se mélanger au journal de l'actualisation en cours. Les autres
+threads écrivent directement sur la console.
+
+Usage:
+    pipeline = PreparationPipeline(AUTRES_CONFIGS, prepare_file)
+    excel = ExcelAutomation(...)      # démarre pendant la première préparation
+    for name, config, prepared in pipeline:
+        finish_file(prepared, excel)
+"""
+import io
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+# Tampon de sortie du thread courant (None : sortie d'origine)
+_thread_buffer = threading.local()
+
+
+class _ThreadOutput:
+    """Flux de sortie : écrit dans le tampon du thread courant s'il en a un, sinon sur le flux d'origine."""
+
+    def __init__(self, original):
+        self.original = original
+
+    def _target(self):
+        return getattr(_thread_buffer, "buffer", None) or self.original
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+def _install_thread_output():
+    """
+    Place sys.stdout et sys.stderr derrière un flux par thread (une seule fois,
+    depuis le thread principal). Sans tampon, la sortie est inchangée : le flux
+    n'est donc jamais retiré, ce qui évite de rétablir un flux obsolète si une
+    autre redirection a eu lieu entre-temps.
+    """
+    for name in ("stdout", "stderr"):
+        stream = getattr(sys, name)
+        if not isinstance(stream, _ThreadOutput):
+            setattr(sys, name, _ThreadOutput(stream))
+
+
+class PreparationPipeline:
+    """
+    Itère sur des configurations en préparant la suivante en arrière-plan.
+
+    La préparation de la première configuration démarre dès la création
+    du pipeline ; celle de la configuration N+1 démarre quand la N est
+    remise à l'appelant. Une configuration qui n'est pas encore prête à ce
+    moment (ex: classeur dépendant de celui en cours de traitement) est
+    préparée dans le thread appelant quand son tour vient.
+    """
+
+    def __init__(self, configs: Dict[str, dict], prepare: Callable[[str, dict], object],
+                 discard: Optional[Callable[[object], None]] = None,
+                 ready: Optional[Callable[[str], bool]] = None,
+                 announce: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            configs: Dictionnaire nom -> configuration, dans l'ordre de traitement
+            prepare: Fonction prepare(name, config) exécutée dans le thread
+                     de préparation (ne doit pas utiliser Excel)
+            discard: Fonction appelée sur une préparation jamais traitée
+                     (itération interrompue)
+            ready: Fonction ready(name) indiquant si une configuration peut être
+                   préparée en arrière-plan (par défaut: toujours)
+            announce: Fonction announce(name) appelée au tour d'une configuration,
+                      avant l'affichage du journal de sa préparation
+        """
+        self.items = list(configs.items())
+        self.prepare = prepare
+        self.discard = discard
+        self.ready = ready
+        self.announce = announce
+        _install_thread_output()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preparation")
+        # (indice, préparation en cours) ou None
+        self._next = self._submit(0)
+
+    def _submit(self, index: int):
+        if index >= len(self.items):
+            return None
+        name, config = self.items[index]
+        if self.ready is not None and not self.ready(name):
+            return None
+        return index, self._executor.submit(self._run, name, config)
+
+    def _run(self, name: str, config: dict) -> Tuple[object, str]:
+        buffer = io.StringIO()
+        _thread_buffer.buffer = buffer
+        try:
+            return self.prepare(name, config), buffer.getvalue()
+        except Exception:
+            traceback.print_exc(file=buffer)
+            return None, buffer.getvalue()
+        finally:
+            _thread_buffer.buffer = None
+
+    def _prepare_now(self, name: str, config: dict) -> object:
+        try:
+            return self.prepare(name, config)
+        except Exception:
+            traceback.print_exc()
+            return None
+
+    def __iter__(self) -> Iterator[Tuple[str, dict, object]]:
+        try:
+            for index, (name, config) in enumerate(self.items):
+                if self.announce is not None:
+                    self.announce(name)
+                if self._next is not None and self._next[0] == index:
+                    prepared, output = self._next[1].result()
+                    # Journal de la préparation, affiché avec le traitement du classeur
+                    if output:
+                        print(output, end="")
+                else:
+                    prepared = self._prepare_now(name, config)
+                self._next = self._submit(index + 1)
+                yield name, config, prepared
+        finally:
+            self.close()
+
+    def close(self):
+        """Attend la préparation en cours et l'abandonne."""
+        if self._next is not None:
+            prepared, _ = self._next[1].result()
+            self._next = None
+            if prepared is not None and self.discard is not None:
+                self.discard(prepared)
+        self._executor.shutdown(wait=True)
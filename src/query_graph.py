@@ -0,0 +1,250 @@
+"""
+Graphe de dépendances des requêtes Power Query d'un classeur.
+
+Chaque formule M est analysée pour trouver :
+    - les références aux autres requêtes (#"nom" ou identifiant nu,
+      ex: Source = selligent_all), hors étapes locales du let ;
+    - les sources externes (File.Contents, Web.Contents, Sql.Database...,
+      Excel.CurrentWorkbook pour les tables/cellules du classeur).
+
+Le graphe permet de n'actualiser que les requêtes dont la formule ou une
+entrée amont a changé, ainsi que leurs dépendantes, dans l'ordre
+topologique. Une requête lisant une source (fichier, dossier, web, base,
+tables du classeur) est toujours actualisée : ses données changent sans
+que sa formule change. Seules les requêtes statiques (tables saisies,
+listes de correspondance sans source ni référence) et celles qui ne
+dépendent que de requêtes statiques sont ignorées si leur formule est
+inchangée.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.m_rewrite import tokenize, CODE, QUOTED_IDENTIFIER
+
+# Source "classeur courant" : tables et plages nommées du classeur lui-même
+WORKBOOK_SOURCE = "Excel.CurrentWorkbook"
+
+# Fonctions d'accès aux données (les autres fonctions, ex: Csv.Document ou
+# Excel.Workbook, ne font que décoder un contenu déjà chargé)
+_SOURCE_FAMILIES = (
+    "File", "Folder", "Web", "Sql", "Odbc", "OleDb", "OData", "SharePoint",
+    "AzureStorage", "Access", "Oracle", "PostgreSQL", "MySQL", "Salesforce",
+)
+_SOURCE_RE = re.compile(
+    r"(?<![\w.])((?:%s)\.[A-Za-z]+|%s)\s*\(" % ("|".join(_SOURCE_FAMILIES), re.escape(WORKBOOK_SOURCE))
+)
+_IDENTIFIER_RE = re.compile(r"(?<![\w.#])[A-Za-z_][\w.]*")
+# Déclaration d'une étape locale ou d'un champ : "let nom =", ", nom =", "[nom ="
+# (mais pas "=>", ni une comparaison "if nom = ...")
+_LOCAL_RE = re.compile(r"(?:\blet\b|[,\[])\s*([A-Za-z_][\w.]*)\s*=(?!>)")
+_ASSIGN_RE = re.compile(r"\s*=(?!>)")
+
+
+def _unquote(identifier: str) -> str:
+    """Nom d'un identifiant #"..." (guillemets doublés décodés)."""
+    return identifier[2:-1].replace('""', '"')
+
+
+def formula_references(formula: str, names: Iterable[str]) -> Set[str]:
+    """
+    Requêtes référencées par une formule M.
+
+    Args:
+        formula: Formule M
+        names: Noms des requêtes du classeur
+
+    Returns:
+        Ensemble des noms de requêtes référencés
+    """
+    known = set(names)
+    mentioned = set()
+    local = set()
+    for kind, start, end in tokenize(formula):
+        text = formula[start:end]
+        if kind == QUOTED_IDENTIFIER:
+            name = _unquote(text)
+            if _ASSIGN_RE.match(formula, end):
+                local.add(name)
+            else:
+                mentioned.add(name)
+        elif kind == CODE:
+            local.update(_LOCAL_RE.findall(text))
+            mentioned.update(_IDENTIFIER_RE.findall(text))
+    return (mentioned & known) - local
+
+
+def formula_sources(formula: str) -> Set[str]:
+    """
+    Fonctions d'accès aux données externes utilisées par une formule M.
+
+    Returns:
+        Ensemble de noms de fonctions (ex: {"Web.Contents"})
+    """
+    sources = set()
+    for kind, start, end in tokenize(formula):
+        if kind == CODE:
+            sources.update(_SOURCE_RE.findall(formula, start, end))
+    return sources
+
+
+class QueryNode:
+    """Requête du graphe : références amont et sources externes."""
+
+    def __init__(self, name: str, references: Set[str], sources: Set[str]):
+        self.name = name
+        self.references = references
+        self.sources = sources
+        self.dependents: Set[str] = set()
+
+    @property
+    def static(self) -> bool:
+        """Requête sans source externe ni référence (données saisies)."""
+        return not self.references and not self.sources
+
+    def __repr__(self):
+        return f"QueryNode({self.name!r}, refs={sorted(self.references)}, sources={sorted(self.sources)})"
+
+
+class QueryGraph:
+    """
+    DAG des requêtes d'un classeur.
+
+    Usage:
+        graph = QueryGraph(editor.get_query_formulas())
+        for name in graph.affected({"selligent_all"}):
+            ...
+    """
+
+    def __init__(self, formulas: Dict[str, str]):
+        """
+        Args:
+            formulas: Dictionnaire nom -> formule M (dans l'ordre de la section)
+        """
+        self.order = list(formulas)
+        self.nodes: Dict[str, QueryNode] = {}
+        for name, formula in formulas.items():
+            references = formula_references(formula, formulas)
+            references.discard(name)
+            self.nodes[name] = QueryNode(name, references, formula_sources(formula))
+        for node in self.nodes.values():
+            for reference in node.references:
+                self.nodes[reference].dependents.add(node.name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.nodes
+
+    def dependents(self, names: Iterable[str]) -> Set[str]:
+        """Requêtes dépendant (directement ou non) des requêtes données, incluses."""
+        result = set()
+        stack = [name for name in names if name in self.nodes]
+        while stack:
+            name = stack.pop()
+            if name in result:
+                continue
+            result.add(name)
+            stack.extend(self.nodes[name].dependents)
+        return result
+
+    def upstream(self, name: str, among: Iterable[str]) -> Set[str]:
+        """
+        Requêtes de `among` dont une requête dépend, directement ou à travers
+        des requêtes hors de `among`.
+        """
+        among = set(among)
+        result = set()
+        seen = set()
+        stack = list(self.nodes[name].references) if name in self.nodes else []
+        while stack:
+            reference = stack.pop()
+            if reference in seen:
+                continue
+            seen.add(reference)
+            if reference in among:
+                result.add(reference)
+            else:
+                stack.extend(self.nodes[reference].references)
+        return result
+
+    def topological_order(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Trie des requêtes de sorte que chacune suive ses références.
+        À égalité, l'ordre de la section est conservé.
+
+        Args:
+            names: Requêtes à trier (par défaut toutes)
+
+        Returns:
+            Liste ordonnée des noms
+
+        Raises:
+            ValueError: Si le graphe contient un cycle
+        """
+        selected = set(self.nodes if names is None else names) & set(self.nodes)
+        remaining = {
+            name: len(self.nodes[name].references & selected) for name in selected
+        }
+        result = []
+        while remaining:
+            ready = [name for name in self.order if remaining.get(name) == 0]
+            if not ready:
+                raise ValueError(f"Références circulaires entre requêtes: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+                result.append(name)
+                for dependent in self.nodes[name].dependents:
+                    if dependent in remaining:
+                        remaining[dependent] -= 1
+        return result
+
+    def affected(self, changed: Iterable[str]) -> List[str]:
+        """
+        Requêtes à actualiser après une modification : requêtes modifiées,
+        requêtes lisant une source (dont le classeur courant) et leurs
+        dépendantes.
+
+        Args:
+            changed: Requêtes dont la formule a changé
+
+        Returns:
+            Requêtes à actualiser, dans l'ordre topologique
+        """
+        seeds = set(changed)
+        seeds.update(name for name, node in self.nodes.items() if node.sources)
+        return self.topological_order(self.dependents(seeds))
+
+
+def plan_refresh(editor, report: Dict[str, dict]) -> Optional[List[str]]:
+    """
+    Calcule les requêtes à actualiser après la réécriture des requêtes.
+
+    Args:
+        editor: Objet exposant get_query_formulas (OOXMLWorkbook ou ExcelAutomation)
+        report: Diff retourné par rewrite_queries
+
+    Returns:
+        Noms de requêtes dans l'ordre d'actualisation (les connexions sont
+        retrouvées à l'actualisation), ou None pour une actualisation
+        complète (graphe indisponible ou aucune requête à actualiser)
+    """
+    try:
+        formulas = editor.get_query_formulas()
+        if not formulas:
+            return None
+        graph = QueryGraph(formulas)
+        changed = [name for name, entry in report.items() if entry["status"] == "updated"]
+        affected = graph.affected(changed)
+    except Exception as e:
+        print(f"  ATTENTION: Graphe des requêtes indisponible ({e}), actualisation complète")
+        return None
+    if not affected:
+        print("  Aucune requête à actualiser d'après le graphe, actualisation complète")
+        return None
+
+    skipped = [name for name in graph.order if name not in affected]
+    print(f"  Requêtes à actualiser: {len(affected)}/{len(graph.order)}")
+    for name in affected:
+        print(f"    - {name}")
+    static = [name for name in skipped if graph.nodes[name].static]
+    if static:
+        print(f"  Requêtes statiques ignorées: {', '.join(static)}")
+    return affected
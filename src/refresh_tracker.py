@@ -0,0 +1,270 @@
+"""
+Suivi de la fin d'actualisation des connexions d'un classeur.
+
+Deux mécanismes, combinés :
+    - évènements AfterRefresh des QueryTable (tables chargées par Power Query)
+      lorsque le backend les supporte (pywin32 WithEvents) ;
+    - scrutation à intervalle croissant (back-off) de la propriété Refreshing
+      des connexions OLEDB/ODBC restantes.
+
+wait() rend la main dès que toutes les connexions sont terminées, au lieu
+d'attentes fixes, et retourne la durée de chaque connexion. En
+actualisation parallèle, les connexions sont lancées une à une (launch)
+et wait_any() rend la main dès que l'une d'elles se termine. Les connexions
+viennent du registre du classeur (ConnectionRegistry) : seules celles
+armées et actualisables sont interrogées.
+"""
+import time
+from typing import Dict, List, Optional
+
+from src.connection_registry import ConnectionInfo, ConnectionRegistry
+
+# Scrutation : premier intervalle, facteur de croissance, intervalle maximal
+POLL_INITIAL = 0.05
+POLL_FACTOR = 1.5
+POLL_MAX = 2.0
+# Délai au-delà duquel une connexion jamais vue "en cours" est considérée
+# terminée (cas d'une actualisation synchrone déjà finie au retour de RefreshAll)
+START_GRACE = 1.0
+
+
+class _QueryTableEvents:
+    """Gestionnaire d'évènements COM d'une QueryTable (instancié par WithEvents)."""
+
+    tracker = None
+    connection_name = None
+
+    def OnAfterRefresh(self, Success):
+        if self.tracker is not None:
+            self.tracker.settle(self.connection_name, bool(Success))
+
+
+class _TrackedConnection:
+    """État de suivi d'une connexion."""
+
+    def __init__(self, info: ConnectionInfo):
+        self.name = info.name
+        self.info = info
+        self.proxy = info.proxy  # OLEDBConnection / ODBCConnection
+        self.has_events = False
+        self.pending = False
+        self.seen_refreshing = False
+        self.refresh_date = None
+        self.rows: Optional[int] = None   # lignes du tableau chargé avant la passe
+        self.elapsed: Optional[float] = None
+        self.success: Optional[bool] = None
+        self.armed = False
+        self.started_at = 0.0
+
+
+class RefreshTracker:
+    """
+    Suivi des actualisations d'un classeur ouvert.
+
+    Usage:
+        tracker = RefreshTracker(workbook, backend, registry)
+        tracker.arm()
+        workbook.RefreshAll()
+        durations = tracker.wait(timeout=300)
+    """
+
+    def __init__(self, workbook, backend=None, registry: Optional[ConnectionRegistry] = None):
+        self.workbook = workbook
+        self.backend = backend
+        self.registry = registry if registry is not None else ConnectionRegistry(workbook)
+        self._connections: Dict[str, _TrackedConnection] = {}
+        self._handlers = []
+        self._armed_at = 0.0
+        self._discover()
+
+    def _discover(self):
+        """Reprend les connexions actualisables du registre et branche les évènements disponibles."""
+        for info in self.registry.refreshable():
+            self._connections[info.name] = _TrackedConnection(info)
+
+        if not self._connections:
+            return
+        self.registry.load_tables()
+        if self.backend is None:
+            return
+        for name, tracked in self._connections.items():
+            if tracked.info.query_table is None:
+                continue
+            handler = self.backend.with_events(tracked.info.query_table, _QueryTableEvents)
+            if handler is not None:
+                handler.tracker = self
+                handler.connection_name = name
+                tracked.has_events = True
+                self._handlers.append(handler)
+
+    @property
+    def names(self):
+        return list(self._connections)
+
+    def arm(self, names=None):
+        """
+        Marque les connexions comme attendues, juste avant de lancer l'actualisation.
+
+        Args:
+            names: Connexions à suivre (par défaut toutes)
+        """
+        self._armed_at = time.perf_counter()
+        for name, tracked in self._connections.items():
+            tracked.pending = names is None or name in names
+            tracked.armed = tracked.pending
+            tracked.seen_refreshing = False
+            tracked.elapsed = None
+            tracked.success = None
+            # Date relue pour les seules connexions attendues (comparée en fin de passe)
+            tracked.refresh_date = tracked.info.read_refresh_date() if tracked.armed else None
+            tracked.rows = tracked.info.loaded_rows() if tracked.armed else None
+            tracked.started_at = self._armed_at
+
+    def launch(self, name: str):
+        """
+        Arme une connexion de plus, sans toucher aux autres (actualisation
+        en parallèle), juste avant de lancer son actualisation.
+        """
+        tracked = self._connections[name]
+        tracked.pending = tracked.armed = True
+        tracked.seen_refreshing = False
+        tracked.elapsed = None
+        tracked.success = None
+        tracked.refresh_date = tracked.info.read_refresh_date()
+        tracked.rows = tracked.info.loaded_rows()
+        tracked.started_at = time.perf_counter()
+
+    def settle(self, name: str, success: bool = True):
+        """Marque une connexion comme terminée (évènement, scrutation ou échec du lancement)."""
+        tracked = self._connections.get(name)
+        if tracked is not None and tracked.pending:
+            tracked.pending = False
+            tracked.success = success
+            tracked.elapsed = time.perf_counter() - tracked.started_at
+
+    def _poll(self, tracked: _TrackedConnection):
+        """Vérifie l'état d'une connexion sans évènement."""
+        try:
+            refreshing = tracked.proxy.Refreshing
+        except Exception:
+            self.settle(tracked.name, False)
+            return
+        if refreshing:
+            tracked.seen_refreshing = True
+            return
+        started = tracked.seen_refreshing
+        if not started:
+            started = tracked.refresh_date != tracked.info.read_refresh_date()
+        if started or time.perf_counter() - tracked.started_at > START_GRACE:
+            self.settle(tracked.name, True)
+
+    def pending(self):
+        """Noms des connexions encore en attente."""
+        return [name for name, tracked in self._connections.items() if tracked.pending]
+
+    def _poll_round(self):
+        """Une scrutation des connexions en attente."""
+        if self.backend is not None:
+            self.backend.pump_messages()
+        now = time.perf_counter()
+        for tracked in self._connections.values():
+            if not tracked.pending:
+                continue
+            # Avec évènement : scrutation en filet de sécurité seulement, s'il n'arrive pas
+            if not tracked.has_events or now - tracked.started_at > START_GRACE:
+                self._poll(tracked)
+
+    def _wait_until(self, done, deadline: float):
+        """Scrute à intervalle croissant jusqu'à done() ou l'échéance (time.perf_counter)."""
+        interval = POLL_INITIAL
+        while True:
+            self._poll_round()
+            if done():
+                return
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            time.sleep(min(interval, deadline - now))
+            interval = min(interval * POLL_FACTOR, POLL_MAX)
+
+    def wait(self, timeout: float) -> Dict[str, Optional[float]]:
+        """
+        Attend la fin de toutes les connexions armées.
+
+        Args:
+            timeout: Durée maximale d'attente en secondes
+
+        Returns:
+            Dictionnaire nom -> durée en secondes depuis arm()
+            (None pour une connexion non terminée à l'expiration du délai)
+        """
+        self._wait_until(lambda: not self.pending(), self._armed_at + timeout)
+        return self.durations()
+
+    def wait_any(self, deadline: float) -> List[str]:
+        """
+        Attend qu'au moins une des connexions en cours se termine.
+
+        Args:
+            deadline: Échéance (time.perf_counter)
+
+        Returns:
+            Connexions terminées pendant l'attente (vide à l'échéance)
+        """
+        running = self.pending()
+        if not running:
+            return []
+        self._wait_until(lambda: len(self.pending()) < len(running), deadline)
+        return [name for name in running if not self._connections[name].pending]
+
+    def durations(self) -> Dict[str, Optional[float]]:
+        """Durée de chaque connexion armée (None si non terminée)."""
+        return {
+            name: tracked.elapsed
+            for name, tracked in self._connections.items()
+            if tracked.elapsed is not None or tracked.pending
+        }
+
+    def armed(self) -> List[str]:
+        """Connexions attendues lors de la dernière passe."""
+        return [name for name, tracked in self._connections.items() if tracked.armed]
+
+    def failed(self):
+        """Noms des connexions terminées en échec (AfterRefresh Success=False)."""
+        return [name for name, tracked in self._connections.items() if tracked.success is False]
+
+    def stale(self):
+        """
+        Connexions de la dernière passe dont les données ne sont pas à jour :
+        échec signalé, toujours en cours, ou date d'actualisation inchangée.
+        Une date illisible ne compte pas comme un échec si l'actualisation
+        s'est terminée avec succès et n'est plus en cours.
+        """
+        result = []
+        for name, tracked in self._connections.items():
+            if not tracked.armed:
+                continue
+            if tracked.pending or tracked.success is False:
+                result.append(name)
+                continue
+            date = tracked.info.read_refresh_date()
+            if date is None:
+                if not tracked.success or tracked.info.is_refreshing() is not False:
+                    result.append(name)
+            elif date == tracked.refresh_date:
+                result.append(name)
+        return result
+
+    def emptied(self):
+        """
+        Connexions de la dernière passe dont le tableau chargé avait des lignes
+        avant l'actualisation et n'en a plus (une requête vide d'une semaine
+        à l'autre n'est pas un échec).
+        """
+        result = []
+        for name, tracked in self._connections.items():
+            if not tracked.armed or tracked.pending or not tracked.rows:
+                continue
+            if tracked.info.loaded_rows() == 0:
+                result.append(name)
+        return result
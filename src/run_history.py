@@ -0,0 +1,327 @@
+"""
+Historique des exécutions hebdomadaires (base SQLite dans LOGS_DIR).
+
+Chaque mise à jour de classeur y enregistre, pour l'exécution en cours :
+    - la durée de chaque étape du journal (copied, date_bumped, ...,
+      refreshed, saved, published) ;
+    - la durée de chaque connexion, par passe d'actualisation ;
+    - la tentative ayant abouti pour les connexions actualisées à nouveau
+      après un échec (vide si elles sont restées en échec) ;
+    - la taille du classeur produit et le nombre de lignes de ses tableaux.
+
+Les processus lancés par le lanceur (PARALLEL_WORKERS > 1) partagent
+l'identifiant d'exécution via la variable d'environnement KIABI_RUN_ID.
+
+regressions() compare la dernière mesure de chaque étape / connexion à la
+médiane des exécutions précédentes ; scripts/history_report.py affiche
+les tendances.
+"""
+import os
+import re
+import socket
+import sqlite3
+import statistics
+import subprocess
+import zipfile
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import LOGS_DIR, PROJECT_ROOT, REGRESSION_THRESHOLD, RUN_HISTORY
+
+HISTORY_DB = LOGS_DIR / "run_history.sqlite3"
+
+_RUN_ENV = "KIABI_RUN_ID"
+
+# Écart minimal (secondes) pour signaler une régression : ignore le bruit
+# des étapes très courtes
+_MIN_DELTA = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id   TEXT PRIMARY KEY,
+    started  TEXT NOT NULL,
+    host     TEXT,
+    revision TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      TEXT NOT NULL REFERENCES runs(run_id),
+    prefix      TEXT NOT NULL,
+    source_week INTEGER,
+    target_week INTEGER,
+    success     INTEGER NOT NULL,
+    resumed     INTEGER NOT NULL DEFAULT 0,
+    seconds     REAL,
+    size_bytes  INTEGER,
+    connections INTEGER,
+    table_rows  INTEGER,
+    finished    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    step    TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS connections (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    pass    INTEGER NOT NULL,
+    name    TEXT NOT NULL,
+    seconds REAL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    name    TEXT NOT NULL,
+    attempt INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_prefix ON files(prefix, id);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    # Délai d'attente : plusieurs processus de travail écrivent en même temps
+    connection = sqlite3.connect(HISTORY_DB, timeout=30)
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def git_revision() -> Optional[str]:
+    """Révision git du projet (None pour l'exécutable ou hors dépôt)."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def current_run() -> str:
+    """
+    Identifiant de l'exécution en cours (créée au premier appel).
+
+    Returns:
+        Identifiant, partagé avec les processus lancés ensuite
+    """
+    run_id = os.environ.get(_RUN_ENV)
+    if run_id:
+        return run_id
+    now = datetime.now()
+    run_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    os.environ[_RUN_ENV] = run_id
+    if RUN_HISTORY:
+        try:
+            with closing(_connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR IGNORE INTO runs (run_id, started, host, revision) VALUES (?, ?, ?, ?)",
+                    (run_id, now.isoformat(timespec="seconds"), socket.gethostname(), git_revision()),
+                )
+        except sqlite3.Error as e:
+            print(f"  ATTENTION: Historique des exécutions indisponible ({e})")
+    return run_id
+
+
+def table_rows(workbook_file: Path) -> Optional[int]:
+    """
+    Nombre total de lignes de données des tableaux d'un classeur
+    (lu dans les parties xl/tables, sans charger les feuilles).
+
+    Returns:
+        Nombre de lignes, ou None si le classeur est illisible
+    """
+    total = 0
+    try:
+        with zipfile.ZipFile(workbook_file) as archive:
+            for name in archive.namelist():
+                if not re.match(r"xl/tables/table\d+\.xml$", name):
+                    continue
+                head = archive.read(name)[:2048].decode("utf-8", "ignore")
+                match = re.search(r'\bref="[A-Z]+(\d+):[A-Z]+(\d+)"', head)
+                header = re.search(r'\bheaderRowCount="0"', head) is None
+                if match:
+                    total += int(match.group(2)) - int(match.group(1)) + 1 - int(header)
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return total
+
+
+def record_file(journal, success: bool, excel=None, seconds: Optional[float] = None):
+    """
+    Enregistre la mise à jour d'un classeur dans l'exécution en cours.
+
+    Args:
+        journal: StepJournal de la mise à jour (étapes chronométrées)
+        success: Résultat de la mise à jour
+        excel: Instance ExcelAutomation (durées d'actualisation par connexion)
+        seconds: Durée totale (par défaut: somme des étapes)
+    """
+    if not RUN_HISTORY or not journal.exists():
+        return
+    timings = journal.timings
+    # Durées par connexion seulement si l'actualisation a eu lieu dans ce processus
+    refreshed = any(step == "refreshed" for step, _ in timings)
+    passes = (getattr(excel, "refresh_passes", None) or []) if refreshed else []
+    attempts = (getattr(excel, "refresh_attempts", None) or {}) if refreshed else {}
+    workbook_file = journal.target_file if success else journal.work_file
+    try:
+        size = workbook_file.stat().st_size
+    except OSError:
+        size = None
+    rows = table_rows(workbook_file) if size else None
+    if seconds is None:
+        seconds = sum(elapsed for _, elapsed in timings)
+
+    try:
+        run_id = current_run()
+        with closing(_connect()) as connection, connection:
+            cursor = connection.execute(
+                "INSERT INTO files (run_id, prefix, source_week, target_week, success, resumed,"
+                " seconds, size_bytes, connections, table_rows, finished)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, journal.prefix, journal.source_week, journal.target_week,
+                    int(success), int(journal.resumed), seconds, size,
+                    len(passes[0]) if passes else None, rows,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            file_id = cursor.lastrowid
+            connection.executemany(
+                "INSERT INTO steps (file_id, step, seconds) VALUES (?, ?, ?)",
+                [(file_id, name, elapsed) for name, elapsed in timings],
+            )
+            connection.executemany(
+                "INSERT INTO connections (file_id, pass, name, seconds) VALUES (?, ?, ?, ?)",
+                [
+                    (file_id, number, name, elapsed)
+                    for number, durations in enumerate(passes, 1)
+                    for name, elapsed in durations.items()
+                ],
+            )
+            # Connexions n'ayant pas abouti du premier coup seulement
+            connection.executemany(
+                "INSERT INTO attempts (file_id, name, attempt) VALUES (?, ?, ?)",
+                [(file_id, name, attempt) for name, attempt in attempts.items() if attempt != 1],
+            )
+    except sqlite3.Error as e:
+        print(f"  ATTENTION: Historique non enregistré ({e})")
+
+
+# ----------------------------------------------------------------------
+# Lecture
+# ----------------------------------------------------------------------
+
+def series(prefix: Optional[str] = None, limit: int = 10) -> Dict[tuple, List[tuple]]:
+    """
+    Mesures des dernières mises à jour réussies, par classeur.
+
+    Args:
+        prefix: Classeur à lire (par défaut tous)
+        limit: Nombre de mises à jour par classeur
+
+    Returns:
+        Dictionnaire (préfixe, mesure) -> [(run_id, valeur), ...] du plus
+        ancien au plus récent. Mesures : "total", "étape <nom>",
+        "connexion <nom>" (passe 1), "taille Mo", "lignes".
+    """
+    if not HISTORY_DB.exists():
+        return {}
+    result: Dict[tuple, List[tuple]] = {}
+    with closing(_connect()) as connection:
+        prefixes = [prefix] if prefix else [
+            row[0] for row in connection.execute("SELECT DISTINCT prefix FROM files ORDER BY prefix")
+        ]
+        for name in prefixes:
+            files = connection.execute(
+                "SELECT id, run_id, seconds, size_bytes, table_rows FROM files"
+                " WHERE prefix = ? AND success = 1 AND resumed = 0 ORDER BY id DESC LIMIT ?",
+                (name, limit),
+            ).fetchall()[::-1]
+            for file_id, run_id, seconds, size, rows in files:
+                values = [("total", seconds)]
+                if size is not None:
+                    values.append(("taille Mo", size / 1e6))
+                if rows is not None:
+                    values.append(("lignes", rows))
+                values += [
+                    (f"étape {step}", elapsed) for step, elapsed in connection.execute(
+                        "SELECT step, seconds FROM steps WHERE file_id = ?", (file_id,)
+                    )
+                ]
+                values += [
+                    (f"connexion {connection_name}", elapsed) for connection_name, elapsed in connection.execute(
+                        "SELECT name, seconds FROM connections WHERE file_id = ? AND pass = 1"
+                        " AND seconds IS NOT NULL", (file_id,)
+                    )
+                ]
+                for measure, value in values:
+                    result.setdefault((name, measure), []).append((run_id, value))
+    return result
+
+
+def _is_duration(measure: str) -> bool:
+    return measure == "total" or measure.startswith(("étape ", "connexion "))
+
+
+def regressions(threshold: float = REGRESSION_THRESHOLD, window: int = 5,
+                run_id: Optional[str] = None, prefix: Optional[str] = None) -> List[dict]:
+    """
+    Durées en régression : dernière mesure supérieure à threshold fois la
+    médiane des window mesures précédentes (et d'au moins une seconde).
+
+    Args:
+        threshold: Rapport à la médiane au-delà duquel la durée est signalée
+        window: Nombre de mesures précédentes prises pour référence
+        run_id: Ne signaler que les mesures de cette exécution
+        prefix: Classeur à analyser (par défaut tous)
+
+    Returns:
+        Liste de {"prefix", "measure", "value", "median", "ratio"}
+    """
+    found = []
+    for (name, measure), values in series(prefix, limit=window + 1).items():
+        if not _is_duration(measure) or len(values) < 2:
+            continue
+        last_run, last = values[-1]
+        if run_id is not None and last_run != run_id:
+            continue
+        median = statistics.median(value for _, value in values[:-1])
+        if last > median * threshold and last - median >= _MIN_DELTA:
+            found.append({
+                "prefix": name,
+                "measure": measure,
+                "value": last,
+                "median": median,
+                "ratio": last / median if median else float("inf"),
+            })
+    return sorted(found, key=lambda item: -item["ratio"])
+
+
+def print_regressions(run_id: Optional[str] = None, threshold: float = REGRESSION_THRESHOLD) -> bool:
+    """
+    Affiche les durées en régression de l'exécution.
+
+    Returns:
+        True si aucune régression n'est détectée
+    """
+    if not RUN_HISTORY:
+        return True
+    try:
+        found = regressions(threshold, run_id=run_id)
+    except sqlite3.Error as e:
+        print(f"  ATTENTION: Historique illisible ({e})")
+        return True
+    if not found:
+        return True
+    print(f"\n  Régressions (> {threshold:g} x médiane des exécutions précédentes):")
+    for item in found:
+        print(
+            f"    {item['prefix']:<15} {item['measure']:<36} {item['value']:7.1f} s"
+            f"  (médiane {item['median']:.1f} s, x{item['ratio']:.1f})"
+        )
+    return False
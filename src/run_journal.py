@@ -0,0 +1,288 @@
+"""
+Journal des étapes de la mise à jour hebdomadaire d'un classeur.
+
+Chaque classeur produit a son journal (LOGS_DIR/journal/PREFIXE.json) :
+fichiers source / cible / de travail, semaines, et étapes réalisées
+(copied, date_bumped, queries_patched, links_changed, refreshed, saved,
+published), avec l'empreinte SHA-256 du fichier sur disque à chaque point
+de reprise.
+
+Une exécution interrompue est reprise au dernier point de reprise dont
+le fichier est intact :
+    - "saved"  : classeur actualisé et sauvegardé, il ne reste qu'à le publier ;
+    - "edited" : modifications écrites (édition OOXML), reprise à l'actualisation ;
+    - sinon la mise à jour repart du même fichier source, vers le même
+      fichier cible (le fichier à moitié produit est écrasé, jamais pris
+      pour source).
+
+clean.py s'appuie sur le journal pour annuler exactement la dernière
+exécution (fichier publié, espace de travail).
+"""
+import hashlib
+import json
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config import LOGS_DIR
+from src.staging import discard, workspace_file
+
+JOURNAL_DIR = LOGS_DIR / "journal"
+
+# Étapes d'édition : écrites sur disque ensemble (point de reprise "edited")
+EDIT_STEPS = ("copied", "date_bumped", "queries_patched", "links_changed")
+
+_JOURNAL_VERSION = 1
+
+
+def file_hash(path: Path) -> Optional[str]:
+    """Empreinte SHA-256 d'un fichier (None s'il n'existe pas)."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class StepJournal:
+    """Journal d'un classeur, identifié par son préfixe (ex: "SUIVI_CRM")."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.path = JOURNAL_DIR / f"{prefix}.json"
+        self.data = self._load()
+        # Durée de chaque étape enregistrée par ce processus (historique des exécutions)
+        self.timings: List[Tuple[str, float]] = []
+        self.resumed = False
+        self._mark = time.perf_counter()
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if data.get("version") == _JOURNAL_VERSION else {}
+
+    def _save(self):
+        JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_suffix(".tmp")
+        temp_file.write_text(json.dumps(self.data, indent=2, ensure_ascii=False), encoding="utf-8")
+        temp_file.replace(self.path)
+
+    # ------------------------------------------------------------------
+    # Contenu
+    # ------------------------------------------------------------------
+
+    def exists(self) -> bool:
+        return bool(self.data)
+
+    @property
+    def source_file(self) -> Path:
+        return Path(self.data["source"])
+
+    @property
+    def target_file(self) -> Path:
+        return Path(self.data["target"])
+
+    @property
+    def work_file(self) -> Path:
+        return Path(self.data["work"])
+
+    @property
+    def source_week(self) -> int:
+        return self.data["source_week"]
+
+    @property
+    def target_week(self) -> int:
+        return self.data["target_week"]
+
+    @property
+    def steps(self) -> List[dict]:
+        return self.data.get("steps", [])
+
+    def done(self, step: str) -> bool:
+        return any(entry["step"] == step for entry in self.steps)
+
+    def mark(self):
+        """Reprend le chronométrage des étapes (temps d'attente non compté)."""
+        self._mark = time.perf_counter()
+
+    def _time(self, step: str):
+        now = time.perf_counter()
+        self.timings.append((step, now - self._mark))
+        self._mark = now
+
+    # ------------------------------------------------------------------
+    # Enregistrement
+    # ------------------------------------------------------------------
+
+    def start(self, source_file: Path, target_file: Path, work_file: Path,
+              source_week: int, target_week: int):
+        """Commence le journal d'une nouvelle mise à jour (remplace le précédent)."""
+        self.data = {
+            "version": _JOURNAL_VERSION,
+            "prefix": self.prefix,
+            "status": "running",
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "source": str(source_file),
+            "source_hash": file_hash(source_file),
+            "source_week": source_week,
+            "target": str(target_file),
+            "target_week": target_week,
+            "work": str(work_file),
+            "steps": [],
+        }
+        self._save()
+
+    def record(self, step: str):
+        """Enregistre une étape terminée (en mémoire dans Excel ou l'éditeur)."""
+        self._time(step)
+        self.steps.append({"step": step, "at": datetime.now().isoformat(timespec="seconds")})
+        self._save()
+
+    def checkpoint(self, path: Path):
+        """
+        Point de reprise : le fichier sur disque contient les étapes enregistrées
+        depuis le point précédent. Leur empreinte est ajoutée au journal.
+        """
+        digest = file_hash(path)
+        for entry in self.steps:
+            if "sha256" not in entry:
+                entry["sha256"] = digest
+                entry["file"] = str(path)
+        self._save()
+        self.mark()
+
+    def published(self, path: Path):
+        """
+        Enregistre la publication du classeur et termine la mise à jour
+        (le journal reste pour clean.py).
+        """
+        self._time("published")
+        self.steps.append({
+            "step": "published",
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "sha256": file_hash(path),
+            "file": str(path),
+        })
+        self.data["status"] = "done"
+        self._save()
+
+    # ------------------------------------------------------------------
+    # Reprise
+    # ------------------------------------------------------------------
+
+    def pending(self, latest_file: Optional[Path] = None) -> bool:
+        """
+        True si une mise à jour interrompue peut être reprise.
+
+        Args:
+            latest_file: Dernier fichier du dossier ; le journal est ignoré si
+                         ce n'est ni sa source ni sa cible (fichiers produits depuis)
+        """
+        if not self.data or self.data.get("status") != "running":
+            return False
+        if not self.source_file.exists():
+            return False
+        if latest_file is not None and Path(latest_file) not in (self.source_file, self.target_file):
+            return False
+        return True
+
+    def has_checkpoint(self) -> bool:
+        return any("sha256" in entry for entry in self.steps)
+
+    def resume_step(self) -> Optional[str]:
+        """
+        Point de reprise dont le fichier est intact.
+
+        Returns:
+            "saved", "edited", ou None (reprise depuis le fichier source)
+        """
+        for entry in reversed(self.steps):
+            if "sha256" not in entry:
+                continue
+            if file_hash(Path(entry["file"])) != entry["sha256"]:
+                return None
+            if entry["step"] == "saved":
+                return "saved"
+            if entry["step"] in EDIT_STEPS:
+                return "edited"
+        return None
+
+    def begin(self, source_file: Path, target_file: Path, source_week: int, target_week: int,
+              staging: bool = True) -> Tuple[Path, Optional[str]]:
+        """
+        Reprend la mise à jour interrompue vers target_file, ou en commence une nouvelle.
+
+        Args:
+            source_file: Classeur source
+            target_file: Classeur à produire
+            source_week: Semaine du classeur source
+            target_week: Semaine du classeur à produire
+            staging: Staging autorisé pour ce classeur
+
+        Returns:
+            (fichier de travail, point de reprise "saved" / "edited" ou None)
+        """
+        if self.pending() and self.target_file == Path(target_file):
+            resume = self.resume_step()
+            if resume:
+                print(f"  Reprise au point '{resume}' ({self.work_file})")
+                self.resumed = True
+                return self.work_file, resume
+            print("  Aucun point de reprise intact, reprise depuis le fichier source")
+            discard(self.work_file, self.target_file)
+        work_file = workspace_file(target_file, staging)
+        self.start(source_file, target_file, work_file, source_week, target_week)
+        return work_file, None
+
+    def note(self, key: str, value):
+        """Conserve une information utile à la reprise (ex: connexions à actualiser)."""
+        self.data[key] = value
+        self._save()
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    # ------------------------------------------------------------------
+    # Annulation (clean.py)
+    # ------------------------------------------------------------------
+
+    def rollback(self) -> bool:
+        """
+        Annule la dernière mise à jour journalisée : supprime le fichier cible
+        s'il est encore tel que produit, l'espace de travail local et le journal.
+
+        Returns:
+            True si tout a été annulé
+        """
+        if not self.data:
+            return False
+        target = self.target_file
+        produced = {entry.get("sha256") for entry in self.steps if entry.get("file") == str(target)}
+        produced.discard(None)
+
+        complete = True
+        if target.exists():
+            if file_hash(target) in produced:
+                target.unlink()
+                print(f"{self.prefix}: supprimé {target.name}")
+            else:
+                print(f"{self.prefix}: ATTENTION, {target.name} a été modifié depuis la mise à jour, conservé")
+                complete = False
+        else:
+            print(f"{self.prefix}: {target.name} absent, rien à supprimer")
+
+        if self.work_file != target and self.work_file.parent.exists():
+            shutil.rmtree(self.work_file.parent, ignore_errors=True)
+            print(f"{self.prefix}: espace de travail supprimé")
+
+        if complete:
+            self.path.unlink(missing_ok=True)
+            self.data = {}
+        return complete
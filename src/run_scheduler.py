@@ -0,0 +1,311 @@
+"""
+Planification de l'exécution hebdomadaire selon les liaisons entre classeurs.
+
+Le graphe des mises à jour est construit à partir :
+    - de la clé "linked_files" des configurations (ex: TRAFIC lit CRM et KPIS) ;
+    - des liaisons externes réellement présentes dans le dernier classeur
+      de chaque dossier (parties externalLink).
+
+Un classeur n'est traité qu'une fois les classeurs dont il dépend
+sauvegardés avec succès. Les classeurs indépendants sont traités en
+parallèle (PARALLEL_WORKERS > 1) ou à la suite avec une instance Excel
+partagée. À la suite, les étapes sans Excel d'une mise à jour qui en
+déclare (clé "pipeline" de la configuration : module avec prepare_file et
+finish_file) sont faites pendant l'actualisation de la mise à jour
+précédente, si ses dépendances sont déjà sauvegardées (voir
+src/pipeline.py). Le rapport final indique le chemin critique de
+l'exécution.
+"""
+import functools
+import importlib
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import ONEDRIVE_BASE_PATH
+from src.hydration import prefetch_latest
+from src.ooxml_workbook import OOXMLWorkbook
+from src.pipeline import PreparationPipeline
+from src.week_index import find_latest_file
+from src.worker_pool import WorkerJob, create_pool, failed_result, print_result, run_job
+
+
+class RunNode:
+    """Mise à jour d'un classeur et ses dépendances."""
+
+    def __init__(self, name: str, config: dict):
+        self.name = name
+        self.config = config
+        self.module = config["script"]
+        # Module avec prepare_file / finish_file (préparation anticipée) ou None
+        self.pipeline = config.get("pipeline")
+        # dépendance -> origine ("config" ou "liaison")
+        self.depends: Dict[str, str] = {}
+
+    def __repr__(self):
+        return f"RunNode({self.name!r}, depends={sorted(self.depends)})"
+
+
+def _latest_workbook(config: dict) -> Optional[Path]:
+    """Classeur de la semaine la plus récente du dossier d'une configuration."""
+    latest = find_latest_file(
+        ONEDRIVE_BASE_PATH / config["folder"], config["file_prefix"],
+        config.get("file_ext", ".xlsx"), quiet=True,
+    )
+    return latest.path if latest else None
+
+
+def _linked_nodes(config: dict, prefixes: Dict[str, str]) -> Set[str]:
+    """Mises à jour dont le classeur est la cible d'une liaison externe."""
+    workbook_file = _latest_workbook(config)
+    if workbook_file is None:
+        return set()
+    try:
+        book = OOXMLWorkbook(workbook_file)
+    except Exception as e:
+        print(f"  ATTENTION: Liaisons de {workbook_file.name} illisibles ({e})")
+        return set()
+    try:
+        links = book.get_external_links()
+    finally:
+        book.close()
+
+    linked = set()
+    for link in links:
+        stem = Path(link.replace("\\", "/")).name
+        for prefix, name in prefixes.items():
+            if re.match(rf"{re.escape(prefix)}_S\d+", stem, re.IGNORECASE):
+                linked.add(name)
+    return linked
+
+
+def build_run_graph(configs: Dict[str, dict], discover_links: bool = True) -> Dict[str, RunNode]:
+    """
+    Construit le graphe des mises à jour.
+
+    Args:
+        configs: Dictionnaire nom -> configuration (ex: ALL_CONFIGS)
+        discover_links: Si True, lit aussi les liaisons externes des classeurs
+
+    Returns:
+        Dictionnaire nom -> RunNode, dans l'ordre des configurations
+    """
+    nodes = {name: RunNode(name, config) for name, config in configs.items()}
+    prefixes = {config["file_prefix"]: name for name, config in configs.items()}
+
+    for name, node in nodes.items():
+        for linked in node.config.get("linked_files", []):
+            if linked in nodes and linked != name:
+                node.depends[linked] = "config"
+        if discover_links:
+            for linked in _linked_nodes(node.config, prefixes):
+                if linked != name:
+                    node.depends.setdefault(linked, "liaison")
+    return nodes
+
+
+def topological_order(nodes: Dict[str, RunNode]) -> List[str]:
+    """
+    Ordre d'exécution respectant les dépendances (ordre des configurations à égalité).
+
+    Raises:
+        ValueError: Si les liaisons forment un cycle
+    """
+    order = []
+    done = set()
+    while len(order) < len(nodes):
+        ready = [
+            name for name, node in nodes.items()
+            if name not in done and set(node.depends) <= done
+        ]
+        if not ready:
+            cycle = sorted(set(nodes) - done)
+            raise ValueError(f"Liaisons circulaires entre classeurs: {', '.join(cycle)}")
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+
+class RunScheduler:
+    """
+    Exécute les mises à jour du graphe dans l'ordre des dépendances.
+
+    Usage:
+        scheduler = RunScheduler(build_run_graph(ALL_CONFIGS), max_workers=3)
+        results = scheduler.run()
+        scheduler.print_report()
+    """
+
+    def __init__(self, nodes: Dict[str, RunNode], max_workers: int = 1):
+        self.nodes = nodes
+        self.order = topological_order(nodes)
+        self.max_workers = max(1, max_workers)
+        # nom -> {"success", "elapsed", "start", "end", "status"}
+        self.results: Dict[str, dict] = {}
+        self.wall_seconds = 0.0
+
+    def _blocked_by(self, name: str) -> List[str]:
+        """Dépendances en échec (ou ignorées) d'une mise à jour."""
+        return [
+            dependency for dependency in self.nodes[name].depends
+            if not self.results.get(dependency, {}).get("success")
+        ]
+
+    def _record(self, name: str, success: bool, start: float, end: float, status: str):
+        self.results[name] = {
+            "success": success,
+            "elapsed": end - start,
+            "start": start,
+            "end": end,
+            "status": status,
+        }
+
+    def _skip(self, name: str, blocked: List[str]):
+        now = time.perf_counter() - self._t0
+        print(f"\n>>> {name} ignoré (dépendance en échec: {', '.join(blocked)})")
+        self._record(name, False, now, now, "ignoré")
+
+    def run(self) -> Dict[str, bool]:
+        """
+        Lance toutes les mises à jour.
+
+        Returns:
+            Dictionnaire nom -> succès, dans l'ordre d'exécution
+        """
+        self._t0 = time.perf_counter()
+        print("\nOrdre des mises à jour:")
+        for name in self.order:
+            depends = self.nodes[name].depends
+            suffix = f" (après {', '.join(depends)})" if depends else ""
+            print(f"  - {name}{suffix}")
+
+        # Derniers classeurs de chaque dossier téléchargés pendant le démarrage d'Excel
+        prefetch_latest(node.config for node in self.nodes.values())
+
+        if self.max_workers > 1:
+            self._run_parallel()
+        else:
+            self._run_sequential()
+
+        self.wall_seconds = time.perf_counter() - self._t0
+        return {name: self.results[name]["success"] for name in self.order}
+
+    def _prepare(self, name: str, config: dict):
+        """Étapes sans Excel d'une mise à jour (None sans clé "pipeline" ou si une dépendance a échoué)."""
+        module = self.nodes[name].pipeline
+        if module is None or self._blocked_by(name):
+            return None
+        return importlib.import_module(module).prepare_file(name, config)
+
+    def _announce(self, name: str):
+        if not self._blocked_by(name):
+            print(f"\n>>> [{self.order.index(name) + 1}/{len(self.order)}] Mise a jour {name}...")
+
+    def _run_sequential(self):
+        """Une mise à jour à la fois, avec une instance Excel partagée et la suivante préparée en arrière-plan."""
+        from src.com_trace import span
+        from src.excel_session import ExcelSession
+
+        pipeline = PreparationPipeline(
+            {name: self.nodes[name].config for name in self.order}, self._prepare,
+            discard=lambda prepared: prepared.discard(),
+            ready=lambda name: not self._blocked_by(name), announce=self._announce,
+        )
+        try:
+            with ExcelSession(visible=False) as session:
+                for name, config, prepared in pipeline:
+                    blocked = self._blocked_by(name)
+                    if blocked:
+                        self._skip(name, blocked)
+                        continue
+                    start = time.perf_counter() - self._t0
+                    node = self.nodes[name]
+                    try:
+                        if node.pipeline:
+                            main = functools.partial(importlib.import_module(node.pipeline).finish_file, prepared)
+                        else:
+                            main = importlib.import_module(node.module).main
+                        with span(name):
+                            success = session.run(name, main)
+                    except Exception as e:
+                        print(f"ERREUR: {e}")
+                        success = False
+                    end = time.perf_counter() - self._t0
+                    self._record(name, success, start, end, "OK" if success else "ERREUR")
+        finally:
+            pipeline.close()
+
+    def _run_parallel(self):
+        """Mises à jour prêtes lancées dès que leurs dépendances sont sauvegardées."""
+        pending = list(self.order)
+        running = {}
+        print(f"\nExécution parallèle: {self.max_workers} processus au plus")
+        with create_pool(self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if not set(self.nodes[name].depends) <= set(self.results):
+                        continue
+                    pending.remove(name)
+                    blocked = self._blocked_by(name)
+                    if blocked:
+                        self._skip(name, blocked)
+                        continue
+                    print(f"\n>>> Lancement {name}")
+                    job = WorkerJob(name, self.nodes[name].module)
+                    running[pool.submit(run_job, job)] = (job, time.perf_counter() - self._t0)
+
+                if not running:
+                    continue
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, start = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = failed_result(job, str(e))
+                    end = time.perf_counter() - self._t0
+                    print_result(result)
+                    success = result["success"]
+                    self._record(job.name, success, start, end, "OK" if success else "ERREUR")
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        Chaîne de dépendances la plus longue (en durée de traitement).
+
+        Returns:
+            (noms de la chaîne dans l'ordre, durée cumulée en secondes)
+        """
+        finish = {}
+        previous = {}
+        for name in self.order:
+            elapsed = self.results.get(name, {}).get("elapsed", 0.0)
+            best = None
+            for dependency in self.nodes[name].depends:
+                if best is None or finish[dependency] > finish[best]:
+                    best = dependency
+            finish[name] = elapsed + (finish[best] if best else 0.0)
+            previous[name] = best
+        if not finish:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        path = [last]
+        while previous[path[-1]]:
+            path.append(previous[path[-1]])
+        return list(reversed(path)), finish[last]
+
+    def print_report(self):
+        """Affiche les durées, le chemin critique et le temps total."""
+        print("\n  Durées:")
+        for name in self.order:
+            result = self.results[name]
+            print(
+                f"    {name:<15} {result['status']:<7} {result['elapsed']:7.1f} s"
+                f"  (début {result['start']:6.1f} s, fin {result['end']:6.1f} s)"
+            )
+        path, seconds = self.critical_path()
+        print(f"\n  Chemin critique: {' -> '.join(path)} ({seconds:.1f} s)")
+        print(f"  Durée totale: {self.wall_seconds:.1f} s")
@@ -0,0 +1,144 @@
+"""
+Production des classeurs dans un espace de travail local (STAGING_DIR).
+
+Le nouveau classeur est écrit, actualisé et sauvegardé hors du dossier
+OneDrive, puis vérifié et publié en une fois : copie sous un nom temporaire
+ignoré par OneDrive (~$...tmp) dans le dossier cible, puis renommage
+atomique. Le client de synchronisation n'envoie ainsi qu'une version
+complète du fichier et ne le verrouille pas pendant l'actualisation.
+
+Usage:
+    work_file = workspace_file(new_file)
+    ... open_editor(source_file, work_file, excel) ... excel.save() ...
+    publish(work_file, new_file)
+"""
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from config import STAGING, STAGING_DIR
+
+# Espaces de travail abandonnés (plantage) supprimés après ce délai
+_STALE_SECONDS = 24 * 3600
+
+# Parties obligatoires d'un classeur OOXML valide
+_REQUIRED_PARTS = ("[Content_Types].xml", "xl/workbook.xml")
+
+
+def is_staged(work_file: Path, new_file: Path) -> bool:
+    """True si le classeur est produit hors de son dossier de destination."""
+    return Path(work_file) != Path(new_file)
+
+
+def _purge_stale():
+    """Supprime les espaces de travail laissés par une exécution interrompue."""
+    limit = time.time() - _STALE_SECONDS
+    for workspace in STAGING_DIR.iterdir():
+        try:
+            if workspace.is_dir() and workspace.stat().st_mtime < limit:
+                shutil.rmtree(workspace, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def workspace_file(new_file: Path, enabled: bool = True) -> Path:
+    """
+    Chemin de travail du nouveau classeur.
+
+    Args:
+        new_file: Chemin final du classeur dans le dossier OneDrive
+        enabled: Staging autorisé pour ce classeur (clé "staging" de la configuration)
+
+    Returns:
+        Chemin dans un espace de travail local dédié, ou new_file si le
+        staging est désactivé
+    """
+    if not (STAGING and enabled):
+        return new_file
+    try:
+        STAGING_DIR.mkdir(parents=True, exist_ok=True)
+        _purge_stale()
+        workspace = Path(tempfile.mkdtemp(prefix=f"{new_file.stem}_", dir=STAGING_DIR))
+    except OSError as e:
+        print(f"  ATTENTION: Espace de travail local indisponible ({e}), écriture directe")
+        return new_file
+    print(f"  Espace de travail: {workspace}")
+    return workspace / new_file.name
+
+
+def verify(work_file: Path) -> bool:
+    """
+    Vérifie que le classeur produit est complet avant publication.
+
+    Returns:
+        True si le fichier est une archive OOXML lisible
+    """
+    try:
+        if work_file.stat().st_size == 0:
+            print(f"  ERREUR: {work_file.name} est vide")
+            return False
+        with zipfile.ZipFile(work_file) as archive:
+            names = set(archive.namelist())
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"  ERREUR: {work_file.name} illisible ({e})")
+        return False
+    missing = [part for part in _REQUIRED_PARTS if part not in names]
+    if missing:
+        print(f"  ERREUR: {work_file.name} incomplet (manque {', '.join(missing)})")
+        return False
+    return True
+
+
+def publish(work_file: Path, new_file: Path, attempts: int = 5, delay: float = 2.0) -> bool:
+    """
+    Publie le classeur produit dans son dossier de destination.
+
+    Args:
+        work_file: Classeur sauvegardé et fermé dans l'espace de travail
+        new_file: Chemin final dans le dossier OneDrive
+        attempts: Nombre d'essais du renommage (fichier cible verrouillé)
+        delay: Attente entre deux essais (secondes)
+
+    Returns:
+        True si le classeur est en place dans le dossier de destination
+    """
+    if not is_staged(work_file, new_file):
+        return True
+    if not verify(work_file):
+        return False
+
+    # Nom ignoré par OneDrive : seul le renommage final déclenche l'envoi
+    temp_file = new_file.with_name(f"~${new_file.stem}.publish.tmp")
+    try:
+        shutil.copyfile(work_file, temp_file)
+    except OSError as e:
+        print(f"  ERREUR: Copie vers {new_file.parent} impossible ({e})")
+        return False
+
+    for attempt in range(1, attempts + 1):
+        try:
+            os.replace(temp_file, new_file)
+            break
+        except OSError as e:
+            if attempt == attempts:
+                print(f"  ERREUR: Publication de {new_file.name} impossible ({e})")
+                try:
+                    temp_file.unlink()
+                except OSError:
+                    pass
+                return False
+            print(f"  {new_file.name} verrouillé, nouvel essai dans {delay:.0f} s...")
+            time.sleep(delay)
+
+    print(f"  Publié: {new_file}")
+    discard(work_file, new_file)
+    return True
+
+
+def discard(work_file: Path, new_file: Path):
+    """Supprime l'espace de travail d'un classeur (sans effet hors staging)."""
+    if is_staged(work_file, new_file):
+        shutil.rmtree(Path(work_file).parent, ignore_errors=True)
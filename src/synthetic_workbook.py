@@ -0,0 +1,445 @@
+"""
+Génération de classeurs SUIVI_* synthétiques (mesures et essais sans les
+fichiers Kiabi).
+
+Les classeurs produits ont la structure qu'utilisent les scripts :
+    - feuille de rapport avec la date de la semaine (date_sheet / date_cell) ;
+    - feuilles de données chargées par Power Query (tableaux xl/tables) ;
+    - requêtes Power Query (DataMashup) : celles de la clé "queries" de la
+      configuration (selligent : chemin avec AAAA_SXX, piano : dates
+      start/end de la semaine), complétées de requêtes dépendantes et
+      statiques, avec leurs connexions (xl/connections.xml) ;
+    - liaisons externes vers les classeurs "linked_files" (TRAFIC -> CRM, KPIS).
+
+La génération est déterministe : une même spécification produit les
+mêmes octets (comparaison des mesures d'un commit à l'autre).
+
+Usage:
+    spec = WorkbookSpec(sheets=4, rows=5000, queries=12)
+    generate_tree(Path("/tmp/onedrive"), ALL_CONFIGS, year=2026, week=3, spec=spec)
+"""
+import base64
+import io
+import random
+import struct
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from src.ooxml_workbook import column_letters, datetime_to_excel_serial
+
+# Date fixe des entrées de l'archive (sortie identique d'une génération à l'autre)
+_ZIP_DATE = (2026, 1, 1, 0, 0, 0)
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_NS_TYPES = "http://schemas.openxmlformats.org/package/2006/content-types"
+_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+# Nom des connexions créées par Excel (en français) pour les requêtes
+CONNECTION_PREFIX = "Requête - "
+
+_MAGASINS = ["Lille", "Lyon", "Paris", "Nantes", "Marseille", "Bordeaux", "Toulouse", "Madrid"]
+
+
+class WorkbookSpec:
+    """Paramètres des classeurs générés."""
+
+    def __init__(self, sheets: int = 3, rows: int = 1000, columns: int = 8, queries: int = 8,
+                 size_mb: float = 0.0, seed: int = 0):
+        """
+        Args:
+            sheets: Nombre de feuilles (rapport + feuilles de données)
+            rows: Lignes par tableau de données
+            columns: Colonnes par tableau de données
+            queries: Nombre minimal de requêtes Power Query
+            size_mb: Taille visée du classeur ; complétée par une partie
+                     binaire non compressée (images, caches...)
+            seed: Graine des valeurs aléatoires
+        """
+        self.sheets = max(1, sheets)
+        self.rows = max(1, rows)
+        self.columns = max(2, columns)
+        self.queries = max(0, queries)
+        self.size_mb = max(0.0, size_mb)
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def week_monday(year: int, week: int) -> date:
+    """Lundi de la semaine ISO."""
+    return date.fromisocalendar(year, week, 1)
+
+
+def _serial(day: date) -> float:
+    return datetime_to_excel_serial(datetime(day.year, day.month, day.day))
+
+
+# ----------------------------------------------------------------------
+# Requêtes Power Query
+# ----------------------------------------------------------------------
+
+def _selligent_formula(name: str, year: int, week: int) -> str:
+    path = f"\\\\srv-exports\\selligent\\{year}_S{week:02d}\\{name}.csv"
+    return (
+        "let\n"
+        f"    Source = Csv.Document(File.Contents(\"{path}\"), [Delimiter=\";\", Encoding=65001]),\n"
+        "    // Export hebdomadaire ; colonnes promues\n"
+        "    Promoted = Table.PromoteHeaders(Source, [PromoteAllScalars=true])\n"
+        "in\n"
+        "    Promoted"
+    )
+
+
+def _piano_formula(name: str, year: int, week: int) -> str:
+    start = week_monday(year, week)
+    end = start + timedelta(days=6)
+    if name.endswith("_histo"):
+        # Paramètres JSON encodés dans l'URL
+        url = (
+            "https://api.atinternet.io/v3/data/getData?param="
+            f"%7B%22period%22%3A%7B%22start%22%3A%22{start:%Y-%m-%d}%22%2C"
+            f"%22end%22%3A%22{end:%Y-%m-%d}%22%7D%7D"
+        )
+        return f"let\n    Source = Json.Document(Web.Contents(\"{url}\"))\nin\n    Source"
+    body = f'{{""period"":{{""start"":""{start:%Y-%m-%d}"",""end"":""{end:%Y-%m-%d}""}}}}'
+    return (
+        "let\n"
+        "    Source = Json.Document(Web.Contents(\"https://api.atinternet.io/v3/data/getData\","
+        f" [Content=Text.ToBinary(\"{body}\")])),\n"
+        "    Rows = Table.FromRecords(Source[DataFeed]{0}[Rows])\n"
+        "in\n"
+        "    Rows"
+    )
+
+
+def _identifier(name: str) -> str:
+    return name if name.replace("_", "").isalnum() and not name[0].isdigit() else f'#"{name}"'
+
+
+def build_queries(config: dict, year: int, week: int, count: int) -> Dict[str, str]:
+    """
+    Requêtes d'un classeur : celles de la configuration, puis des requêtes
+    dépendantes (stg_*) et statiques (ref_*) jusqu'à count requêtes.
+
+    Returns:
+        Dictionnaire nom -> formule M, dans l'ordre du document
+    """
+    formulas: Dict[str, str] = {}
+    for name, query in config.get("queries", {}).items():
+        if query["type"] == "selligent":
+            formulas[name] = _selligent_formula(name, year, week)
+        else:
+            formulas[name] = _piano_formula(name, year, week)
+
+    bases = list(formulas)
+    index = 0
+    while len(formulas) < count:
+        index += 1
+        if bases and index % 3:
+            base = bases[index % len(bases)]
+            formulas[f"stg_{base}_{index}"] = (
+                f"let\n    Source = {_identifier(base)},\n"
+                "    Filtered = Table.SelectRows(Source, each [Magasin] <> null)\n"
+                "in\n    Filtered"
+            )
+        else:
+            formulas[f"ref_{index}"] = (
+                f"let\n    Source = Excel.CurrentWorkbook(){{[Name=\"T_REF_{index}\"]}}[Content]\n"
+                "in\n    Source"
+            )
+    return formulas
+
+
+def build_datamashup(formulas: Dict[str, str]) -> bytes:
+    """Partie customXml DataMashup (format MS-QDEFF) contenant les requêtes."""
+    section = "section Section1;\n" + "".join(
+        f"\nshared {_identifier(name)} = {formula};\n" for name, formula in formulas.items()
+    )
+    package = io.BytesIO()
+    with zipfile.ZipFile(package, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in (
+            ("[Content_Types].xml", b"<Types/>"),
+            ("Config/Package.xml", b"<Package/>"),
+            ("Formulas/Section1.m", section.encode("utf-8-sig")),
+        ):
+            archive.writestr(zipfile.ZipInfo(name, _ZIP_DATE), data, zipfile.ZIP_DEFLATED)
+    blocks = [package.getvalue(), b"", b"<LocalPackageMetadataFile/>", b""]
+    binary = struct.pack("<I", 0) + b"".join(struct.pack("<I", len(block)) + block for block in blocks)
+    xml = (
+        '<?xml version="1.0" encoding="utf-16"?>'
+        '<DataMashup xmlns="http://schemas.microsoft.com/DataMashup">'
+        + base64.b64encode(binary).decode("ascii") + "</DataMashup>"
+    )
+    return b"\xff\xfe" + xml.encode("utf-16-le")
+
+
+# ----------------------------------------------------------------------
+# Parties du classeur
+# ----------------------------------------------------------------------
+
+class _Strings:
+    """Table des chaînes partagées."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, text: str) -> int:
+        return self.index.setdefault(text, len(self.index))
+
+    def to_xml(self) -> str:
+        items = "".join(f"<si><t>{escape(text)}</t></si>" for text in self.index)
+        return (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<sst xmlns="{_NS_MAIN}" count="{len(self.index)}" uniqueCount="{len(self.index)}">{items}</sst>'
+        )
+
+
+def _report_sheet(strings: _Strings, monday: date) -> str:
+    serial = _serial(monday)
+    title = strings(f"Rapport hebdomadaire S{monday.isocalendar()[1]:02d}")
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheetData>'
+        f'<row r="1"><c r="A1" s="1"><v>{serial}</v></c><c r="B1" t="s"><v>{title}</v></c></row>'
+        f'<row r="2" ht="30" customHeight="1"/>'   # ligne vide de hauteur personnalisée
+        f'<row r="3"><c r="A3"><f>SUM(B4:B10)</f><v>0</v></c></row>'
+        f"</sheetData></worksheet>"
+    )
+
+
+def _data_sheet(strings: _Strings, spec: WorkbookSpec, rng: random.Random, monday: date) -> str:
+    headers = ["Date", "Magasin"] + [f"Mesure_{index}" for index in range(1, spec.columns - 1)]
+    last = column_letters(spec.columns)
+    rows = ['<row r="1">' + "".join(
+        f'<c r="{column_letters(col)}1" t="s"><v>{strings(header)}</v></c>'
+        for col, header in enumerate(headers, 1)
+    ) + "</row>"]
+    base_serial = _serial(monday)
+    magasins = [strings(name) for name in _MAGASINS]
+    for row in range(2, spec.rows + 2):
+        cells = [
+            f'<c r="A{row}" s="1"><v>{base_serial + row % 7}</v></c>',
+            f'<c r="B{row}" t="s"><v>{magasins[row % len(magasins)]}</v></c>',
+        ]
+        cells += [
+            f'<c r="{column_letters(col)}{row}"><v>{rng.randint(0, 99999) / 100}</v></c>'
+            for col in range(3, spec.columns + 1)
+        ]
+        rows.append(f'<row r="{row}">{"".join(cells)}</row>')
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">'
+        f'<dimension ref="A1:{last}{spec.rows + 1}"/><sheetData>{"".join(rows)}</sheetData>'
+        f'<tableParts count="1"><tablePart r:id="rId1"/></tableParts></worksheet>'
+    ), headers
+
+
+def _table(index: int, name: str, headers: List[str], spec: WorkbookSpec, connection_id: int) -> str:
+    ref = f"A1:{column_letters(spec.columns)}{spec.rows + 1}"
+    columns = "".join(
+        f'<tableColumn id="{col}" uniqueName="{col}" name="{escape(header)}" queryTableFieldId="{col}"/>'
+        for col, header in enumerate(headers, 1)
+    )
+    display = "T_" + "".join(char if char.isalnum() else "_" for char in name)
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<table xmlns="{_NS_MAIN}" id="{index}" name="{display}" displayName="{display}"'
+        f' ref="{ref}" tableType="queryTable" totalsRowShown="0" connectionId="{connection_id}">'
+        f'<autoFilter ref="{ref}"/><tableColumns count="{len(headers)}">{columns}</tableColumns>'
+        f'<tableStyleInfo name="TableStyleMedium2" showRowStripes="1"/></table>'
+    )
+
+
+def _connections(formulas: Dict[str, str]) -> str:
+    items = "".join(
+        f'<connection id="{index}" keepAlive="1" name="{escape(CONNECTION_PREFIX + name)}"'
+        f' description="Connexion à la requête « {escape(name)} » dans le classeur." type="5"'
+        f' refreshedVersion="8" background="1" saveData="1">'
+        f'<dbPr connection="Provider=Microsoft.Mashup.OleDb.1;Data Source=$Workbook$;'
+        f'Location={escape(name, {chr(34): "&quot;"})};Extended Properties=&quot;&quot;"'
+        f' command="SELECT * FROM [{escape(name)}]"/></connection>'
+        for index, name in enumerate(formulas, 1)
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<connections xmlns="{_NS_MAIN}">{items}</connections>'
+    )
+
+
+def _external_link(target: Path) -> tuple:
+    book = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<externalLink xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><externalBook r:id="rId1">'
+        f'<sheetNames><sheetName val="REPORT"/></sheetNames>'
+        f'<sheetDataSet><sheetData sheetId="0"><row r="3"><cell r="A3"><v>0</v></cell></row></sheetData>'
+        f"</sheetDataSet></externalBook></externalLink>"
+    )
+    uri = "file:///" + quote(str(target), safe="/\\:._-~!$&'()*+,;=@")
+    rels = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{_NS_PKG_REL}"><Relationship Id="rId1"'
+        f' Type="{_NS_REL}/externalLinkPath" Target="{escape(uri)}" TargetMode="External"/></Relationships>'
+    )
+    return book, rels
+
+
+def _rels(relations: List[tuple]) -> str:
+    items = "".join(
+        f'<Relationship Id="rId{index}" Type="{rel_type}" Target="{escape(target)}"/>'
+        for index, (rel_type, target) in enumerate(relations, 1)
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{_NS_PKG_REL}">{items}</Relationships>'
+    )
+
+
+def build_workbook(path: Path, config: dict, year: int, week: int,
+                   spec: Optional[WorkbookSpec] = None, links: Optional[List[Path]] = None) -> Path:
+    """
+    Écrit un classeur synthétique.
+
+    Args:
+        path: Fichier à produire (.xlsx ou .xlsm)
+        config: Configuration du classeur (date_sheet, queries)
+        year: Année ISO de la semaine du classeur
+        week: Semaine ISO du classeur
+        spec: Paramètres de génération
+        links: Classeurs cibles des liaisons externes
+
+    Returns:
+        Chemin du classeur
+    """
+    spec = spec or WorkbookSpec()
+    links = links or []
+    rng = random.Random(f"{spec.seed}:{config.get('file_prefix')}:{year}:{week}")
+    monday = week_monday(year, week)
+    strings = _Strings()
+
+    formulas = build_queries(config, year, week, spec.queries)
+    loaded = list(formulas)[:spec.sheets - 1]
+    report_name = config.get("date_sheet") or "REPORT"
+    sheet_names = [report_name] + [f"DATA_{index}" for index in range(1, spec.sheets)]
+
+    parts: Dict[str, bytes] = {}
+    overrides = [("/xl/workbook.xml", f"{_CT}.sheet.main+xml" if path.suffix.lower() == ".xlsx"
+                  else "application/vnd.ms-excel.sheet.macroEnabled.main+xml")]
+    workbook_rels = []
+
+    for index, name in enumerate(sheet_names, 1):
+        part = f"xl/worksheets/sheet{index}.xml"
+        if index == 1:
+            parts[part] = _report_sheet(strings, monday).encode("utf-8")
+        else:
+            xml, headers = _data_sheet(strings, spec, rng, monday)
+            parts[part] = xml.encode("utf-8")
+            table = index - 1
+            query = loaded[table - 1] if table - 1 < len(loaded) else f"DATA_{table}"
+            connection_id = list(formulas).index(query) + 1 if query in formulas else 0
+            parts[f"xl/tables/table{table}.xml"] = _table(
+                table, query, headers, spec, connection_id
+            ).encode("utf-8")
+            parts[f"xl/worksheets/_rels/sheet{index}.xml.rels"] = _rels(
+                [(f"{_NS_REL}/table", f"../tables/table{table}.xml")]
+            ).encode("utf-8")
+            overrides.append((f"/xl/tables/table{table}.xml", f"{_CT}.table+xml"))
+        overrides.append((f"/{part}", f"{_CT}.worksheet+xml"))
+        workbook_rels.append((f"{_NS_REL}/worksheet", f"worksheets/sheet{index}.xml"))
+
+    workbook_rels.append((f"{_NS_REL}/styles", "styles.xml"))
+    workbook_rels.append((f"{_NS_REL}/sharedStrings", "sharedStrings.xml"))
+    if formulas:
+        workbook_rels.append((f"{_NS_REL}/connections", "connections.xml"))
+        parts["xl/connections.xml"] = _connections(formulas).encode("utf-8")
+        overrides.append(("/xl/connections.xml", f"{_CT}.connections+xml"))
+        parts["customXml/item1.xml"] = build_datamashup(formulas)
+
+    external_refs = []
+    for index, target in enumerate(links, 1):
+        book, rels = _external_link(target)
+        parts[f"xl/externalLinks/externalLink{index}.xml"] = book.encode("utf-8")
+        parts[f"xl/externalLinks/_rels/externalLink{index}.xml.rels"] = rels.encode("utf-8")
+        overrides.append((f"/xl/externalLinks/externalLink{index}.xml", f"{_CT}.externalLink+xml"))
+        workbook_rels.append((f"{_NS_REL}/externalLink", f"externalLinks/externalLink{index}.xml"))
+        external_refs.append(f'<externalReference r:id="rId{len(workbook_rels)}"/>')
+
+    sheets_xml = "".join(
+        f'<sheet name="{escape(name)}" sheetId="{index}" r:id="rId{index}"/>'
+        for index, name in enumerate(sheet_names, 1)
+    )
+    externals = f"<externalReferences>{''.join(external_refs)}</externalReferences>" if external_refs else ""
+    parts["xl/workbook.xml"] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><workbookPr defaultThemeVersion="166925"/>'
+        f'<sheets>{sheets_xml}</sheets>{externals}<calcPr calcId="191029"/></workbook>'
+    ).encode("utf-8")
+    parts["xl/_rels/workbook.xml.rels"] = _rels(workbook_rels).encode("utf-8")
+    parts["xl/styles.xml"] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<styleSheet xmlns="{_NS_MAIN}"><cellXfs count="2"><xf numFmtId="0"/>'
+        f'<xf numFmtId="14" applyNumberFormat="1"/></cellXfs></styleSheet>'
+    ).encode("utf-8")
+    parts["xl/sharedStrings.xml"] = strings.to_xml().encode("utf-8")
+    overrides += [
+        ("/xl/styles.xml", f"{_CT}.styles+xml"),
+        ("/xl/sharedStrings.xml", f"{_CT}.sharedStrings+xml"),
+    ]
+    parts["_rels/.rels"] = _rels(
+        [(f"{_NS_REL}/officeDocument", "xl/workbook.xml")]
+    ).encode("utf-8")
+    types = "".join(
+        f'<Override PartName="{name}" ContentType="{content_type}"/>' for name, content_type in overrides
+    )
+    parts["[Content_Types].xml"] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Types xmlns="{_NS_TYPES}">'
+        f'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        f'<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Default Extension="bin" ContentType="application/octet-stream"/>{types}</Types>'
+    ).encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    order = ["[Content_Types].xml", "_rels/.rels"] + sorted(
+        name for name in parts if name not in ("[Content_Types].xml", "_rels/.rels")
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name in order:
+            archive.writestr(zipfile.ZipInfo(name, _ZIP_DATE), parts[name], zipfile.ZIP_DEFLATED)
+        # Complément de taille : données incompressibles (images, caches de tableaux croisés)
+        padding = int(spec.size_mb * 1e6) - archive.fp.tell()
+        if padding > 0:
+            archive.writestr(zipfile.ZipInfo("xl/media/padding.bin", _ZIP_DATE),
+                             rng.randbytes(padding), zipfile.ZIP_STORED)
+    return path
+
+
+def generate_tree(base: Path, configs: Dict[str, dict], year: int, week: int,
+                  spec: Optional[WorkbookSpec] = None) -> Dict[str, Path]:
+    """
+    Crée un dossier OneDrive synthétique : un classeur de la semaine par configuration.
+
+    Args:
+        base: Dossier racine (ONEDRIVE_BASE_PATH)
+        configs: Configurations (ex: ALL_CONFIGS)
+        year: Année ISO
+        week: Semaine ISO des classeurs
+        spec: Paramètres de génération
+
+    Returns:
+        Dictionnaire nom -> classeur créé
+    """
+    paths = {
+        name: base / config["folder"] / f"{config['file_prefix']}_S{week:02d}{config.get('file_ext', '.xlsx')}"
+        for name, config in configs.items()
+    }
+    for name, config in configs.items():
+        links = [paths[linked] for linked in config.get("linked_files", []) if linked in paths]
+        build_workbook(paths[name], config, year, week, spec, links)
+    return paths
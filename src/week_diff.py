@@ -0,0 +1,237 @@
+"""
+Comparaison d'un classeur SUIVI avec celui de la semaine précédente.
+
+Une actualisation qui échoue sans erreur laisse les feuilles identiques à
+la copie de la semaine précédente. Les deux classeurs sont lus en flux
+(StreamingWorkbook, blocs de quelques Mo) et comparés :
+    - par feuille : nombre de lignes de données (même règle que
+      sheet_stats) et empreinte de sheetData ;
+    - par tableau chargé par une requête : nombre de lignes de données et
+      empreinte des cellules de ses colonnes.
+
+Les valeurs texte sont des index de la table des chaînes partagées :
+quand une empreinte est identique mais que cette table a changé, les
+textes référencés sont comparés (seul cas où la table est chargée).
+
+Usage:
+    diff = diff_workbooks(previous_file, current_file)
+    print_diff(diff)
+"""
+import hashlib
+import json
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config import LOGS_DIR, WEEK_DIFF
+from src.ooxml_workbook import column_letters
+from src.xlsx_stream import StreamingWorkbook, data_rows
+
+DIFF_DIR = LOGS_DIR / "week_diff"
+
+# Cellules d'un bloc de colonnes, et cellules texte (index de chaîne partagée)
+_CELLS = r'<c r="(?:{columns})\d+"[^>]*?(?:/>|>.*?</c>)'
+_SHARED_CELLS = r'<c r="((?:{columns})\d+)"[^>]*? t="s"[^>]*>(?:<f\b[^>]*/>|<f\b[^>]*>[^<]*</f>)?<v>(\d+)</v>'
+_ANY_COLUMN = "[A-Z]+"
+
+
+def _columns_pattern(columns: Optional[Tuple[int, int]]) -> str:
+    if columns is None:
+        return _ANY_COLUMN
+    first, last = columns
+    return "|".join(column_letters(index) for index in range(first, last + 1))
+
+
+class BlockDigest:
+    """Empreinte d'une feuille entière ou des colonnes d'un tableau."""
+
+    def __init__(self, name: str, kind: str, rows: int = 0, columns: Optional[Tuple[int, int]] = None):
+        self.name = name
+        self.kind = kind              # "feuille" ou "tableau"
+        self.rows = rows
+        self.columns = columns        # (première, dernière) ; None = toute la feuille
+        self.shared = False           # contient des valeurs texte (index)
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._cells = None if columns is None else re.compile(
+            _CELLS.format(columns=_columns_pattern(columns)).encode("ascii"), re.DOTALL
+        )
+
+    def update(self, data: bytes):
+        cells = data if self._cells is None else b"".join(self._cells.findall(data))
+        self._hash.update(cells)
+        self.shared = self.shared or b't="s"' in cells
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def _sheet_data(book: StreamingWorkbook, sheet_name: str):
+    """Contenu de <sheetData>, par blocs."""
+    started = False
+    for block in book.sheet_blocks(sheet_name):
+        start = 0
+        if not started:
+            start = block.find(b"<sheetData")
+            if start < 0:
+                continue
+            started = True
+        end = block.find(b"</sheetData>", start)
+        yield block[start:end] if end >= 0 else block[start:]
+        if end >= 0:
+            return
+
+
+def sheet_digests(book: StreamingWorkbook, sheet_name: str) -> List[BlockDigest]:
+    """
+    Empreintes d'une feuille et de ses tableaux chargés par une requête,
+    en une seule lecture de la feuille.
+
+    Returns:
+        [feuille, tableau 1, tableau 2...]
+    """
+    sheet = BlockDigest(sheet_name, "feuille")
+    tables = [table for table in book.sheet_tables(sheet_name) if table["query"]]
+    dimension = book.sheet_dimension(sheet_name)
+    digests = [sheet]
+    for table in tables:
+        columns = (table["first_column"], table["last_column"])
+        # Tableau sur toute la largeur de la feuille : mêmes cellules, pas de filtrage
+        if dimension and columns[0] <= dimension[0] and dimension[1] <= columns[1]:
+            columns = None
+        digests.append(BlockDigest(table["name"], "tableau", table["data_rows"], columns))
+    for data in _sheet_data(book, sheet_name):
+        sheet.rows += sum(1 for _ in data_rows(data))
+        for digest in digests:
+            digest.update(data)
+    return digests
+
+
+def _text_digest(book: StreamingWorkbook, sheet_name: str, digest: BlockDigest) -> str:
+    """Empreinte des textes (résolus) des cellules texte d'un bloc."""
+    pattern = re.compile(
+        _SHARED_CELLS.format(columns=_columns_pattern(digest.columns)).encode("ascii")
+    )
+    strings = book.shared_strings
+    text_hash = hashlib.blake2b(digest_size=16)
+    for data in _sheet_data(book, sheet_name):
+        for ref, index in pattern.findall(data):
+            text_hash.update(ref)
+            text_hash.update(strings[int(index)].encode("utf-8"))
+            text_hash.update(b"\0")
+    return text_hash.hexdigest()
+
+
+def _entry(sheet: str, table: Optional[str], previous: Optional[BlockDigest],
+           current: Optional[BlockDigest], unchanged: Optional[bool], query: bool) -> dict:
+    return {
+        "sheet": sheet,
+        "table": table,
+        "query": query,
+        "previous_rows": previous.rows if previous else None,
+        "rows": current.rows if current else None,
+        "delta": current.rows - previous.rows if previous and current else None,
+        "unchanged": unchanged,
+    }
+
+
+def diff_workbooks(previous_file: Path, current_file: Path) -> dict:
+    """
+    Compare deux classeurs feuille par feuille et tableau par tableau.
+
+    Args:
+        previous_file: Classeur de la semaine précédente
+        current_file: Classeur de la semaine
+
+    Returns:
+        {"previous", "current", "entries": [{"sheet", "table", "query",
+        "previous_rows", "rows", "delta", "unchanged"}], "unchanged": [...]}
+        ; "unchanged" vaut None pour une feuille ou un tableau sans équivalent
+    """
+    entries = []
+    with StreamingWorkbook(previous_file) as before, StreamingWorkbook(current_file) as after:
+        strings_changed = before.shared_strings_digest() != after.shared_strings_digest()
+        previous_sheets = {name.lower(): name for name in before.get_sheet_names()}
+
+        for name in after.get_sheet_names():
+            current = sheet_digests(after, name)
+            previous_name = previous_sheets.pop(name.lower(), None)
+            previous = sheet_digests(before, previous_name) if previous_name else []
+            previous_by_key = {(digest.kind, digest.name.lower()): digest for digest in previous}
+            has_query = len(current) > 1
+
+            for digest in current:
+                old = previous_by_key.get((digest.kind, digest.name.lower()))
+                unchanged = None
+                if old is not None:
+                    unchanged = old.digest == digest.digest
+                    if unchanged and strings_changed and (old.shared or digest.shared):
+                        unchanged = (_text_digest(before, previous_name, old)
+                                     == _text_digest(after, name, digest))
+                table = digest.name if digest.kind == "tableau" else None
+                entries.append(_entry(name, table, old, digest, unchanged,
+                                      has_query if table is None else True))
+
+        for name in previous_sheets.values():
+            entries.append(_entry(name, None, sheet_digests(before, name)[0], None, None, False))
+
+    return {
+        "previous": str(previous_file),
+        "current": str(current_file),
+        "entries": entries,
+        "unchanged": [
+            entry["table"] or entry["sheet"] for entry in entries
+            if entry["unchanged"] and entry["query"]
+        ],
+    }
+
+
+def print_diff(diff: dict):
+    """Affiche la comparaison ; les données de requête inchangées sont signalées."""
+    print(f"  {Path(diff['previous']).name} -> {Path(diff['current']).name}")
+    for entry in diff["entries"]:
+        label = f"[{entry['table']}]" if entry["table"] else entry["sheet"]
+        indent = "      " if entry["table"] else "    "
+        if entry["rows"] is None:
+            print(f"{indent}{label:<24} supprimée ({entry['previous_rows']} lignes)")
+            continue
+        if entry["previous_rows"] is None:
+            print(f"{indent}{label:<24} {entry['rows']:>8} lignes  nouvelle")
+            continue
+        if entry["unchanged"]:
+            status = "INCHANGÉE - actualisation à vérifier" if entry["query"] else "inchangée"
+        else:
+            status = "modifiée"
+        print(f"{indent}{label:<24} {entry['previous_rows']:>8} -> {entry['rows']:>8} lignes"
+              f" ({entry['delta']:+d})  {status}")
+    if diff["unchanged"]:
+        print(f"  ATTENTION: données identiques à la semaine précédente: {', '.join(diff['unchanged'])}")
+
+
+def report_week_diff(previous_file: Path, current_file: Path) -> Optional[dict]:
+    """
+    Étape finale des scripts de mise à jour : compare le classeur publié à
+    celui de la semaine précédente, affiche le résultat et l'enregistre
+    dans logs/week_diff. Une erreur de lecture n'interrompt pas la mise à jour.
+
+    Returns:
+        Résultat de diff_workbooks, ou None (désactivé ou illisible)
+    """
+    if not WEEK_DIFF:
+        return None
+    print("\nComparaison avec la semaine précédente...")
+    try:
+        diff = diff_workbooks(previous_file, current_file)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, ET.ParseError) as e:
+        print(f"  ATTENTION: Comparaison impossible: {e}")
+        return None
+    print_diff(diff)
+    try:
+        DIFF_DIR.mkdir(parents=True, exist_ok=True)
+        output = DIFF_DIR / f"{Path(current_file).stem}.json"
+        output.write_text(json.dumps(diff, indent=2, ensure_ascii=False), encoding="utf-8")
+    except OSError as e:
+        print(f"  ATTENTION: Résultat non enregistré: {e}")
+    return diff
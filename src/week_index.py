@@ -0,0 +1,256 @@
+"""
+Index des classeurs hebdomadaires (PREFIXE_SXX.ext) de chaque dossier.
+
+Chaque dossier n'est énuméré qu'une fois (os.scandir : taille et date de
+modification lues sans ouvrir les fichiers, donc sans télécharger les
+fichiers OneDrive « en ligne uniquement »). Le résultat est conservé dans
+LOGS_DIR/week_index.json et réutilisé tant que la date de modification du
+dossier n'a pas changé (création, suppression ou renommage d'un fichier).
+
+Les noms ne contiennent que la semaine. La date de modification d'un
+fichier ne dit rien de son année (réhydratation OneDrive, copie ou
+réenregistrement la rafraîchissent) : les fichiers sont classés par numéro
+de semaine, comme historiquement. Le passage d'année (S52 ou S53 de
+l'année N avant S01 de l'année N+1) n'est appliqué que si les semaines
+présentes l'enjambent, c'est-à-dire si la plus basse et la plus haute sont
+écartées de plus d'une demi-année (WRAP_GAP) ; la coupure entre les deux
+années est alors le plus grand intervalle entre deux semaines présentes.
+
+Limite : un fichier d'une année précédente dont le numéro est supérieur à
+celui des fichiers de l'année en cours (ex: S45 de l'an dernier restée dans
+le dossier en semaine 42, sans fichier S01 à S18 à côté) est classé comme
+le plus récent, comme avant l'index. Les fichiers des années précédentes
+doivent être déplacés hors du dossier.
+
+Usage:
+    latest = find_latest_file(folder, "SUIVI_CRM")
+    year, week = following_week(latest.year, latest.week)
+"""
+import json
+import os
+import re
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import LOGS_DIR
+
+INDEX_FILE = LOGS_DIR / "week_index.json"
+
+# Version du format du fichier d'index (incrémenter si la structure change)
+_INDEX_VERSION = 2
+
+# Écart (en semaines) entre la plus basse et la plus haute semaine d'un
+# dossier au-delà duquel les semaines basses sont celles de l'année suivante
+WRAP_GAP = 26
+
+_WEEK_FILE_RE = re.compile(r"^(?P<prefix>.+?)_S(?P<week>\d{1,2})(?!\d)")
+
+_lock = threading.Lock()
+# Dossier -> (date de modification du dossier, entrées), pour l'exécution courante
+_memory: Dict[str, Tuple[int, List["WeekFile"]]] = {}
+
+
+class WeekFile:
+    """Classeur hebdomadaire d'un dossier."""
+
+    def __init__(self, path: Path, prefix: str, week: int, size: int, mtime: float,
+                 year: Optional[int] = None):
+        self.path = path
+        self.prefix = prefix
+        self.week = week
+        self.size = size
+        self.mtime = mtime
+        # Année ISO, attribuée au classement (week_files)
+        self.year = year
+
+    def to_list(self) -> list:
+        return [self.path.name, self.prefix, self.week, self.size, self.mtime]
+
+    @classmethod
+    def from_list(cls, folder: Path, values: list) -> "WeekFile":
+        name, prefix, week, size, mtime = values
+        return cls(folder / name, prefix, week, size, mtime)
+
+    def __repr__(self):
+        return f"WeekFile({self.path.name!r}, {self.year}-S{self.week:02d})"
+
+
+def weeks_in_year(year: int) -> int:
+    """Nombre de semaines ISO de l'année (52 ou 53)."""
+    return date(year, 12, 28).isocalendar()[1]
+
+
+def following_week(year: int, week: int) -> Tuple[int, int]:
+    """
+    Semaine suivante, avec passage à l'année suivante après la dernière semaine.
+
+    Returns:
+        (année, semaine) ; ex: (2025, 52) -> (2026, 1)
+    """
+    if week >= weeks_in_year(year):
+        return year + 1, 1
+    return year, week + 1
+
+
+def rank_weeks(entries: List["WeekFile"], today: Optional[date] = None) -> List["WeekFile"]:
+    """
+    Classe des fichiers SXX du plus ancien au plus récent et leur attribue
+    une année ISO.
+
+    Les fichiers sont classés par numéro de semaine. Si les semaines
+    enjambent le changement d'année (plus basse et plus haute écartées de
+    plus de WRAP_GAP), le plus grand intervalle entre deux semaines présentes
+    sépare les deux années : les semaines situées avant lui sont celles de
+    l'année suivante et passent après les autres. L'année (utile pour savoir
+    si la dernière semaine est S52 ou S53) est celle de la date du jour pour
+    les fichiers les plus récents, sauf s'ils sont tous postérieurs à la
+    semaine en cours (fin de l'année précédente).
+    """
+    if not entries:
+        return []
+    weeks = sorted({entry.week for entry in entries})
+    boundary = 0   # semaines <= boundary : année suivante
+    if weeks[-1] - weeks[0] > WRAP_GAP:
+        gap, position = max((later - earlier, earlier) for earlier, later in zip(weeks, weeks[1:]))
+        if gap > 1:
+            boundary = position
+
+    def newer(entry: "WeekFile") -> bool:
+        return entry.week <= boundary
+
+    today_year, today_week, _ = (today or date.today()).isocalendar()
+    # +1 : semaine préparée à l'avance
+    first_recent = weeks[0] if boundary else min(weeks)
+    newest_year = today_year if first_recent <= today_week + 1 else today_year - 1
+    for entry in entries:
+        entry.year = newest_year if newer(entry) or not boundary else newest_year - 1
+    return sorted(entries, key=lambda entry: (newer(entry), entry.week, entry.mtime))
+
+
+def _scan(folder: Path) -> List[WeekFile]:
+    """Énumère les fichiers SXX d'un dossier (une seule passe)."""
+    entries = []
+    with os.scandir(folder) as iterator:
+        for entry in iterator:
+            match = _WEEK_FILE_RE.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append(WeekFile(
+                folder / entry.name, match.group("prefix"),
+                int(match.group("week")), stat.st_size, stat.st_mtime,
+            ))
+    return entries
+
+
+def _load_index() -> dict:
+    try:
+        data = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != _INDEX_VERSION:
+        return {}
+    return data.get("folders", {})
+
+
+def _save_index(folders: dict):
+    """Écriture atomique (fichier temporaire puis remplacement)."""
+    temp_file = INDEX_FILE.with_name(f"{INDEX_FILE.name}.{os.getpid()}.tmp")
+    try:
+        temp_file.write_text(
+            json.dumps({"version": _INDEX_VERSION, "folders": folders}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(temp_file, INDEX_FILE)
+    except OSError as e:
+        print(f"  ATTENTION: Index des semaines non enregistré ({e})")
+        try:
+            temp_file.unlink()
+        except OSError:
+            pass
+
+
+def folder_files(folder: Path) -> List[WeekFile]:
+    """
+    Fichiers SXX d'un dossier, depuis l'index si le dossier n'a pas changé.
+
+    Returns:
+        Liste de WeekFile (vide si le dossier n'existe pas)
+    """
+    folder = Path(folder)
+    try:
+        folder_mtime = folder.stat().st_mtime_ns
+    except OSError:
+        return []
+    key = str(folder.resolve())
+
+    with _lock:
+        cached = _memory.get(key)
+        if cached and cached[0] == folder_mtime:
+            return cached[1]
+
+        folders = _load_index()
+        stored = folders.get(key)
+        if stored and stored.get("mtime") == folder_mtime:
+            entries = [WeekFile.from_list(folder, values) for values in stored["files"]]
+        else:
+            entries = _scan(folder)
+            folders[key] = {"mtime": folder_mtime, "files": [entry.to_list() for entry in entries]}
+            _save_index(folders)
+        _memory[key] = (folder_mtime, entries)
+        return entries
+
+
+def invalidate(folder: Optional[Path] = None):
+    """Oublie l'index d'un dossier (ou de tous), ex: après un fichier remplacé sur place."""
+    with _lock:
+        if folder is None:
+            _memory.clear()
+            folders = {}
+        else:
+            key = str(Path(folder).resolve())
+            _memory.pop(key, None)
+            folders = _load_index()
+            if folders.pop(key, None) is None:
+                return
+        _save_index(folders)
+
+
+def week_files(folder: Path, prefix: str, ext: str = ".xlsx") -> List[WeekFile]:
+    """
+    Fichiers PREFIXE_SXX.ext d'un dossier, du plus ancien au plus récent.
+
+    Args:
+        folder: Dossier des classeurs
+        prefix: Préfixe des fichiers (ex: "SUIVI_CRM")
+        ext: Extension des fichiers
+    """
+    matches = [
+        WeekFile(entry.path, entry.prefix, entry.week, entry.size, entry.mtime)
+        for entry in folder_files(folder)
+        if entry.prefix.lower() == prefix.lower() and entry.path.suffix.lower() == ext.lower()
+    ]
+    return rank_weeks(matches)
+
+
+def find_latest_file(folder: Path, prefix: str, ext: str = ".xlsx", quiet: bool = False) -> Optional[WeekFile]:
+    """
+    Trouve le fichier de la semaine la plus récente.
+
+    Args:
+        folder: Dossier des classeurs
+        prefix: Préfixe des fichiers (ex: "SUIVI_CRM")
+        ext: Extension des fichiers
+        quiet: Si True, n'affiche pas d'erreur quand aucun fichier n'est trouvé
+
+    Returns:
+        WeekFile le plus récent, ou None
+    """
+    matches = week_files(folder, prefix, ext)
+    if not matches:
+        if not quiet:
+            print(f"  ERREUR: Aucun fichier trouvé pour '{prefix}_S*{ext}' dans {folder}")
+        return None
+    return matches[-1]
@@ -0,0 +1,126 @@
+"""
+Étapes d'édition communes aux scripts de mise à jour hebdomadaire.
+
+L'édition (date, requêtes, liaisons) se fait par défaut directement dans
+l'archive OOXML (sans Excel) ; Excel n'est ouvert qu'ensuite pour
+l'actualisation. Avec HEADLESS_EDIT=0, tout passe par Excel comme avant.
+"""
+import shutil
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from config import HEADLESS_EDIT
+from src.ooxml_workbook import OOXMLWorkbook
+
+
+def open_headless_editor(source_file: Path):
+    """
+    Ouvre le classeur source pour une édition OOXML, sans Excel.
+
+    Utilisable hors du thread d'Excel (préparation en arrière-plan).
+
+    Returns:
+        OOXMLWorkbook, ou None si l'édition OOXML est désactivée ou impossible
+        (l'édition doit alors passer par Excel)
+    """
+    if not HEADLESS_EDIT:
+        return None
+    try:
+        return OOXMLWorkbook(source_file)
+    except Exception as e:
+        print(f"  ATTENTION: Édition OOXML impossible ({e}), utilisation d'Excel")
+        return None
+
+
+def open_editor(source_file: Path, new_file: Path, excel):
+    """
+    Prépare le classeur de la nouvelle semaine pour la phase d'édition.
+
+    En mode OOXML, le fichier source est ouvert en lecture seule : la copie
+    n'est écrite qu'à commit_edits, en une seule passe (parties inchangées
+    recopiées telles quelles + parties modifiées). Sinon le fichier est
+    dupliqué puis ouvert dans Excel.
+
+    Args:
+        source_file: Classeur de la semaine précédente
+        new_file: Classeur à produire
+        excel: Instance ExcelAutomation (utilisée si l'édition OOXML est désactivée)
+
+    Returns:
+        Objet exposant read_cell/write_cell/get_query_formula/... ou None
+    """
+    editor = open_headless_editor(source_file)
+    if editor is not None:
+        return editor
+    shutil.copy2(source_file, new_file)
+    if not excel.open_workbook(new_file):
+        return None
+    return excel
+
+
+def commit_edits(editor, excel, new_file: Path) -> bool:
+    """
+    Termine la phase d'édition et ouvre le classeur dans Excel pour l'actualisation.
+
+    Args:
+        editor: Objet retourné par open_editor
+        excel: Instance ExcelAutomation
+        new_file: Classeur à produire
+
+    Returns:
+        True si le classeur est ouvert dans Excel avec les modifications
+    """
+    if editor is excel:
+        return True
+    if not save_edits(editor, new_file):
+        return False
+    return excel.open_workbook(new_file)
+
+
+def save_edits(editor, new_file: Path) -> bool:
+    """
+    Écrit le classeur édité en OOXML (sans Excel) et ferme l'éditeur.
+
+    Args:
+        editor: OOXMLWorkbook retourné par open_headless_editor / open_editor
+        new_file: Classeur à produire
+
+    Returns:
+        True si le classeur est écrit
+    """
+    saved = editor.save_as(new_file)
+    editor.close()
+    return saved
+
+
+def shift_date_cell(editor, sheet: str, cell: str, days: int = 7) -> bool:
+    """
+    Décale la date d'une cellule de N jours.
+
+    Args:
+        editor: Objet exposant read_cell/write_cell
+        sheet: Nom de la feuille
+        cell: Référence de la cellule
+        days: Nombre de jours à ajouter
+
+    Returns:
+        True si la date a été mise à jour
+    """
+    current_date = editor.read_cell(sheet, cell)
+
+    if current_date is None:
+        return False
+
+    if isinstance(current_date, datetime):
+        new_date = current_date + timedelta(days=days)
+    else:
+        try:
+            current_date = datetime.strptime(str(current_date), "%Y-%m-%d %H:%M:%S")
+            new_date = current_date + timedelta(days=days)
+        except ValueError:
+            print(f"  ERREUR: '{current_date}' n'est pas une date valide")
+            return False
+
+    print(f"  {current_date.strftime('%d/%m/%Y')} -> {new_date.strftime('%d/%m/%Y')}")
+
+    return editor.write_cell(sheet, cell, new_date)
@@ -0,0 +1,138 @@
+"""
+Exécution parallèle de traitements de classeurs indépendants.
+
+Chaque traitement tourne dans son propre processus (appartement COM isolé)
+avec sa propre instance Excel (DispatchEx), dans la limite de
+PARALLEL_WORKERS processus simultanés. La sortie console de chaque
+traitement est capturée et restituée d'un bloc à la fin du traitement,
+pour ne pas mélanger les journaux des classeurs.
+
+Usage:
+    jobs = [WorkerJob("MDR", "scripts.update_mdr"), WorkerJob("PMA", "scripts.update_pma")]
+    results = run_parallel(jobs, max_workers=2)
+"""
+import contextlib
+import importlib
+import io
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from config import PARALLEL_WORKERS
+
+
+class WorkerJob:
+    """
+    Traitement à exécuter dans un processus dédié.
+
+    La fonction est appelée sous la forme function(*args, excel=instance).
+    """
+
+    def __init__(self, name: str, module: str, function: str = "main", args: tuple = ()):
+        """
+        Args:
+            name: Nom affiché du traitement (ex: "MDR")
+            module: Module à importer (ex: "scripts.update_mdr")
+            function: Fonction du module à appeler
+            args: Arguments positionnels (doivent être sérialisables)
+        """
+        self.name = name
+        self.module = module
+        self.function = function
+        self.args = args
+
+
+def run_job(job: WorkerJob) -> dict:
+    """
+    Point d'entrée d'un processus de travail : exécute le traitement avec
+    une instance Excel dédiée.
+
+    Returns:
+        Dictionnaire {"name", "success", "elapsed", "error", "output"}
+    """
+    from src.excel_automation import ExcelAutomation
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    success = False
+    error = None
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        excel = None
+        try:
+            function = getattr(importlib.import_module(job.module), job.function)
+            excel = ExcelAutomation(visible=False, new_instance=True)
+            success = bool(function(*job.args, excel=excel))
+        except Exception as e:
+            error = str(e)
+            traceback.print_exc()
+        finally:
+            if excel is not None:
+                excel.quit()
+    return {
+        "name": job.name,
+        "success": success,
+        "elapsed": time.perf_counter() - start,
+        "error": error,
+        "output": output.getvalue(),
+    }
+
+
+def create_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Crée le pool de processus de travail.
+    "spawn" partout : même comportement que sous Windows (pas de fork
+    d'un processus ayant déjà initialisé COM).
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def failed_result(job: WorkerJob, error: str) -> dict:
+    """Résultat d'un traitement dont le processus de travail a été interrompu."""
+    return {"name": job.name, "success": False, "elapsed": 0.0, "error": error, "output": ""}
+
+
+def print_result(result: dict):
+    """Affiche le journal capturé d'un traitement terminé."""
+    status = "OK" if result["success"] else "ERREUR"
+    print(f"\n{'-' * 60}")
+    print(f"   [{result['name']}] {status} en {result['elapsed']:.1f} s")
+    print(f"{'-' * 60}")
+    if result["output"]:
+        print(result["output"].rstrip())
+    if result["error"]:
+        print(f"  ERREUR: {result['error']}")
+
+
+def run_parallel(jobs: List[WorkerJob], max_workers: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Exécute des traitements indépendants en parallèle.
+
+    Args:
+        jobs: Traitements à exécuter
+        max_workers: Nombre maximal de processus simultanés (défaut: PARALLEL_WORKERS)
+
+    Returns:
+        Dictionnaire nom -> {"success", "elapsed", "error", "output"},
+        dans l'ordre des traitements
+    """
+    max_workers = max(1, min(max_workers or PARALLEL_WORKERS, len(jobs) or 1))
+    print(f"\nExécution parallèle: {len(jobs)} classeur(s), {max_workers} processus")
+
+    results = {}
+    start = time.perf_counter()
+    with create_pool(max_workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Processus de travail interrompu (plantage d'Excel, etc.)
+                result = failed_result(job, str(e))
+            results[job.name] = result
+            print_result(result)
+
+    print(f"\nExécution parallèle terminée en {time.perf_counter() - start:.1f} s")
+    return {job.name: results[job.name] for job in jobs}
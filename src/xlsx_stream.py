@@ -0,0 +1,486 @@
+"""
+Lecture en flux des feuilles d'un classeur (validation après sauvegarde, sans Excel).
+
+Le fichier est projeté en mémoire (mmap) et chaque feuille est
+décompressée au fil de l'eau : la mémoire utilisée ne dépend pas de la
+taille de la feuille.
+    - iter_rows / iter_cells analysent le XML (iterparse), les lignes sont
+      libérées dès qu'elles ont été lues ; la table des chaînes partagées
+      n'est chargée que si des valeurs texte sont demandées ;
+    - sheet_stats parcourt les blocs décompressés par expressions
+      régulières, bien plus rapide sur les feuilles de plusieurs centaines
+      de milliers de cellules.
+
+Les statistiques portent sur toute la plage utilisée :
+    - nombre de lignes et de colonnes ;
+    - min / max de chaque colonne au format date ;
+    - présence d'une date cible (ex: la veille) dans ces colonnes.
+
+Usage:
+    with StreamingWorkbook(path) as book:
+        stats = book.sheet_stats("DATA", target_date=date.today() - timedelta(days=1))
+"""
+import hashlib
+import mmap
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.ooxml_workbook import (
+    NS_MAIN, NS_PKG_REL, NS_REL, REL_OFFICE_DOCUMENT, REL_SHARED_STRINGS, REL_STYLES,
+    REL_TABLE, REL_WORKSHEET, column_index, column_letters, date_style_indexes, datetime_to_excel_serial,
+    excel_serial_to_datetime, rels_part_for, resolve_target,
+)
+
+_C = f"{{{NS_MAIN}}}c"
+_V = f"{{{NS_MAIN}}}v"
+_T = f"{{{NS_MAIN}}}t"
+_IS = f"{{{NS_MAIN}}}is"
+_ROW = f"{{{NS_MAIN}}}row"
+_SI = f"{{{NS_MAIN}}}si"
+_SHEET_DATA = f"{{{NS_MAIN}}}sheetData"
+
+_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+_RANGE_RE = re.compile(r"\$?([A-Z]+)\$?(\d+):\$?([A-Z]+)\$?(\d+)$")
+_DIMENSION_RE = re.compile(rb'<dimension ref="\$?([A-Z]+)\$?\d+(?::\$?([A-Z]+)\$?\d+)?"')
+_ROW_RE = re.compile(rb'<row r="(\d+)"[^>]*?(?:/>|>(.*?)</row>)', re.DOTALL)
+_CELL_COLUMN_RE = re.compile(rb'<c r="([A-Z]+)')
+
+# Taille des blocs décompressés analysés par sheet_stats
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def data_rows(block: bytes) -> Iterator[int]:
+    """
+    Numéros des lignes contenant au moins une valeur dans un bloc de sheetData
+    (les <row .../> vides, qui ne portent qu'une hauteur ou un format, sont ignorées).
+    """
+    for match in _ROW_RE.finditer(block):
+        body = match.group(2) or b""
+        if b"<v>" in body or b"<is>" in body:
+            yield int(match.group(1))
+
+
+class _MappedFile(mmap.mmap):
+    """Projection en lecture utilisable par zipfile (seekable() absent avant Python 3.13)."""
+
+    def seekable(self):
+        return True
+
+
+class ColumnDates:
+    """Dates d'une colonne (numéros de série Excel)."""
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.target_rows = 0
+
+    def add(self, serial: float, target: Optional[int]):
+        self.count += 1
+        if self.min is None or serial < self.min:
+            self.min = serial
+        if self.max is None or serial > self.max:
+            self.max = serial
+        if target is not None and int(serial) == target:
+            self.target_rows += 1
+
+
+class SheetStats:
+    """Statistiques d'une feuille sur toute sa plage utilisée."""
+
+    def __init__(self, name: str, target_date: Optional[date] = None, date1904: bool = False):
+        self.name = name
+        self.target_date = target_date
+        self.date1904 = date1904
+        self.rows = 0          # dernière ligne non vide
+        self.data_rows = 0     # lignes contenant au moins une valeur
+        self.columns = 0       # dernière colonne non vide
+        self.cells = 0
+        self.date_columns: Dict[int, ColumnDates] = {}
+
+    def _to_datetime(self, serial: Optional[float]) -> Optional[datetime]:
+        return None if serial is None else excel_serial_to_datetime(serial, self.date1904)
+
+    @property
+    def date_min(self) -> Optional[datetime]:
+        values = [column.min for column in self.date_columns.values()]
+        return self._to_datetime(min(values)) if values else None
+
+    @property
+    def date_max(self) -> Optional[datetime]:
+        values = [column.max for column in self.date_columns.values()]
+        return self._to_datetime(max(values)) if values else None
+
+    @property
+    def target_found(self) -> Optional[bool]:
+        """True/False selon la présence de la date cible (None sans date cible ou sans date)."""
+        if self.target_date is None or not self.date_columns:
+            return None
+        return any(column.target_rows for column in self.date_columns.values())
+
+    def to_dict(self) -> dict:
+        def iso(value):
+            return value.strftime("%Y-%m-%d") if value else None
+
+        return {
+            "sheet": self.name,
+            "rows": self.rows,
+            "data_rows": self.data_rows,
+            "columns": self.columns,
+            "cells": self.cells,
+            "date_min": iso(self.date_min),
+            "date_max": iso(self.date_max),
+            "target_date": iso(self.target_date),
+            "target_found": self.target_found,
+            "date_columns": {
+                column_letters(index): {
+                    "count": column.count,
+                    "min": iso(self._to_datetime(column.min)),
+                    "max": iso(self._to_datetime(column.max)),
+                    "target_rows": column.target_rows,
+                }
+                for index, column in sorted(self.date_columns.items())
+            },
+        }
+
+
+class StreamingWorkbook:
+    """Classeur .xlsx/.xlsm lu en flux, sans charger les feuilles."""
+
+    def __init__(self, file_path: Path):
+        self.file_path = Path(file_path)
+        self._file = open(self.file_path, "rb")
+        try:
+            self._map = _MappedFile(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._zip = zipfile.ZipFile(self._map)
+        except (ValueError, OSError, zipfile.BadZipFile):
+            self._file.close()
+            raise
+        self._names = set(self._zip.namelist())
+        self._workbook_part = self._find_workbook_part()
+        self._sheets: Dict[str, str] = {}
+        self.date1904 = False
+        self._load_workbook_info()
+        self._date_styles: Optional[set] = None
+        self._shared_strings: Optional[List[str]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+        self._map.close()
+        self._file.close()
+
+    # ------------------------------------------------------------------
+    # Structure (petites parties, lues entièrement)
+    # ------------------------------------------------------------------
+
+    def _relationships(self, part: str) -> List[dict]:
+        rels_part = rels_part_for(part)
+        if rels_part not in self._names:
+            return []
+        root = ET.fromstring(self._zip.read(rels_part))
+        return [
+            {"id": rel.get("Id"), "type": rel.get("Type"), "target": rel.get("Target"),
+             "external": rel.get("TargetMode") == "External"}
+            for rel in root.iter(f"{{{NS_PKG_REL}}}Relationship")
+        ]
+
+    def _find_workbook_part(self) -> str:
+        for rel in self._relationships(""):
+            if rel["type"] == REL_OFFICE_DOCUMENT:
+                return resolve_target("", rel["target"])
+        return "xl/workbook.xml"
+
+    def _related_parts(self, rel_type: str) -> List[str]:
+        return [
+            resolve_target(self._workbook_part, rel["target"])
+            for rel in self._relationships(self._workbook_part)
+            if rel["type"] == rel_type and not rel["external"]
+        ]
+
+    def _load_workbook_info(self):
+        root = ET.fromstring(self._zip.read(self._workbook_part))
+        pr = root.find(f"{{{NS_MAIN}}}workbookPr")
+        if pr is not None:
+            self.date1904 = pr.get("date1904") in ("1", "true")
+        targets = {
+            rel["id"]: resolve_target(self._workbook_part, rel["target"])
+            for rel in self._relationships(self._workbook_part)
+            if rel["type"] == REL_WORKSHEET
+        }
+        for sheet in root.iter(f"{{{NS_MAIN}}}sheet"):
+            rid = sheet.get(f"{{{NS_REL}}}id")
+            if rid in targets:
+                self._sheets[sheet.get("name")] = targets[rid]
+
+    def get_sheet_names(self) -> List[str]:
+        return list(self._sheets)
+
+    def _sheet_part(self, sheet_name: str) -> str:
+        for name, part in self._sheets.items():
+            if name.lower() == sheet_name.lower():
+                return part
+        raise KeyError(f"Feuille introuvable: {sheet_name}")
+
+    def sheet_dimension(self, sheet_name: str) -> Optional[Tuple[int, int]]:
+        """Colonnes (première, dernière) de la plage utilisée déclarée (<dimension>), ou None."""
+        with self._zip.open(self._sheet_part(sheet_name)) as stream:
+            head = stream.read(4096)
+        match = _DIMENSION_RE.search(head)
+        if not match:
+            return None
+        first = column_index(match.group(1).decode("ascii"))
+        last = column_index((match.group(2) or match.group(1)).decode("ascii"))
+        return first, last
+
+    def sheet_tables(self, sheet_name: str) -> List[dict]:
+        """
+        Tableaux d'une feuille (parties xl/tables).
+
+        Returns:
+            [{"name", "ref", "query", "first_row", "last_row", "first_column",
+              "last_column", "data_rows"}] ; "query" si chargé par une requête
+        """
+        part = self._sheet_part(sheet_name)
+        tables = []
+        for rel in self._relationships(part):
+            if rel["type"] != REL_TABLE or rel["external"]:
+                continue
+            table_part = resolve_target(part, rel["target"])
+            if table_part not in self._names:
+                continue
+            root = ET.fromstring(self._zip.read(table_part))
+            ref = root.get("ref") or ""
+            match = _RANGE_RE.match(ref)
+            if not match:
+                continue
+            first_row, last_row = int(match.group(2)), int(match.group(4))
+            header = int(root.get("headerRowCount", "1"))
+            totals = int(root.get("totalsRowCount", "0"))
+            tables.append({
+                "name": root.get("displayName") or root.get("name"),
+                "ref": ref,
+                "query": root.get("tableType") == "queryTable",
+                "first_row": first_row,
+                "last_row": last_row,
+                "first_column": column_index(match.group(1)),
+                "last_column": column_index(match.group(3)),
+                "data_rows": max(last_row - first_row + 1 - header - totals, 0),
+            })
+        return tables
+
+    @property
+    def date_styles(self) -> set:
+        if self._date_styles is None:
+            self._date_styles = set()
+            for part in self._related_parts(REL_STYLES):
+                self._date_styles |= date_style_indexes(self._zip.read(part))
+        return self._date_styles
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """Table des chaînes partagées (lue en flux au premier accès)."""
+        if self._shared_strings is None:
+            self._shared_strings = []
+            for part in self._related_parts(REL_SHARED_STRINGS):
+                with self._zip.open(part) as stream:
+                    for _, element in ET.iterparse(stream):
+                        if element.tag == _SI:
+                            self._shared_strings.append("".join(t.text or "" for t in element.iter(_T)))
+                            element.clear()
+        return self._shared_strings
+
+    def shared_strings_digest(self) -> Optional[str]:
+        """Empreinte de la table des chaînes partagées (lue par blocs), None si absente."""
+        parts = self._related_parts(REL_SHARED_STRINGS)
+        if not parts:
+            return None
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            with self._zip.open(part) as stream:
+                for block in iter(lambda: stream.read(_BLOCK_SIZE), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lecture en flux
+    # ------------------------------------------------------------------
+
+    def iter_cells(self, sheet_name: str) -> Iterator[Tuple[int, int, str, int, Optional[str]]]:
+        """
+        Parcourt les cellules d'une feuille sans la charger.
+
+        Yields:
+            (ligne, colonne, type, style, texte brut) ; type "n" (nombre),
+            "s" (index de chaîne partagée), "str", "inlineStr", "b", "e"
+        """
+        part = self._sheet_part(sheet_name)
+        with self._zip.open(part) as stream:
+            sheet_data = None
+            row_number = 0
+            column = 0
+            for event, element in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if element.tag == _ROW:
+                        row_number = int(element.get("r") or row_number + 1)
+                        column = 0
+                    elif element.tag == _SHEET_DATA:
+                        sheet_data = element
+                    continue
+                if element.tag == _C:
+                    ref = element.get("r")
+                    match = _REF_RE.match(ref) if ref else None
+                    column = column_index(match.group(1)) if match else column + 1
+                    cell_type = element.get("t", "n")
+                    if cell_type == "inlineStr":
+                        inline = element.find(_IS)
+                        raw = "".join(t.text or "" for t in inline.iter(_T)) if inline is not None else None
+                    else:
+                        value = element.find(_V)
+                        raw = value.text if value is not None else None
+                    yield row_number, column, cell_type, int(element.get("s", "0")), raw
+                elif element.tag == _ROW and sheet_data is not None:
+                    # Lignes lues : libérées pour garder une mémoire constante
+                    sheet_data.clear()
+
+    def iter_rows(self, sheet_name: str) -> Iterator[Tuple[int, Dict[int, object]]]:
+        """
+        Parcourt les lignes d'une feuille avec leurs valeurs typées.
+
+        Yields:
+            (numéro de ligne, {colonne: valeur}) ; les dates sont des datetime
+        """
+        date_styles = self.date_styles
+        current = None
+        values: Dict[int, object] = {}
+        for row, column, cell_type, style, raw in self.iter_cells(sheet_name):
+            if row != current:
+                if values:
+                    yield current, values
+                current, values = row, {}
+            if raw is None:
+                continue
+            if cell_type == "s":
+                values[column] = self.shared_strings[int(raw)]
+            elif cell_type == "b":
+                values[column] = raw == "1"
+            elif cell_type in ("str", "inlineStr", "e"):
+                values[column] = raw
+            else:
+                number = float(raw)
+                if style in date_styles:
+                    values[column] = excel_serial_to_datetime(number, self.date1904)
+                else:
+                    values[column] = int(number) if number.is_integer() else number
+        if values:
+            yield current, values
+
+    def sheet_blocks(self, sheet_name: str, size: int = _BLOCK_SIZE) -> Iterator[bytes]:
+        """
+        XML d'une feuille, décompressé par blocs d'environ `size` octets.
+
+        Chaque bloc se termine sur une fin de ligne (</row>) : une ligne,
+        et donc une cellule, n'est jamais coupée entre deux blocs.
+        """
+        with self._zip.open(self._sheet_part(sheet_name)) as stream:
+            pending = b""
+            while True:
+                block = stream.read(size)
+                if not block:
+                    if pending:
+                        yield pending
+                    return
+                data = pending + block
+                cut = data.rfind(b"</row>")
+                if cut < 0:
+                    pending = data
+                    continue
+                cut += len(b"</row>")
+                yield data[:cut]
+                pending = data[cut:]
+
+    def _date_cell_pattern(self) -> Optional[re.Pattern]:
+        """Cellules numériques au format date : <c r="A2" s="1"><v>46034</v></c>."""
+        if not self.date_styles:
+            return None
+        styles = "|".join(str(style) for style in sorted(self.date_styles))
+        return re.compile(
+            rf'<c r="([A-Z]+)\d+" s="(?:{styles})"(?: t="n")?>'
+            r"(?:<f\b[^>]*>[^<]*</f>|<f\b[^>]*/>)?<v>([^<]*)</v>".encode("ascii")
+        )
+
+    def sheet_stats(self, sheet_name: str, target_date: Optional[date] = None) -> SheetStats:
+        """
+        Statistiques d'une feuille, en une lecture par blocs (sans chaînes partagées).
+
+        Le XML n'est pas analysé élément par élément : les lignes, les cellules
+        et les dates sont repérées par expressions régulières dans chaque bloc
+        décompressé (attributs dans l'ordre écrit par Excel : r, s, t).
+
+        Args:
+            sheet_name: Nom de la feuille
+            target_date: Date dont la présence est vérifiée dans les colonnes de dates
+        """
+        stats = SheetStats(sheet_name, target_date, self.date1904)
+        target = None
+        if target_date is not None:
+            target = int(datetime_to_excel_serial(
+                datetime(target_date.year, target_date.month, target_date.day), self.date1904
+            ))
+        date_cells = self._date_cell_pattern()
+        column_cache: Dict[bytes, int] = {}
+
+        def column_of(letters: bytes) -> int:
+            index = column_cache.get(letters)
+            if index is None:
+                index = column_cache[letters] = column_index(letters.decode("ascii"))
+            return index
+
+        for block in self.sheet_blocks(sheet_name):
+            for row in data_rows(block):
+                stats.data_rows += 1
+                stats.rows = row
+            stats.cells += block.count(b"<v>") + block.count(b"<is>")
+            for letters in set(_CELL_COLUMN_RE.findall(block)):
+                stats.columns = max(stats.columns, column_of(letters))
+            if date_cells is None:
+                continue
+            for letters, raw in date_cells.findall(block):
+                try:
+                    serial = float(raw)
+                except ValueError:
+                    continue
+                column = column_of(letters)
+                dates = stats.date_columns.get(column)
+                if dates is None:
+                    dates = stats.date_columns[column] = ColumnDates()
+                dates.add(serial, target)
+        return stats
+
+
+def validate_workbook(file_path: Path, target_date: Optional[date] = None,
+                      sheets: Optional[List[str]] = None) -> List[SheetStats]:
+    """
+    Statistiques de toutes les feuilles (ou de celles demandées) d'un classeur.
+
+    Args:
+        file_path: Classeur à valider
+        target_date: Date attendue dans les colonnes de dates (ex: la veille)
+        sheets: Feuilles à analyser (par défaut toutes)
+
+    Returns:
+        Liste de SheetStats, dans l'ordre des feuilles
+    """
+    with StreamingWorkbook(file_path) as book:
+        names = sheets or book.get_sheet_names()
+        return [book.sheet_stats(name, target_date) for name in names]
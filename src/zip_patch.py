@@ -0,0 +1,131 @@
+"""
+Duplication d'une archive zip (classeur OOXML) avec remplacement de parties.
+
+Les parties non modifiées sont recopiées telles quelles (octets compressés,
+sans décompression ni recompression) et seules les parties modifiées sont
+recompressées. Le nouveau fichier est produit en une seule écriture
+séquentielle.
+"""
+import os
+import struct
+import zlib
+import zipfile
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+
+LOCAL_SIGNATURE = b"PK\x03\x04"
+CENTRAL_SIGNATURE = b"PK\x01\x02"
+END_SIGNATURE = b"PK\x05\x06"
+
+FLAG_DATA_DESCRIPTOR = 0x08
+ZIP64_LIMIT = 0xFFFFFFFF
+CHUNK_SIZE = 1024 * 1024
+
+
+def _dos_datetime(date_time) -> tuple:
+    year, month, day, hour, minute, second = date_time
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+def _compress(data: bytes, method: int) -> bytes:
+    if method == zipfile.ZIP_STORED:
+        return data
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def copy_and_patch(source: Path, dest: Path, patches: Dict[str, bytes]) -> Path:
+    """
+    Copie une archive zip en remplaçant le contenu de certaines parties.
+
+    Args:
+        source: Archive d'origine
+        dest: Archive à produire (remplacée de façon atomique si elle existe)
+        patches: Dictionnaire nom de partie -> nouveau contenu (non compressé)
+
+    Returns:
+        Chemin de l'archive produite
+    """
+    source = Path(source)
+    dest = Path(dest)
+    fd, tmp_name = tempfile.mkstemp(prefix=".~", suffix=dest.suffix, dir=dest.parent)
+    try:
+        with os.fdopen(fd, "wb") as out, zipfile.ZipFile(source) as zf, open(source, "rb") as src:
+            central = []
+            for info in zf.infolist():
+                src.seek(info.header_offset)
+                header = src.read(LOCAL_HEADER.size)
+                fields = LOCAL_HEADER.unpack(header)
+                if fields[0] != LOCAL_SIGNATURE:
+                    raise zipfile.BadZipFile(f"En-tête local invalide: {info.filename}")
+                name_length, extra_length = fields[10], fields[11]
+                raw_name = src.read(name_length)
+                src.seek(extra_length, os.SEEK_CUR)
+
+                flags = info.flag_bits & ~FLAG_DATA_DESCRIPTOR
+                method = info.compress_type
+                offset = out.tell()
+
+                if info.filename in patches:
+                    data = patches[info.filename]
+                    if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                        method = zipfile.ZIP_DEFLATED
+                    payload = _compress(data, method)
+                    crc = zlib.crc32(data)
+                    compress_size, file_size = len(payload), len(data)
+                else:
+                    payload = None
+                    crc = info.CRC
+                    compress_size, file_size = info.compress_size, info.file_size
+
+                if max(compress_size, file_size, offset) >= ZIP64_LIMIT:
+                    raise zipfile.LargeZipFile("Archive ZIP64 non supportée")
+
+                dos_time, dos_date = _dos_datetime(info.date_time)
+                out.write(LOCAL_HEADER.pack(
+                    LOCAL_SIGNATURE, 20, 0, flags, method, dos_time, dos_date,
+                    crc, compress_size, file_size, len(raw_name), 0,
+                ))
+                out.write(raw_name)
+
+                if payload is not None:
+                    out.write(payload)
+                else:
+                    remaining = compress_size
+                    while remaining:
+                        chunk = src.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise zipfile.BadZipFile(f"Données tronquées: {info.filename}")
+                        out.write(chunk)
+                        remaining -= len(chunk)
+
+                central.append(CENTRAL_HEADER.pack(
+                    CENTRAL_SIGNATURE, 20, info.create_system, 20, 0, flags, method,
+                    dos_time, dos_date, crc, compress_size, file_size,
+                    len(raw_name), 0, 0, 0, info.internal_attr, info.external_attr, offset,
+                ) + raw_name)
+
+            directory_offset = out.tell()
+            for entry in central:
+                out.write(entry)
+            directory_size = out.tell() - directory_offset
+            out.write(END_RECORD.pack(
+                END_SIGNATURE, 0, 0, len(central), len(central),
+                directory_size, directory_offset, 0,
+            ))
+
+        # mkstemp crée le fichier en 0600 : reprendre les droits du fichier source
+        os.chmod(tmp_name, os.stat(source).st_mode & 0o777)
+        os.replace(tmp_name, dest)
+        return dest
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
@@ -0,0 +1,137 @@
+"""
+Aller-retour décodage -> remplacement -> ré-encodage du bloc DataMashup,
+sur des classeurs synthétiques (sans Excel).
+
+Usage:
+    python -m pytest tests
+"""
+import base64
+import re
+import struct
+import zipfile
+
+import pytest
+
+from src.data_mashup import (
+    SECTION_PART, DataMashup, QueryCatalog, find_datamashup_part, load_catalog,
+    parse_section_members,
+)
+from src.ooxml_workbook import OOXMLWorkbook
+from src.synthetic_workbook import WorkbookSpec, build_datamashup, build_workbook
+
+FORMULAS = {
+    "selligent_all": 'let\n    Source = Csv.Document(File.Contents("C:\\exports\\2026_S03\\all.csv"))\nin\n    Source',
+    "Requête; avec séparateur": 'let\n    Source = "texte ; avec // pas un commentaire"\nin\n    Source',
+    "stg_selligent": "let\n    Source = selligent_all\nin\n    Source",
+}
+
+CONFIG = {
+    "file_prefix": "SUIVI_TEST",
+    "queries": {
+        "selligent_all": {"type": "selligent"},
+        "piano_all": {"type": "piano"},
+    },
+}
+
+
+def _blocks(xml_bytes: bytes):
+    """Version et quatre blocs du contenu binaire d'une partie DataMashup."""
+    text = xml_bytes.decode("utf-16")
+    binary = base64.b64decode(re.search(r"<DataMashup\b[^>]*>(.*?)</DataMashup>", text, re.DOTALL).group(1))
+    blocks, offset = [], 4
+    for _ in range(4):
+        (length,) = struct.unpack_from("<I", binary, offset)
+        blocks.append(binary[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    assert offset == len(binary)
+    return struct.unpack_from("<I", binary, 0)[0], blocks
+
+
+def test_parse_section_members():
+    catalog = QueryCatalog(DataMashup(build_datamashup(FORMULAS)))
+    assert catalog.names() == list(FORMULAS)
+    for name, formula in FORMULAS.items():
+        assert catalog[name] == formula
+    assert catalog["SELLIGENT_ALL"] == FORMULAS["selligent_all"]
+
+
+def test_parse_section_attributes_and_comments():
+    text = (
+        'section Section1;\n'
+        '// shared commentaire = 1;\n'
+        '[ Description = "attribut ; ]" ]\n'
+        'shared #"avec ""guillemets""" = 1 /* ; */ + 2;\n'
+        'shared suivante = "a;b";\n'
+    )
+    members = [(name, text[start:end]) for name, start, end in parse_section_members(text)]
+    assert members == [('avec "guillemets"', "1 /* ; */ + 2"), ("suivante", '"a;b"')]
+
+
+def test_unchanged_round_trip_is_identical():
+    part = build_datamashup(FORMULAS)
+    mashup = DataMashup(part)
+    catalog = QueryCatalog(mashup)
+    assert not catalog.commit()
+    assert mashup.to_xml_bytes() == part
+
+
+def test_replace_round_trip():
+    part = build_datamashup(FORMULAS)
+    mashup = DataMashup(part)
+    catalog = QueryCatalog(mashup)
+    new_formula = FORMULAS["selligent_all"].replace("2026_S03", "2026_S04")
+    missing = catalog.update({"selligent_all": new_formula, "absente": "1"})
+    assert missing == ["absente"]
+    assert catalog.dirty and catalog.commit() and not catalog.dirty
+
+    encoded = mashup.to_xml_bytes()
+    assert encoded.startswith(b"\xff\xfe")
+    reread = QueryCatalog(DataMashup(encoded))
+    assert reread["selligent_all"] == new_formula
+    assert reread["Requête; avec séparateur"] == FORMULAS["Requête; avec séparateur"]
+    assert reread["stg_selligent"] == FORMULAS["stg_selligent"]
+
+    # Seul le package change : permissions, métadonnées et liaisons conservées
+    version, before = _blocks(part)
+    new_version, after = _blocks(encoded)
+    assert new_version == version
+    assert after[1:] == before[1:]
+    with zipfile.ZipFile(__import__("io").BytesIO(after[0])) as package:
+        raw = package.read(SECTION_PART)
+        assert raw.startswith(b"\xef\xbb\xbf")
+        assert sorted(package.namelist()) == ["Config/Package.xml", "Formulas/Section1.m", "[Content_Types].xml"]
+
+
+def test_workbook_round_trip(tmp_path):
+    source = build_workbook(tmp_path / "SUIVI_TEST_S03.xlsx", CONFIG, 2026, 3,
+                            WorkbookSpec(rows=10, queries=5))
+    catalog = load_catalog(source)
+    assert catalog is not None and len(catalog) == 5
+    original = dict(catalog.items())
+
+    book = OOXMLWorkbook(source)
+    formula = book.get_query_formula("selligent_all")
+    assert "2026_S03" in formula
+    assert book.set_query_formulas({"selligent_all": formula.replace("2026_S03", "2026_S04")})
+    assert book.modified
+    target = tmp_path / "SUIVI_TEST_S04.xlsx"
+    assert book.save_as(target)
+    book.close()
+
+    edited = load_catalog(target)
+    assert "2026_S04" in edited["selligent_all"]
+    for name, formula in original.items():
+        if name != "selligent_all":
+            assert edited[name] == formula
+    with zipfile.ZipFile(source) as before, zipfile.ZipFile(target) as after:
+        assert find_datamashup_part(after) == find_datamashup_part(before)
+        assert sorted(after.namelist()) == sorted(before.namelist())
+
+
+def test_truncated_mashup_is_rejected():
+    part = build_datamashup(FORMULAS)
+    text = part.decode("utf-16")
+    payload = re.search(r"<DataMashup\b[^>]*>(.*?)</DataMashup>", text).group(1)
+    truncated = base64.b64encode(base64.b64decode(payload)[:-8]).decode("ascii")
+    with pytest.raises(ValueError):
+        DataMashup(b"\xff\xfe" + text.replace(payload, truncated).encode("utf-16-le"))
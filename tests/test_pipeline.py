@@ -0,0 +1,63 @@
+"""
+Préparation en arrière-plan : ordre, configurations pas encore prêtes et
+sortie console propre à chaque thread.
+
+Usage:
+    python -m pytest tests
+"""
+import threading
+
+from src.pipeline import PreparationPipeline
+
+CONFIGS = {"A": {}, "B": {}, "C": {}}
+
+
+def test_prepares_next_in_background(capsys):
+    threads = {}
+
+    def prepare(name, config):
+        threads[name] = threading.current_thread()
+        print(f"préparation {name}")
+        return name.lower()
+
+    events = []
+    pipeline = PreparationPipeline(CONFIGS, prepare, announce=lambda name: print(f">>> {name}"))
+    for name, config, prepared in pipeline:
+        events.append((name, prepared))
+        print(f"traitement {name}")
+
+    assert events == [("A", "a"), ("B", "b"), ("C", "c")]
+    assert all(thread is not threading.main_thread() for thread in threads.values())
+    # Journal de préparation affiché au tour du classeur, après son annonce
+    assert capsys.readouterr().out.split("\n")[:-1] == [
+        ">>> A", "préparation A", "traitement A",
+        ">>> B", "préparation B", "traitement B",
+        ">>> C", "préparation C", "traitement C",
+    ]
+
+
+def test_not_ready_prepared_in_caller():
+    done = set()
+    threads = {}
+
+    def prepare(name, config):
+        threads[name] = threading.current_thread()
+        return name
+
+    # C dépend de B : pas prête pendant le traitement de B
+    pipeline = PreparationPipeline(CONFIGS, prepare, ready=lambda name: name != "C" or "B" in done)
+    for name, config, prepared in pipeline:
+        done.add(name)
+
+    assert done == set(CONFIGS)
+    assert threads["B"] is not threading.main_thread()
+    assert threads["C"] is threading.main_thread()
+
+
+def test_interrupted_iteration_discards_preparation():
+    discarded = []
+    pipeline = PreparationPipeline(CONFIGS, lambda name, config: name, discard=discarded.append)
+    for name, config, prepared in pipeline:
+        break
+    pipeline.close()
+    assert discarded == ["B"]
@@ -0,0 +1,36 @@
+"""
+Classement des fichiers SXX par numéro de semaine et passage d'année.
+
+Usage:
+    python -m pytest tests
+"""
+from datetime import date
+from pathlib import Path
+
+from src.week_index import WeekFile, following_week, rank_weeks
+
+
+def _latest(weeks, today):
+    files = [WeekFile(Path(f"SUIVI_TEST_S{week:02d}.xlsx"), "SUIVI_TEST", week, 0, 0) for week in weeks]
+    latest = rank_weeks(files, today)[-1]
+    return (latest.year, latest.week), following_week(latest.year, latest.week)
+
+
+def test_same_year_ranked_by_week():
+    assert _latest([40, 41, 39], date(2026, 10, 16)) == ((2026, 41), (2026, 42))
+
+
+def test_year_boundary():
+    assert _latest([51, 52, 53, 1], date(2027, 1, 12)) == ((2027, 1), (2027, 2))
+    assert _latest([50, 51, 52], date(2027, 1, 12)) == ((2026, 52), (2026, 53))
+    assert _latest([52, 53], date(2026, 12, 30)) == ((2026, 53), (2027, 1))
+
+
+def test_split_at_largest_gap():
+    # S45 de l'an dernier restée à côté de S01 à S41
+    assert _latest([45] + list(range(1, 42)), date(2026, 10, 16)) == ((2026, 41), (2026, 42))
+
+
+def test_old_higher_week_without_wrap():
+    # Limite documentée : sans enjambement, le numéro le plus haut l'emporte
+    assert _latest([30, 41, 45], date(2026, 10, 16))[0] == (2026, 45)